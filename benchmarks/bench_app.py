@@ -0,0 +1,208 @@
+"""Mede dashboard, importação (CSV e PDF), categorização e relatórios em PDF com vários volumes de dados.
+
+Cria um banco SQLite temporário (ou usa DATABASE_URL com --usar-banco-configurado), gera para cada tamanho
+`--usuarios` usuários com esse número de transações (benchmarks.gerar_dados) e mede as rotas pelo test
+client do Flask, como usuário logado. Os resultados saem em JSON; --comparar mostra a razão em relação a
+uma execução anterior, cenário a cenário.
+Uso: python -m benchmarks.bench_app --tamanhos 1000 10000 50000 --saida resultados.json
+     python -m benchmarks.bench_app --tamanhos 10000 --comparar resultados.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+
+def resumir(cenario, tamanho, tempos, **extras):
+    ordenados = sorted(tempos)
+    return {'cenario': cenario, 'transacoes': tamanho, 'repeticoes': len(tempos),
+            'mediana_ms': round(statistics.median(ordenados) * 1000, 2),
+            'p95_ms': round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))] * 1000, 2),
+            'media_ms': round(statistics.fmean(ordenados) * 1000, 2),
+            'minimo_ms': round(ordenados[0] * 1000, 2), **extras}
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for rodada in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(rodada)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def esperar(condicao, limite=600):
+    prazo = time.monotonic() + limite
+    while not condicao():
+        if time.monotonic() > prazo:
+            raise TimeoutError('job de importação não terminou')
+        time.sleep(0.05)
+
+
+def medir_tamanho(app, cliente, tamanho, args, pasta):
+    from benchmarks.gerar_dados import gerar_csv
+    from benchmarks.gerar_extrato import gerar_pdf
+    from static.database.models import db, Transacao
+    from static.database.sugestao_categorias import CATEGORIA_PENDENTE
+    resultados = []
+
+    def verificar(resposta, status=200):
+        assert resposta.status_code == status, (resposta.status_code, resposta.location)
+        return resposta
+
+    # Primeira chamada de cada rota fora da medição (templates compilados, fontes do PDF analisadas)
+    for url in ('/dashboard', '/api/transacoes', '/gerar-relatorio-pdf?periodo=12meses&tipo=meses'):
+        verificar(cliente.get(url))
+    resultados.append(resumir('dashboard', tamanho, cronometrar(
+        lambda _: verificar(cliente.get('/dashboard')), args.repeticoes)))
+    resultados.append(resumir('api_transacoes', tamanho, cronometrar(
+        lambda _: verificar(cliente.get('/api/transacoes')), args.repeticoes)))
+    for tipo in ('transacoes', 'categorias', 'meses'):
+        resultados.append(resumir(f'relatorio_pdf_{tipo}', tamanho, cronometrar(
+            lambda _: verificar(cliente.get(f'/gerar-relatorio-pdf?periodo=12meses&tipo={tipo}')),
+            args.repeticoes)))
+
+    # Cada rodada importa um extrato diferente (outra semente): um reenvio seria descartado como duplicado
+    tempos_csv, tempos_pagina, tempos_aplicar = [], [], []
+    for rodada in range(args.repeticoes):
+        conteudo = gerar_csv(args.linhas_csv, semente=tamanho * 1000 + rodada).encode('utf-8')
+        inicio = time.perf_counter()
+        verificar(cliente.post('/importar-extrato', data={'arquivo_extrato': (io.BytesIO(conteudo), 'extrato.csv')},
+                               content_type='multipart/form-data'), 302)
+        tempos_csv.append(time.perf_counter() - inicio)
+        with cliente.session_transaction() as sessao:
+            id_lote = sessao.get('lote_a_categorizar')
+        if id_lote is None:
+            continue
+        inicio = time.perf_counter()
+        verificar(cliente.get('/categorizar-importadas'))
+        tempos_pagina.append(time.perf_counter() - inicio)
+        with app.app_context():
+            pendentes = db.session.query(Transacao.id_transacao).filter_by(
+                id_lote=id_lote, categoria=CATEGORIA_PENDENTE).order_by(Transacao.id_transacao) \
+                .limit(app.config['TRANSACOES_POR_PAGINA_CATEGORIZACAO']).all()
+        inicio = time.perf_counter()
+        verificar(cliente.post('/categorizar-importadas',
+                               data={f'categoria_{i}': 'Outros' for (i,) in pendentes}), 302)
+        tempos_aplicar.append(time.perf_counter() - inicio)
+    resultados.append(resumir('importacao_csv', tamanho, tempos_csv, linhas=args.linhas_csv))
+    if tempos_pagina:
+        resultados.append(resumir('categorizacao_pagina', tamanho, tempos_pagina))
+        resultados.append(resumir('categorizacao_aplicar', tamanho, tempos_aplicar))
+
+    # Importação de PDF: do upload até o job concluído no pool de importação
+    def importar_pdf(rodada):
+        caminho = os.path.join(pasta, f'extrato_{tamanho}_{rodada}.pdf')
+        with open(caminho, 'rb') as arquivo:
+            resposta = verificar(cliente.post('/importar-extrato', data={'arquivo_extrato': (arquivo, 'extrato.pdf')},
+                                              content_type='multipart/form-data'), 302)
+        id_job = int(resposta.location.rstrip('/').rsplit('/', 1)[1])
+        esperar(lambda: cliente.get(f'/api/importacao/{id_job}').get_json()['status'] in ('concluido', 'erro'))
+
+    for rodada in range(args.repeticoes):
+        gerar_pdf(os.path.join(pasta, f'extrato_{tamanho}_{rodada}.pdf'), args.linhas_pdf,
+                  semente=tamanho * 1000 + rodada)
+    resultados.append(resumir('importacao_pdf', tamanho, cronometrar(importar_pdf, args.repeticoes),
+                              linhas=args.linhas_pdf))
+    # Reenvio dos mesmos extratos: a extração vem do cache e todas as linhas saem como duplicadas
+    resultados.append(resumir('reimportacao_pdf', tamanho, cronometrar(importar_pdf, args.repeticoes),
+                              linhas=args.linhas_pdf))
+    return resultados
+
+
+def versao_do_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados, caminho_anterior):
+    with open(caminho_anterior, encoding='utf-8') as arquivo:
+        anteriores = {(r['cenario'], r['transacoes']): r for r in json.load(arquivo)['resultados']}
+    print(f"\n{'cenário':<26}{'transações':>11}{'antes (ms)':>12}{'agora (ms)':>12}{'razão':>8}")
+    for r in resultados:
+        anterior = anteriores.get((r['cenario'], r['transacoes']))
+        # Importações com extratos de tamanhos diferentes não são comparáveis
+        if anterior and anterior.get('linhas') == r.get('linhas'):
+            print(f"{r['cenario']:<26}{r['transacoes']:>11}{anterior['mediana_ms']:>12.1f}{r['mediana_ms']:>12.1f}"
+                  f"{r['mediana_ms'] / anterior['mediana_ms']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 50000],
+                        help='transações por usuário em cada rodada de medições')
+    parser.add_argument('--usuarios', type=int, default=3, help='usuários gerados por tamanho (o 1º é o medido)')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--linhas-csv', type=int, default=500)
+    parser.add_argument('--linhas-pdf', type=int, default=300)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--usar-banco-configurado', action='store_true',
+                        help='usa DATABASE_URL em vez de um SQLite temporário (o banco recebe os dados gerados)')
+    parser.add_argument('--saida', help='grava os resultados em JSON neste caminho')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_app_')
+    if not args.usar_banco_configurado:
+        # Antes de importar o app: a configuração lê DATABASE_URL ao ser carregada
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(pasta, 'bench.db')
+    from app import app
+    from benchmarks.gerar_dados import popular
+    from static.cache_extracoes import CacheExtracoes
+    from static.cache_relatorios import CacheArquivos
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import hash_senha
+    from static.rotas import importacao, relatorios, usuarios
+
+    app.secret_key = app.secret_key or 'benchmark'
+    # Sem cache de relatórios (tamanho máximo 0) e sem limite de logins: mede-se o trabalho de cada rota
+    relatorios.cache_relatorios = CacheArquivos(os.path.join(pasta, 'relatorios'), 0)
+    # Cache de extrações vazio a cada execução: a primeira importação de cada PDF sempre o lê
+    importacao.cache_extracoes = CacheExtracoes(os.path.join(pasta, 'extracoes'), app.config['TAMANHO_CACHE_EXTRACOES'],
+                                                app.config['VALIDADE_CACHE_EXTRACOES'])
+    usuarios.limite_login_ip.limite = usuarios.limite_login_email.limite = 10 ** 9
+    with app.app_context():
+        aplicar_migracoes()
+        senha_hash = hash_senha('senha-bench', app.config['BCRYPT_ROUNDS'])
+
+    resultados = []
+    for tamanho in args.tamanhos:
+        inicio = time.perf_counter()
+        with app.app_context():
+            popular(args.usuarios, tamanho, semente=args.semente + tamanho, prefixo=f't{tamanho}_',
+                    senha_hash=senha_hash)
+        print(f"{tamanho} transações x {args.usuarios} usuários gerados em {time.perf_counter() - inicio:.1f}s")
+        cliente = app.test_client()
+        cliente.post('/login', data={'email': f't{tamanho}_0@bench.com', 'senha': 'senha-bench'})
+        for resultado in medir_tamanho(app, cliente, tamanho, args, pasta):
+            resultados.append(resultado)
+            print(f"  {resultado['cenario']:<26} mediana {resultado['mediana_ms']:9.1f} ms   "
+                  f"p95 {resultado['p95_ms']:9.1f} ms")
+
+    relatorio = {
+        'metadados': {'data': datetime.now().isoformat(timespec='seconds'), 'codigo': versao_do_codigo(),
+                      'python': platform.python_version(), 'plataforma': platform.platform(),
+                      'cpus': os.cpu_count(), 'banco': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+                      'parametros': vars(args)},
+        'resultados': resultados,
+    }
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    if args.comparar:
+        comparar(resultados, args.comparar)
+    if importacao.pool_importacao is not None:
+        importacao.pool_importacao.shutdown()
+
+
+if __name__ == '__main__':
+    main()
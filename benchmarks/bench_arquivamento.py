@@ -0,0 +1,111 @@
+"""Consultas do dia a dia antes e depois do arquivamento do histórico frio, e o custo das que leem o arquivo.
+
+Popula um SQLite temporário com `--usuarios` usuários de `--transacoes` lançamentos espalhados pelos
+últimos `--anos` anos, mede cada cenário, arquiva o que é anterior aos últimos `--meses` meses
+(arquivar_historico, o mesmo do `flask --app app arquivar`) e mede de novo. Antes da segunda medição,
+confere que saldo, totais por mês e por categoria e a exportação completa continuam iguais.
+Uso: python -m benchmarks.bench_arquivamento --usuarios 20 --transacoes 20000 --anos 5 --meses 12
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def cenarios(usuario_id, limite):
+    from static.database import busca, leituras, relatorios
+    from static.database.painel import resumo_dashboard
+
+    hoje = datetime.combine(date.today(), datetime.min.time())
+    recentes = hoje - timedelta(days=90)
+    amanha = hoje + timedelta(days=1)
+    # Os três últimos leem o arquivo depois do arquivamento
+    return {
+        'dashboard (resumo)': lambda: resumo_dashboard(usuario_id, hoje),
+        'listagem (1ª página)': lambda: leituras.pagina_transacoes(usuario_id, limite),
+        'busca (farmácia)': lambda: busca.buscar_transacoes(usuario_id, ['farmacia'], limite),
+        'busca 90 dias (pix)': lambda: busca.buscar_transacoes(usuario_id, ['pix'], limite, data_inicio=recentes),
+        'relatório 90 dias': lambda: relatorios.despesas_do_periodo(usuario_id, recentes, amanha),
+        'exportação 90 dias': lambda: list(relatorios.transacoes_para_exportar(usuario_id, recentes)),
+        'exportação completa': lambda: list(relatorios.transacoes_para_exportar(usuario_id)),
+        'busca sem resultado': lambda: busca.buscar_transacoes(usuario_id, ['inexistente'], limite),
+        'categorias 5 anos': lambda: relatorios.totais_por_categoria(usuario_id, hoje - timedelta(days=5 * 365),
+                                                                     amanha),
+    }
+
+
+def retrato(ids):
+    # O que o arquivamento não pode mudar, para todos os usuários
+    from static.database import relatorios
+    from static.rotas.comum import calcular_saldo
+
+    inicio, fim = datetime(2000, 1, 2), datetime.now() + timedelta(days=1)
+    return {usuario_id: (calcular_saldo(usuario_id), relatorios.totais_por_mes(usuario_id, inicio, fim),
+                         sorted(relatorios.totais_por_categoria(usuario_id, inicio, fim)),
+                         [tuple(linha) for linha in relatorios.transacoes_para_exportar(usuario_id)])
+            for usuario_id in ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--transacoes', type=int, default=20000, help='transações por usuário')
+    parser.add_argument('--anos', type=int, default=5)
+    parser.add_argument('--meses', type=int, default=12, help='meses completos mantidos em `transacoes`')
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_arquivamento.db')
+    from app import app
+    from sqlalchemy import func
+    from benchmarks.gerar_dados import popular
+    from static.database.arquivamento import arquivar_historico, limite_de_arquivamento
+    from static.database.busca import otimizar_indice_busca
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db, Transacao, TransacaoArquivada
+
+    limite = app.config['TRANSACOES_POR_PAGINA'] + 1
+    with app.app_context():
+        aplicar_migracoes()
+        inicio = time.perf_counter()
+        ids = popular(args.usuarios, args.transacoes, semente=args.semente, anos=args.anos, prefixo='arquivo')
+        print(f"{args.usuarios} usuários x {args.transacoes} transações gerados em "
+              f"{time.perf_counter() - inicio:.0f}s\n")
+        medidos = cenarios(ids[0], limite)
+        antes = {nome: cronometrar(funcao, args.repeticoes) for nome, funcao in medidos.items()}
+        esperado = retrato(ids)
+        db.session.rollback()
+
+        data_limite = limite_de_arquivamento(date.today(), args.meses)
+        inicio = time.perf_counter()
+        movidas = arquivar_historico(data_limite)
+        otimizar_indice_busca()
+        segundos = time.perf_counter() - inicio
+        recentes = db.session.query(func.count(Transacao.id_transacao)).scalar()
+        arquivadas = db.session.query(func.count(TransacaoArquivada.id_arquivada)).scalar()
+        print(f"Arquivadas {sum(movidas.values())} transações anteriores a {data_limite:%d/%m/%Y} em "
+              f"{segundos:.1f}s: ficam {recentes} em `transacoes` e {arquivadas} no arquivo")
+        assert retrato(ids) == esperado, 'o arquivamento mudou saldos, totais ou a exportação'
+        print("Saldos, totais por mês e categoria e exportação completa iguais aos de antes.\n")
+        db.session.rollback()
+        depois = {nome: cronometrar(funcao, args.repeticoes) for nome, funcao in medidos.items()}
+
+    print(f"{'cenário':<26}{'antes (ms)':>12}{'depois (ms)':>13}{'razão':>8}")
+    for nome in medidos:
+        print(f"{nome:<26}{antes[nome] * 1000:>12.2f}{depois[nome] * 1000:>13.2f}{depois[nome] / antes[nome]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Latência da busca de transações (/api/busca) com o índice de texto, em bases de até milhões de linhas.
+
+Popula um SQLite (temporário, ou o ficheiro de --banco, reaproveitado se já existir) com `--usuarios`
+usuários que somam `--transacoes` lançamentos, mais algumas transações com um termo raro por usuário, e
+mede a consulta de uma página para termos comuns, prefixos, termos raros, filtros e páginas seguintes.
+Para comparação, os mesmos termos são buscados com ILIKE '%termo%' nas três colunas, sem índice.
+Uso: python -m benchmarks.bench_busca --transacoes 1000000 --usuarios 20 --banco /tmp/busca.db
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+TERMO_RARO = 'Zanzibar'
+
+
+def cenarios(hoje):
+    inicio = (hoje - timedelta(days=90)).isoformat()
+    return {
+        'termo comum (pix)': {'q': 'pix'},
+        'beneficiário (farmácia)': {'q': 'farmácia'},
+        'prefixo (farm)': {'q': 'farm'},
+        'dois termos (pix mercado)': {'q': 'pix mercado'},
+        f'termo raro ({TERMO_RARO.lower()})': {'q': TERMO_RARO.lower()},
+        'sem resultado': {'q': 'inexistente'},
+        'termo + filtros': {'q': 'uber', 'tipo': 'despesa', 'de': inicio, 'ate': hoje.isoformat(),
+                            'valor_min': '20', 'valor_max': '200'},
+        'só filtros': {'tipo': 'receita', 'valor_min': '100'},
+    }
+
+
+def cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return resultado, statistics.median(tempos), tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+
+
+def popular_banco(args):
+    from sqlalchemy import func, insert
+    from benchmarks.gerar_dados import popular
+    from static.database.models import db, Transacao, Usuario
+    from static.database.saldos import registrar_insercoes
+
+    if db.session.query(func.count(Usuario.id_usuario)).scalar():
+        return db.session.query(func.min(Usuario.id_usuario)).scalar()
+    inicio = time.perf_counter()
+    ids = popular(args.usuarios, args.transacoes // args.usuarios, semente=args.semente, prefixo='busca')
+    rng = random.Random(args.semente)
+    raras = [{'descricao': f'COMPRA CARTAO - Restaurante {TERMO_RARO}', 'valor': Decimal('87.50'), 'tipo': 'despesa',
+              'beneficiario': f'Restaurante {TERMO_RARO}', 'categoria': 'Alimentação', 'id_usuario': id_usuario,
+              'data': datetime.now() - timedelta(days=rng.randrange(3 * 365))}
+             for id_usuario in ids for _ in range(5)]
+    db.session.execute(insert(Transacao), raras)
+    registrar_insercoes(db.session, raras)
+    db.session.commit()
+    print(f"{args.transacoes} transações em {args.usuarios} usuários geradas (com o índice de texto mantido pelos "
+          f"gatilhos) em {time.perf_counter() - inicio:.0f}s")
+    return ids[0]
+
+
+def busca_sem_indice(usuario_id, parametros, limite):
+    # Referência: o que seria preciso sem índice de texto (varredura de todas as linhas do usuário)
+    from sqlalchemy import or_, select
+    from static.database.leituras import COLUNAS_TRANSACAO
+    from static.database.models import db, Transacao
+    consulta = select(*COLUNAS_TRANSACAO).where(Transacao.id_usuario == usuario_id)
+    for termo in parametros.get('q', '').split():
+        consulta = consulta.where(or_(Transacao.descricao.ilike(f'%{termo}%'),
+                                      Transacao.beneficiario.ilike(f'%{termo}%'),
+                                      Transacao.categoria.ilike(f'%{termo}%')))
+    consulta = consulta.order_by(Transacao.data.desc(), Transacao.id_transacao.desc()).limit(limite)
+    return db.session.execute(consulta).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transacoes', type=int, default=1000000, help='total de transações, somando os usuários')
+    parser.add_argument('--usuarios', type=int, default=20)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--banco', help='ficheiro SQLite a usar (é populado só se estiver vazio)')
+    args = parser.parse_args()
+
+    caminho = args.banco or os.path.join(tempfile.mkdtemp(), 'bench_busca.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(caminho)
+    from app import app
+    from sqlalchemy import func
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db, Transacao
+    from static.rotas.painel import buscar_pagina_da_busca
+
+    limite = app.config['TRANSACOES_POR_PAGINA']
+    with app.app_context():
+        aplicar_migracoes()
+        usuario_id = popular_banco(args)
+        total = db.session.query(func.count(Transacao.id_transacao)).scalar()
+        do_usuario = db.session.query(func.count(Transacao.id_transacao)).filter_by(id_usuario=usuario_id).scalar()
+        print(f"Banco com {total} transações; o usuário medido tem {do_usuario}. Página de {limite} linhas.\n")
+        print(f"{'cenário':<30}{'linhas':>7}{'mediana (ms)':>14}{'p95 (ms)':>10}{'ILIKE mediana (ms)':>20}")
+        for nome, parametros in cenarios(date.today()).items():
+            (linhas, _), mediana, p95 = cronometrar(
+                lambda: buscar_pagina_da_busca(usuario_id, parametros), args.repeticoes)
+            referencia = ''
+            if 'q' in parametros and 'tipo' not in parametros:
+                _, mediana_ilike, _ = cronometrar(lambda: busca_sem_indice(usuario_id, parametros, limite + 1),
+                                                  max(3, args.repeticoes // 5))
+                referencia = f'{mediana_ilike * 1000:.1f}'
+            print(f"{nome:<30}{len(linhas):>7}{mediana * 1000:>14.1f}{p95 * 1000:>10.1f}{referencia:>20}")
+            db.session.rollback()
+
+        # Páginas seguintes: o cursor (data, id) continua do ponto exato, sem OFFSET
+        parametros = {'q': 'pix'}
+        for _ in range(4):
+            _, parametros['cursor'] = buscar_pagina_da_busca(usuario_id, parametros)
+        (linhas, _), mediana, p95 = cronometrar(lambda: buscar_pagina_da_busca(usuario_id, parametros),
+                                                args.repeticoes)
+        print(f"{'5ª página (pix)':<30}{len(linhas):>7}{mediana * 1000:>14.1f}{p95 * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
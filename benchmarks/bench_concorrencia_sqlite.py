@@ -0,0 +1,146 @@
+"""Escrita concorrente no SQLite por vários processos, como os workers do gunicorn.
+
+Cada processo importa o app (com o banco apontado para um ficheiro temporário), lança transações de um
+usuário próprio pelo ORM (o que também atualiza saldo e resumo mensal) e lê o dashboard a cada escrita,
+enquanto `--leitores` processos exportam o histórico em streaming devagar, como para um cliente lento.
+Compara o SQLite sem ajustes (journal de rollback, timeout de 5s do driver) com os PRAGMAs da
+configuração (WAL, synchronous=NORMAL, busy_timeout) e conta os erros "database is locked".
+Uso: python -m benchmarks.bench_concorrencia_sqlite --processos 8 --escritas 200
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+HISTORICO = 5000
+
+
+def trabalhador(banco, pragmas, id_usuario, escritas, largada):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + banco
+    from static.database.config import Config
+    Config.SQLITE_PRAGMAS = pragmas
+    from sqlalchemy.exc import OperationalError
+    from app import app
+    from static.database.models import db, Transacao
+    from static.database.painel import resumo_dashboard
+
+    travados, maior_espera = 0, 0.0
+    largada.wait()
+    with app.app_context():
+        for i in range(escritas):
+            try:
+                db.session.add(Transacao(descricao=f'Lançamento {i}', valor=Decimal('1.00'), tipo='receita',
+                                         categoria='Outros', id_usuario=id_usuario))
+                inicio = time.perf_counter()
+                db.session.commit()
+                maior_espera = max(maior_espera, time.perf_counter() - inicio)
+                resumo_dashboard(id_usuario, date.today())
+                db.session.commit()
+            except OperationalError as erro:
+                db.session.rollback()
+                if 'locked' not in str(erro):
+                    raise
+                travados += 1
+    return travados, maior_espera
+
+
+def leitor_lento(banco, pragmas, id_usuario, largada, parar):
+    # Uma exportação em streaming para um cliente lento: a leitura fica aberta enquanto os lotes são enviados
+    os.environ['DATABASE_URL'] = 'sqlite:///' + banco
+    from static.database.config import Config
+    Config.SQLITE_PRAGMAS = pragmas
+    from app import app
+    from static.database.models import db
+    from static.database.relatorios import transacoes_para_exportar
+
+    leituras = 0
+    largada.wait()
+    with app.app_context():
+        while not parar.is_set():
+            # Cada exportação leva ~8s (lotes de 1000 linhas), mais que o timeout padrão de 5s do driver sqlite3
+            for numero, _ in enumerate(transacoes_para_exportar(id_usuario)):
+                if numero % 500 == 0:
+                    time.sleep(0.8)
+            db.session.commit()
+            leituras += 1
+    return leituras
+
+
+def preparar(banco, pragmas, processos):
+    # journal_mode=WAL fica gravado no ficheiro: a preparação precisa usar os mesmos PRAGMAs do cenário
+    os.environ['DATABASE_URL'] = 'sqlite:///' + banco
+    from static.database.config import Config
+    Config.SQLITE_PRAGMAS = pragmas
+    from app import app
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db, Usuario, Transacao
+    with app.app_context():
+        aplicar_migracoes()
+        usuarios = [Usuario(nome=f'Usuário {i}', email=f'u{i}@bench.com', senha='-') for i in range(processos)]
+        db.session.add_all(usuarios)
+        db.session.commit()
+        # Histórico do usuário exportado pelo leitor lento
+        db.session.add_all(Transacao(descricao=f'Histórico {i}', valor=Decimal('1.00'), tipo='receita',
+                                     id_usuario=usuarios[0].id_usuario) for i in range(HISTORICO))
+        db.session.commit()
+        return [u.id_usuario for u in usuarios]
+
+
+def conferir(banco):
+    conexao = sqlite3.connect(banco)
+    try:
+        return conexao.execute('SELECT (SELECT COUNT(*) FROM transacoes), (SELECT SUM(total_receita) FROM saldos_usuarios)') \
+            .fetchone()
+    finally:
+        conexao.close()
+
+
+def medir(pragmas, processos, escritas, leitores):
+    # Cada cenário usa processos novos: o app lê DATABASE_URL e os PRAGMAs ao ser importado
+    banco = os.path.join(tempfile.mkdtemp(), 'concorrencia.db')
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(1) as pool:
+        ids = pool.apply(preparar, (banco, pragmas, processos))
+
+    with contexto.Manager() as gerente:
+        largada, parar = gerente.Event(), gerente.Event()
+        with contexto.Pool(processos + leitores) as pool:
+            pendentes = [pool.apply_async(trabalhador, (banco, pragmas, id_usuario, escritas, largada))
+                         for id_usuario in ids]
+            leituras = [pool.apply_async(leitor_lento, (banco, pragmas, ids[0], largada, parar))
+                        for _ in range(leitores)]
+            time.sleep(5)  # tempo para todos importarem o app antes da largada
+            inicio = time.perf_counter()
+            largada.set()
+            resultados = [p.get() for p in pendentes]
+            duracao = time.perf_counter() - inicio
+            parar.set()
+            exportacoes = sum(leitura.get() for leitura in leituras)
+    travados = sum(t for t, _ in resultados)
+    maior_espera = max(espera for _, espera in resultados)
+    return (duracao, travados, maior_espera, exportacoes) + conferir(banco)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processos', type=int, default=8)
+    parser.add_argument('--escritas', type=int, default=200)
+    parser.add_argument('--leitores', type=int, default=1, help='exportações lentas rodando durante as escritas')
+    args = parser.parse_args()
+
+    from static.database.config import Config
+    cenarios = {'sem PRAGMAs (journal de rollback)': {}, 'PRAGMAs da configuração (WAL)': Config.SQLITE_PRAGMAS}
+    total = args.processos * args.escritas
+    for nome, pragmas in cenarios.items():
+        duracao, travados, maior_espera, exportacoes, gravadas, receitas = medir(pragmas, args.processos, args.escritas, args.leitores)
+        print(f"{nome}: {duracao:6.2f}s, {total / duracao:7.0f} escritas/s, {travados} 'database is locked', "
+              f"maior espera num commit {maior_espera:5.2f}s, {exportacoes} exportações concluídas, "
+              f"{gravadas - HISTORICO}/{total} gravadas, saldo confere: {gravadas == receitas}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Compara o classificador de linhas do ExtratorPDF com a implementação anterior (regex não compiladas).
+
+Verifica que as duas produzem exatamente as mesmas transações sobre um corpus sintético e mede linhas/s.
+Uso: python -m benchmarks.bench_extrator --linhas 50000
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+
+from static.extrator_pdf import ExtratorPDF
+from benchmarks.gerar_extrato import gerar_linhas
+
+
+# Cópia do classificador original, mantida como referência de saída e de desempenho
+class ExtratorLegado:
+    def __init__(self):
+        self.padroes_data = [r'\b(\d{2})[/\-.](\d{2})[/\-.](\d{4})\b', r'\b(\d{2})[/\-.](\d{2})[/\-.](\d{2})\b',
+                             r'\b(\d{4})[/\-.](\d{2})[/\-.](\d{2})\b']
+        self.padroes_valor = [r'R?\$?\s*(-?\d{1,3}(?:\.\d{3})*,\d{2})', r'(-?\d{1,3}(?:\.\d{3})*,\d{2})',
+                              r'(-?\d+,\d{2})']
+        self.palavras_despesa = ['débito', 'debito', 'pagamento', 'compra', 'saque', 'tarifa', 'taxa', 'anuidade',
+                                 'iof', 'juros', 'transferência enviada', 'pix enviado', 'ted enviada']
+        self.palavras_receita = ['crédito', 'credito', 'depósito', 'deposito', 'salário', 'salario', 'recebimento',
+                                 'transferência recebida', 'pix recebido', 'ted recebida', 'rendimento']
+        self.palavras_ignorar = ['saldo', 'saldo anterior', 'saldo atual', 'total', 'lançamentos futuros', 'página',
+                                 'extrato', 'período', 'agência', 'conta', 'titular', 'cpf', 'cnpj']
+
+    def limpar_valor(self, valor_str):
+        valor_str = valor_str.replace('R$', '').replace(' ', '').strip();
+        negativo = valor_str.startswith('-');
+        valor_str = valor_str.lstrip('-');
+        valor_str = valor_str.replace('.', '').replace(',', '.')
+        try:
+            valor = float(valor_str);
+            return -valor if negativo else valor
+        except:
+            return 0.0
+
+    def extrair_data(self, texto):
+        for padrao in self.padroes_data:
+            match = re.search(padrao, texto)
+            if match:
+                grupos = match.groups()
+                if len(grupos[0]) == 2:
+                    dia, mes, ano = grupos;
+                    if len(ano) == 2: ano = '20' + ano
+                    try:
+                        data = datetime(int(ano), int(mes), int(dia)); return data.strftime('%Y-%m-%d')
+                    except:
+                        pass
+                elif len(grupos[0]) == 4:
+                    ano, mes, dia = grupos
+                    try:
+                        data = datetime(int(ano), int(mes), int(dia)); return data.strftime('%Y-%m-%d')
+                    except:
+                        pass
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def extrair_valor(self, texto):
+        for padrao in self.padroes_valor:
+            match = re.search(padrao, texto)
+            if match: return self.limpar_valor(match.group(1))
+        return 0.0
+
+    def identificar_tipo(self, texto, valor):
+        texto_lower = texto.lower();
+        if valor < 0: return 'despesa'
+        for palavra in self.palavras_despesa:
+            if palavra in texto_lower: return 'despesa'
+        for palavra in self.palavras_receita:
+            if palavra in texto_lower: return 'receita'
+        return 'receita' if valor > 0 else 'despesa'
+
+    def deve_ignorar(self, texto):
+        texto_lower = texto.lower();
+        if len(texto.strip()) < 10: return True
+        for palavra in self.palavras_ignorar:
+            if palavra in texto_lower: return True
+        return False
+
+    def extrair_descricao(self, texto, valor_str):
+        descricao = texto
+        for padrao in self.padroes_data: descricao = re.sub(padrao, '', descricao)
+        descricao = descricao.replace(valor_str, '');
+        descricao = re.sub(r'R?\$?\s*-?\d+[\.,]\d+', '', descricao);
+        descricao = ' '.join(descricao.split())
+        return descricao.strip() or "Transação"
+    def classificar_linha(self, linha):
+        if not linha.strip() or self.deve_ignorar(linha): return None
+        valor = self.extrair_valor(linha)
+        if valor == 0.0: return None
+        data = self.extrair_data(linha);
+        tipo = self.identificar_tipo(linha, valor);
+        descricao = self.extrair_descricao(linha, str(valor))
+        beneficiario = descricao.split('-')[0].strip()[:100]
+        if not beneficiario: beneficiario = "Não informado"
+        return {'data': data, 'descricao': descricao[:255], 'valor': abs(valor), 'tipo': tipo,
+                'beneficiario': beneficiario}
+
+
+def medir(extrator, linhas, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = [extrator.classificar_linha(linha) for linha in linhas]
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return resultado, len(linhas) / melhor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=50000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    linhas = list(gerar_linhas(args.linhas))
+    saida_antes, velocidade_antes = medir(ExtratorLegado(), linhas, args.repeticoes)
+    saida_depois, velocidade_depois = medir(ExtratorPDF(), linhas, args.repeticoes)
+
+    divergencias = [(linha, a, d) for linha, a, d in zip(linhas, saida_antes, saida_depois) if a != d]
+    for linha, antes, depois in divergencias[:10]:
+        print(f"DIVERGÊNCIA: {linha!r}\n  antes:  {antes}\n  depois: {depois}")
+    print(f"linhas: {len(linhas)}  transações: {sum(1 for t in saida_depois if t)}  divergências: {len(divergencias)}")
+    print(f"antes:  {velocidade_antes:,.0f} linhas/s")
+    print(f"depois: {velocidade_depois:,.0f} linhas/s ({velocidade_depois / velocidade_antes:.2f}x)")
+    raise SystemExit(1 if divergencias else 0)
@@ -0,0 +1,181 @@
+"""Tempo de importação do app e memória de cada worker no modelo de processos do gunicorn (preload + fork).
+
+Primeiro, `--repeticoes` processos novos do Python importam o app; cada um informa o tempo do `import`, o RSS
+logo depois e quais bibliotecas pesadas (pdfplumber, fpdf, numpy) ficaram carregadas. Depois, este processo
+faz o papel do mestre: importa o app, cria um usuário com `--transacoes` lançamentos num SQLite temporário e
+faz fork de `--workers` filhos. Cada filho faz login e atende `--requisicoes` pedidos ao dashboard (com
+--relatorio, também um relatório em PDF). Com todos vivos, cada um informa RSS e PSS; o PSS reparte as
+páginas compartilhadas entre os processos que as usam. Só roda no Linux (/proc).
+
+Só usa `app.app` e as URLs, então roda igual num checkout anterior: use --saida num e --comparar no outro.
+Uso: python -m benchmarks.bench_inicializacao --workers 4 --relatorio --saida inicio.json
+     python -m benchmarks.bench_inicializacao --workers 4 --relatorio --comparar inicio.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULOS_PESADOS = ('pdfplumber', 'fpdf', 'numpy')
+
+# Executado num processo novo: mede só o import do app
+CODIGO_IMPORTACAO = f'''
+import json, sys, time
+inicio = time.perf_counter()
+import app
+segundos = time.perf_counter() - inicio
+rss = [int(l.split()[1]) for l in open('/proc/self/status') if l.startswith('VmRSS:')][0]
+print(json.dumps({{'segundos': segundos, 'rss_kib': rss,
+                  'pesados': [m for m in {MODULOS_PESADOS!r} if m in sys.modules]}}))
+'''
+
+
+def memoria_kib():
+    with open('/proc/self/status') as arquivo:
+        rss = next(int(linha.split()[1]) for linha in arquivo if linha.startswith('VmRSS:'))
+    with open('/proc/self/smaps_rollup') as arquivo:
+        pss = next(int(linha.split()[1]) for linha in arquivo if linha.startswith('Pss:'))
+    return rss, pss
+
+
+def medir_importacao(repeticoes, ambiente):
+    medicoes = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', CODIGO_IMPORTACAO], capture_output=True, text=True,
+                               env=ambiente, check=True).stdout
+        medicoes.append(json.loads(saida.strip().splitlines()[-1]))
+    return {'import_mediana_ms': round(statistics.median(m['segundos'] for m in medicoes) * 1000, 1),
+            'import_rss_mib': round(statistics.median(m['rss_kib'] for m in medicoes) / 1024, 1),
+            'pesados_no_import': medicoes[0]['pesados']}
+
+
+def worker(app, args, pronto, medir, resultado):
+    # Processo filho: atende os pedidos, avisa o mestre e só mede a memória quando todos os irmãos existem
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'inicio0@bench.com', 'senha': 'senha-bench'})
+    tempos = {}
+    inicio = time.perf_counter()
+    for rodada in range(args.requisicoes):
+        assert cliente.get('/dashboard').status_code == 200
+        cliente.get('/api/resumo')
+        if rodada == 0:
+            tempos['primeiro_dashboard_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    if args.relatorio:
+        inicio = time.perf_counter()
+        resposta = cliente.get('/gerar-relatorio-pdf?periodo=12meses&tipo=meses')
+        assert resposta.status_code == 200 and resposta.mimetype == 'application/pdf', resposta.status_code
+        tempos['primeiro_relatorio_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    os.write(pronto, b'.')
+    os.read(medir, 1)
+    rss, pss = memoria_kib()
+    carregados = [m for m in MODULOS_PESADOS if m in sys.modules]
+    os.write(resultado, json.dumps({'rss_kib': rss, 'pss_kib': pss, 'pesados': carregados, **tempos}).encode())
+
+
+def medir_workers(app, args):
+    pronto_l, pronto_e = os.pipe()
+    medir_l, medir_e = os.pipe()
+    filhos = []
+    for _ in range(args.workers):
+        resultado_l, resultado_e = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                os.close(resultado_l)
+                worker(app, args, pronto_e, medir_l, resultado_e)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                codigo = 1
+            finally:
+                os._exit(codigo)
+        os.close(resultado_e)
+        filhos.append((pid, resultado_l))
+    for _ in filhos:
+        os.read(pronto_l, 1)
+    os.write(medir_e, b'.' * len(filhos))
+    medicoes = []
+    for pid, resultado_l in filhos:
+        with os.fdopen(resultado_l) as leitor:
+            dados = leitor.read()
+        _, estado = os.waitpid(pid, 0)
+        if estado != 0:
+            raise RuntimeError(f'worker {pid} falhou')
+        medicoes.append(json.loads(dados))
+    rss_mestre, pss_mestre = memoria_kib()
+    resumo = {
+        'workers': len(medicoes),
+        'mestre_rss_mib': round(rss_mestre / 1024, 1),
+        'worker_rss_mib': round(statistics.median(m['rss_kib'] for m in medicoes) / 1024, 1),
+        'worker_pss_mib': round(statistics.median(m['pss_kib'] for m in medicoes) / 1024, 1),
+        'pss_total_mib': round((pss_mestre + sum(m['pss_kib'] for m in medicoes)) / 1024, 1),
+        'pesados_no_worker': medicoes[0]['pesados'],
+        'primeiro_dashboard_ms': round(statistics.median(m['primeiro_dashboard_ms'] for m in medicoes), 1),
+    }
+    if args.relatorio:
+        resumo['primeiro_relatorio_ms'] = round(statistics.median(m['primeiro_relatorio_ms'] for m in medicoes), 1)
+    return resumo
+
+
+def comparar(resultados, caminho_anterior):
+    with open(caminho_anterior, encoding='utf-8') as arquivo:
+        anteriores = json.load(arquivo)['resultados']
+    print(f"\n{'medida':<24}{'antes':>10}{'agora':>10}{'razão':>8}")
+    for chave, valor in resultados.items():
+        anterior = anteriores.get(chave)
+        if isinstance(valor, (int, float)) and isinstance(anterior, (int, float)) and anterior:
+            print(f"{chave:<24}{anterior:>10}{valor:>10}{valor / anterior:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeticoes', type=int, default=5, help='processos novos medindo o import do app')
+    parser.add_argument('--requisicoes', type=int, default=20, help='pedidos ao dashboard por worker')
+    parser.add_argument('--transacoes', type=int, default=2000)
+    parser.add_argument('--relatorio', action='store_true', help='cada worker gera também um relatório em PDF')
+    parser.add_argument('--saida', help='grava os resultados em JSON neste caminho')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='bench_inicio_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(pasta, 'inicio.db')
+    # Caches de relatórios e resumos também na pasta do benchmark: nada de uma execução anterior é reaproveitado
+    os.environ['TMPDIR'] = tempfile.tempdir = pasta
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    resultados = medir_importacao(args.repeticoes, dict(os.environ))
+    print(f"import do app: mediana {resultados['import_mediana_ms']} ms, RSS {resultados['import_rss_mib']} MiB, "
+          f"bibliotecas pesadas carregadas: {', '.join(resultados['pesados_no_import']) or 'nenhuma'}")
+
+    from app import app
+    from benchmarks.gerar_dados import popular
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db, hash_senha
+    with app.app_context():
+        aplicar_migracoes()
+        popular(1, args.transacoes, prefixo='inicio',
+                senha_hash=hash_senha('senha-bench', app.config['BCRYPT_ROUNDS']))
+        # Como no on_starting do gunicorn: nenhum worker herda conexões abertas no mestre
+        db.engine.dispose()
+    resultados.update(medir_workers(app, args))
+    print(f"{resultados['workers']} workers: RSS {resultados['worker_rss_mib']} MiB e PSS "
+          f"{resultados['worker_pss_mib']} MiB cada (mediana); "
+          f"PSS total com o mestre {resultados['pss_total_mib']} MiB")
+    print(f"  primeiro dashboard {resultados['primeiro_dashboard_ms']} ms"
+          + (f", primeiro relatório {resultados['primeiro_relatorio_ms']} ms" if args.relatorio else '')
+          + f"; carregadas no worker: {', '.join(resultados['pesados_no_worker']) or 'nenhuma'}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, arquivo, ensure_ascii=False, indent=2)
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Tempo e memória para ler e renderizar N linhas de transações: instâncias ORM + to_dict() contra Rows.
+
+O caminho antigo (objetos Transacao copiados em dicionários, com float e data em texto) é mantido aqui
+como referência. Os dois renderizam a mesma linha de tabela do dashboard; o pico de
+memória é medido com tracemalloc durante consulta + renderização.
+Uso: python -m benchmarks.bench_leituras --linhas 10000 --repeticoes 5
+"""
+import argparse
+import gc
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+LINHA_TABELA = '''{% for transacao in transacoes %}<tr><td>{{ DATA }}</td>
+<td><span class="badge text-bg-{{ 'success' if transacao.tipo == 'receita' else 'danger' }}">{{ transacao.tipo | capitalize }}</span></td>
+<td><span class="badge badge-categoria" style="background-color: {{ cores.get(transacao.categoria, '#6c757d') }};">{{ transacao.categoria | default('Outros') }}</span></td>
+<td class="fw-bold text-end">{{ transacao.valor | format_brl }}</td><td>{{ transacao.descricao }}</td><td>{{ transacao.beneficiario }}</td>
+<td><a href="{{ url_for('editar_transacao', id=transacao.id) }}">e</a></td></tr>{% endfor %}'''
+
+
+def ler_legado(usuario_id, linhas):
+    from static.database.models import Transacao
+    transacoes = Transacao.query.filter(Transacao.id_usuario == usuario_id) \
+        .order_by(Transacao.data.desc(), Transacao.id_transacao.desc()).limit(linhas).all()
+    return [t.to_dict() for t in transacoes]
+
+
+def ler_novo(usuario_id, linhas):
+    from static.database.leituras import pagina_transacoes
+    return pagina_transacoes(usuario_id, linhas)
+
+
+def medir(app, db, ler, modelo, usuario_id, linhas, repeticoes):
+    # Tempo sem tracemalloc (que deixa tudo várias vezes mais lento); o pico de memória numa rodada à parte
+    def rodada():
+        with app.test_request_context():
+            html = modelo.render(transacoes=ler(usuario_id, linhas), cores={})
+            db.session.remove()
+        return html
+
+    tempos = []
+    for _ in range(repeticoes):
+        gc.collect()
+        inicio = time.perf_counter()
+        html = rodada()
+        tempos.append(time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    rodada()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(tempos), pico, html
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_leituras.db')
+    from app import app
+    from benchmarks.gerar_dados import popular
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db
+
+    with app.app_context():
+        aplicar_migracoes()
+        usuario_id, = popular(1, args.linhas)
+
+    modelos = {
+        'ORM + to_dict()': (ler_legado, app.jinja_env.from_string(
+            LINHA_TABELA.replace('DATA', "transacao.data.split('T')[0]"))),
+        'Rows (leituras.py)': (ler_novo, app.jinja_env.from_string(
+            LINHA_TABELA.replace('DATA', "transacao.data.strftime('%Y-%m-%d')"))),
+    }
+    htmls = []
+    for nome, (ler, modelo) in modelos.items():
+        tempo, pico, html = medir(app, db, ler, modelo, usuario_id, args.linhas, args.repeticoes)
+        htmls.append(html)
+        print(f"{nome:<20} {tempo * 1000:8.1f} ms  pico de memória {pico / 2 ** 20:6.1f} MiB")
+    print(f"HTML idêntico: {htmls[0] == htmls[1]}")
+
+
+if __name__ == '__main__':
+    main()
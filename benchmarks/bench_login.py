@@ -0,0 +1,120 @@
+"""Latência do dashboard durante uma rajada de logins.
+
+Sobe o app num servidor WSGI com threads (banco SQLite temporário), mantém um cliente consultando o
+dashboard sem parar e, no meio da medição, dispara `--logins` tentativas simultâneas. Compara o bcrypt
+limitado (ExecutorSenhas com a configuração do app) com o comportamento antigo, em que cada thread de
+requisição roda o bcrypt diretamente (simulado com um executor sem limite).
+Uso: python -m benchmarks.bench_login --logins 200 --duracao 10
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from werkzeug.serving import make_server
+
+from static.database.config import Config
+
+
+def cliente():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+
+def postar(abridor, url, dados):
+    try:
+        return abridor.open(url, data=urllib.parse.urlencode(dados).encode(), timeout=120).status
+    except urllib.error.HTTPError as erro:
+        return erro.code
+    except OSError:
+        # Conexão recusada/derrubada pelo servidor sobrecarregado também conta como resposta da rajada
+        return None
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(base, logins, duracao):
+    painel = cliente()
+    postar(painel, base + '/login', {'email': 'painel@bench.com', 'senha': 'senha-do-painel'})
+    latencias_antes, latencias_durante = [], []
+    fim = time.monotonic() + duracao
+    rajada_iniciada = threading.Event()
+
+    def rajada():
+        time.sleep(duracao / 4)
+        rajada_iniciada.set()
+        threads = [threading.Thread(target=postar, args=(cliente(), base + '/login', {
+            'email': f'usuario{i % 20}@bench.com', 'senha': 'senha-incorreta' if i % 2 else 'senha-do-usuario'}))
+                   for i in range(logins)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    disparo = threading.Thread(target=rajada)
+    disparo.start()
+    while time.monotonic() < fim:
+        inicio = time.perf_counter()
+        painel.open(base + '/dashboard', timeout=120).read()
+        (latencias_durante if rajada_iniciada.is_set() else latencias_antes).append(time.perf_counter() - inicio)
+    disparo.join()
+    return latencias_antes, latencias_durante
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--duracao', type=float, default=10)
+    args = parser.parse_args()
+
+    banco = os.path.join(tempfile.mkdtemp(), 'bench_login.db')
+    Config.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + banco
+    from app import app
+    from static.rotas import usuarios
+    from static.database.autenticacao import ExecutorSenhas
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db, Usuario, hash_senha
+    app.secret_key = app.secret_key or 'benchmark'
+    # Rajadas de várias origens: o limitador por IP ficaria com todo o mérito num teste com um único IP
+    usuarios.limite_login_ip.limite = usuarios.limite_login_email.limite = 10 ** 9
+
+    with app.app_context():
+        aplicar_migracoes()
+        rounds = app.config['BCRYPT_ROUNDS']
+        db.session.add(Usuario(nome='Painel', email='painel@bench.com', senha=hash_senha('senha-do-painel', rounds)))
+        db.session.add_all(Usuario(nome=f'Usuário {i}', email=f'usuario{i}@bench.com',
+                                   senha=hash_senha('senha-do-usuario', rounds)) for i in range(20))
+        db.session.commit()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    servidor = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{servidor.server_port}'
+
+    cenarios = {
+        'sem limite (bcrypt na thread da requisição)': ExecutorSenhas(workers=args.logins, max_pendentes=args.logins,
+                                                                      rounds=rounds, timeout=600),
+        'executor limitado (configuração do app)': usuarios.executor_senhas,
+    }
+    for nome, executor in cenarios.items():
+        usuarios.executor_senhas = executor
+        antes, durante = medir(base, args.logins, args.duracao)
+        print(f"{nome}:")
+        print(f"  dashboard antes da rajada: p50 {statistics.median(antes) * 1000:7.1f} ms  "
+              f"p99 {percentil(antes, 0.99) * 1000:7.1f} ms  ({len(antes)} req)")
+        print(f"  dashboard durante a rajada: p50 {statistics.median(durante) * 1000:7.1f} ms  "
+              f"p99 {percentil(durante, 0.99) * 1000:7.1f} ms  ({len(durante)} req)")
+    servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Compara a geração do relatório de despesas em PDF antes e depois do motor em static/relatorio_pdf.py.
+
+O gerador antigo (fontes analisadas a cada documento, truncamento cortando um caractere por vez) é mantido
+aqui como referência. Confere que os textos truncados são idênticos e mede o tempo de cada um.
+Uso: python -m benchmarks.bench_relatorio --linhas 100 1000 5000 20000 50000 --max-legado 5000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+from benchmarks.gerar_extrato import BENEFICIARIOS, HISTORICOS_DESPESA
+from static.relatorio_pdf import PASTA_FONTES, PADDING, relatorio_despesas, truncar
+
+CATEGORIAS = ['Moradia', 'Alimentação', 'Transporte', 'Lazer', 'Saúde', 'Investimento', 'Outros',
+              'Contas Programadas', 'Assinaturas e serviços de streaming']
+
+
+def formatar_moeda(valor):
+    return f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def gerar_despesas(quantidade, semente=42):
+    rng = random.Random(semente)
+    inicio = datetime(2024, 1, 1)
+    despesas = []
+    for i in range(quantidade):
+        descricao = f"{rng.choice(HISTORICOS_DESPESA)} - {rng.choice(BENEFICIARIOS)}"
+        if rng.random() < 0.5:
+            descricao += ' - ' + ' '.join(rng.choice(BENEFICIARIOS) for _ in range(rng.randint(1, 4)))
+        despesas.append((inicio + timedelta(minutes=37 * i), descricao, rng.choice(CATEGORIAS),
+                         Decimal(rng.randint(100, 500000)) / 100))
+    return despesas
+
+
+class PDFLegado(FPDF):
+    def __init__(self):
+        super().__init__()
+        self.add_font('DejaVu', '', os.path.join(PASTA_FONTES, 'DejaVuSans.ttf'))
+        self.add_font('DejaVu', 'B', os.path.join(PASTA_FONTES, 'DejaVuSans-Bold.ttf'))
+        self.add_font('DejaVu', 'I', os.path.join(PASTA_FONTES, 'DejaVuSans-Oblique.ttf'))
+
+
+def truncar_legado(pdf, texto, largura):
+    if pdf.get_string_width(texto) > largura - PADDING:
+        while pdf.get_string_width(texto + '...') > largura - PADDING:
+            texto = texto[:-1]
+        texto += '...'
+    return texto
+
+
+def relatorio_legado(despesas):
+    pdf = PDFLegado()
+    pdf.add_page()
+    pdf.set_font('DejaVu', '', 10)
+    textos = []
+    for data, descricao, categoria, valor in despesas:
+        descricao_texto, categoria_texto = truncar_legado(pdf, descricao, 85), truncar_legado(pdf, categoria, 40)
+        textos.append((descricao_texto, categoria_texto))
+        pdf.cell(25, 10, data.strftime('%d/%m/%Y'), border=1, new_x=XPos.RIGHT, new_y=YPos.TOP)
+        pdf.cell(85, 10, descricao_texto, border=1, new_x=XPos.RIGHT, new_y=YPos.TOP)
+        pdf.cell(40, 10, categoria_texto, border=1, new_x=XPos.RIGHT, new_y=YPos.TOP)
+        pdf.cell(30, 10, formatar_moeda(valor), border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='R')
+    return bytes(pdf.output()), textos
+
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=[100, 1000, 5000, 20000, 50000])
+    parser.add_argument('--max-legado', type=int, default=5000,
+                        help='maior quantidade de linhas medida também com o gerador antigo')
+    args = parser.parse_args()
+
+    # As fontes são analisadas uma vez por processo; o custo aparece só aqui, fora das medições
+    tempo_fontes, _ = medir(relatorio_despesas, 'Aquecimento', gerar_despesas(1), formatar_moeda)
+    print(f"análise das fontes + 1º documento: {tempo_fontes:.2f}s")
+
+    for quantidade in args.linhas:
+        despesas = gerar_despesas(quantidade)
+        truncar.cache_clear()
+        tempo_novo, _ = medir(relatorio_despesas, 'Benchmark', despesas, formatar_moeda)
+        linha = f"{quantidade:>6} linhas: novo {tempo_novo:7.2f}s ({quantidade / tempo_novo:8.0f} linhas/s)"
+        if quantidade <= args.max_legado:
+            tempo_legado, (_, textos) = medir(relatorio_legado, despesas)
+            divergencias = sum(1 for (_, d, c, _), (dl, cl) in zip(despesas, textos)
+                               if (truncar(d, 85 - PADDING), truncar(c, 40 - PADDING)) != (dl, cl))
+            linha += f" | legado {tempo_legado:7.2f}s | {tempo_legado / tempo_novo:5.2f}x | " \
+                     f"{divergencias} truncamentos divergentes"
+        print(linha)
+
+
+if __name__ == '__main__':
+    main()
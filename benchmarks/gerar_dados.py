@@ -0,0 +1,138 @@
+"""Popula o banco configurado (DATABASE_URL) com usuários sintéticos para testes de carga.
+
+Cada usuário recebe `--transacoes` lançamentos espalhados pelos últimos `--anos` anos, com categorias
+coerentes com o beneficiário (o que o índice de sugestões aprende), metas mensais e gastos programados.
+A mesma semente gera sempre os mesmos dados. Também gera extratos em CSV no formato que o importador lê.
+Uso: python -m benchmarks.gerar_dados --usuarios 10 --transacoes 20000
+     python -m benchmarks.gerar_dados --csv extrato.csv --linhas 1000
+"""
+import argparse
+import csv
+import io
+import random
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from benchmarks.gerar_extrato import HISTORICOS_DESPESA, HISTORICOS_RECEITA, BENEFICIARIOS
+
+CATEGORIA_DO_BENEFICIARIO = {
+    'Mercado Bom Preço': 'Alimentação', 'Padaria Pão Quente': 'Alimentação', 'Posto Ipiranga': 'Transporte',
+    'Uber Trip': 'Transporte', 'Netflix': 'Lazer', 'Farmácia São João': 'Saúde',
+    'Condomínio Res. Flores': 'Moradia', 'Maria Souza': 'Outros', 'João Pereira': 'Outros',
+    'Empresa XPTO Ltda': 'Investimento',
+}
+TAMANHO_LOTE = 5000
+
+
+def gerar_transacoes(id_usuario, quantidade, rng, anos=3, hoje=None):
+    """Dicionários prontos para insert(Transacao); receitas maiores que despesas mantêm o saldo positivo."""
+    fim = datetime.combine(hoje or date.today(), datetime.min.time())
+    segundos = int(timedelta(days=365 * anos).total_seconds())
+    for _ in range(quantidade):
+        beneficiario = rng.choice(BENEFICIARIOS)
+        valor = Decimal(str(round(rng.lognormvariate(4, 1.0), 2))) + Decimal('0.01')
+        if rng.random() < 0.25:
+            tipo, historico, valor = 'receita', rng.choice(HISTORICOS_RECEITA), valor * 4
+        else:
+            tipo, historico = 'despesa', rng.choice(HISTORICOS_DESPESA)
+        yield {'descricao': f'{historico} - {beneficiario}', 'valor': valor, 'tipo': tipo,
+               'beneficiario': beneficiario, 'categoria': CATEGORIA_DO_BENEFICIARIO[beneficiario] if tipo == 'despesa'
+               else 'Outros', 'data': fim - timedelta(seconds=rng.randrange(segundos)), 'id_usuario': id_usuario}
+
+
+def popular(usuarios, transacoes, semente=42, anos=3, prefixo='usuario', senha_hash='-'):
+    """Cria os usuários com histórico, metas e gastos programados; devolve os ids, na ordem de criação.
+
+    As transações entram por INSERT em massa, com saldo e resumos mensais mantidos por registrar_insercoes,
+    o mesmo caminho da importação.
+    """
+    from sqlalchemy import insert
+    from static.database.models import db, Usuario, Transacao, Meta, GastoProgramado
+    from static.database.saldos import registrar_insercoes
+
+    rng = random.Random(semente)
+    hoje = date.today()
+    ids = []
+    for numero in range(usuarios):
+        usuario = Usuario(nome=f'Usuário {prefixo} {numero}', email=f'{prefixo}{numero}@bench.com', senha=senha_hash)
+        db.session.add(usuario)
+        db.session.commit()
+        ids.append(usuario.id_usuario)
+
+        lote = []
+        for linha in gerar_transacoes(usuario.id_usuario, transacoes, rng, anos, hoje):
+            lote.append(linha)
+            if len(lote) == TAMANHO_LOTE:
+                db.session.execute(insert(Transacao), lote)
+                registrar_insercoes(db.session, lote)
+                db.session.commit()
+                lote = []
+        if lote:
+            db.session.execute(insert(Transacao), lote)
+            registrar_insercoes(db.session, lote)
+
+        for meses_atras in range(12):
+            ano, mes = divmod(hoje.year * 12 + hoje.month - 1 - meses_atras, 12)
+            db.session.add(Meta(valor=Decimal(rng.randrange(200, 2000)), mes=mes + 1, ano=ano,
+                                id_usuario=usuario.id_usuario))
+        for descricao in rng.sample(['Netflix', 'Academia', 'Internet', 'Plano de saúde', 'Spotify'], 3):
+            db.session.add(GastoProgramado(descricao=descricao, valor_parcela=Decimal(rng.randrange(30, 300)),
+                                           recorrente=True, id_usuario=usuario.id_usuario))
+        for descricao in rng.sample(['Geladeira', 'Notebook', 'Sofá', 'Celular'], 2):
+            total = rng.choice([6, 10, 12])
+            db.session.add(GastoProgramado(descricao=descricao, valor_parcela=Decimal(rng.randrange(100, 600)),
+                                           total_parcelas=total, parcelas_pagas=rng.randrange(total),
+                                           id_usuario=usuario.id_usuario))
+        db.session.commit()
+    return ids
+
+
+def gerar_csv(quantidade, semente=42, novos=0.3):
+    """Extrato CSV (Data, Descrição, Valor com sinal); `novos` é a fração de beneficiários fora do histórico."""
+    rng = random.Random(semente)
+    saida = io.StringIO()
+    escritor = csv.writer(saida)
+    escritor.writerow(['Data', 'Descrição', 'Valor'])
+    dia = date.today() - timedelta(days=quantidade // 10 + 1)
+    for _ in range(quantidade):
+        dia += timedelta(days=rng.random() < 0.1)
+        valor = round(rng.lognormvariate(3.5, 1.0), 2) + 0.01
+        if rng.random() < novos:
+            # Estabelecimento desconhecido, sem palavras em comum com o histórico: fica para a categorização manual
+            nome = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(10))
+            descricao, valor = f'Estabelecimento {nome} {nome[::-1]}', -valor
+        elif rng.random() < 0.3:
+            descricao, valor = f'{rng.choice(HISTORICOS_RECEITA)} - {rng.choice(BENEFICIARIOS)}', valor * 4
+        else:
+            descricao, valor = f'{rng.choice(HISTORICOS_DESPESA)} - {rng.choice(BENEFICIARIOS)}', -valor
+        escritor.writerow([dia.strftime('%d/%m/%Y'), descricao, f'{valor:.2f}'])
+    return saida.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=10)
+    parser.add_argument('--transacoes', type=int, default=10000, help='transações por usuário')
+    parser.add_argument('--anos', type=int, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--csv', help='grava um extrato CSV neste caminho em vez de popular o banco')
+    parser.add_argument('--linhas', type=int, default=1000, help='linhas do extrato CSV')
+    args = parser.parse_args()
+
+    if args.csv:
+        with open(args.csv, 'w', encoding='utf-8', newline='') as arquivo:
+            arquivo.write(gerar_csv(args.linhas, args.semente))
+        return
+
+    from app import app
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import hash_senha
+    with app.app_context():
+        aplicar_migracoes()
+        ids = popular(args.usuarios, args.transacoes, args.semente, args.anos,
+                      senha_hash=hash_senha('senha-bench', app.config['BCRYPT_ROUNDS']))
+    print(f"{len(ids)} usuários criados (senha: senha-bench): ids {ids[0]}..{ids[-1]}")
+
+
+if __name__ == '__main__':
+    main()
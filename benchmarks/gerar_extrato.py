@@ -0,0 +1,83 @@
+"""Gera extratos bancários sintéticos (linhas de texto ou PDF) para testes de carga do importador.
+
+Uso: python -m benchmarks.gerar_extrato --linhas 5000 --pdf extrato.pdf
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+HISTORICOS_DESPESA = ['COMPRA CARTAO', 'PIX ENVIADO', 'PAGAMENTO BOLETO', 'Débito automático', 'SAQUE 24H',
+                      'TARIFA PACOTE', 'IOF', 'Transferência enviada', 'TED ENVIADA', 'Juros cheque especial']
+HISTORICOS_RECEITA = ['PIX RECEBIDO', 'Crédito salário', 'DEPOSITO', 'Rendimento poupança', 'TED RECEBIDA',
+                      'Transferência recebida', 'RECEBIMENTO']
+BENEFICIARIOS = ['Mercado Bom Preço', 'Posto Ipiranga', 'Maria Souza', 'Padaria Pão Quente', 'Netflix',
+                 'Uber Trip', 'Farmácia São João', 'Condomínio Res. Flores', 'Empresa XPTO Ltda', 'João Pereira']
+# Segunda linha de um lançamento cujo histórico não coube numa só (sem data nem valor)
+CONTINUACOES = ['{beneficiario}', 'Doc: {numero}', 'CPF ***.{numero}-**', 'Ref. pedido {numero} - {beneficiario}',
+                'Autenticação {numero}']
+LINHAS_IGNORADAS = ['SALDO ANTERIOR {valor}', 'Saldo atual {valor}', 'Extrato de conta corrente',
+                    'Agência: 1234 Conta: 56789-0', 'Período: {data} a {data}', 'Total de lançamentos {valor}',
+                    'Página 1 de 3', 'Lançamentos futuros']
+
+
+def formatar_valor(valor):
+    return f"{valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def formatar_data(dia, rng):
+    formato = rng.choice(['%d/%m/%Y', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%y', '%Y-%m-%d'])
+    return dia.strftime(formato)
+
+
+def gerar_linhas(quantidade, semente=42):
+    rng = random.Random(semente)
+    dia = date(2023, 1, 1)
+    for _ in range(quantidade):
+        dia += timedelta(days=rng.random() < 0.3)
+        sorteio = rng.random()
+        valor = round(rng.lognormvariate(4, 1.2), 2)
+        if sorteio < 0.08:
+            yield rng.choice(LINHAS_IGNORADAS).format(valor=formatar_valor(valor), data=dia.strftime('%d/%m/%Y'))
+        elif sorteio < 0.12:
+            yield rng.choice(['', '---', 'Histórico', f'{dia:%d/%m}'])
+        elif sorteio < 0.20:
+            yield rng.choice(CONTINUACOES).format(beneficiario=rng.choice(BENEFICIARIOS),
+                                                  numero=rng.randrange(10 ** 5, 10 ** 6))
+        else:
+            # Muitos extratos só dão a data no primeiro lançamento de cada dia
+            data = f"{formatar_data(dia, rng)} " if rng.random() < 0.8 else ''
+            if sorteio < 0.64:
+                sinal = '-' if rng.random() < 0.7 else ''
+                prefixo = rng.choice(['', 'R$ ', 'R$'])
+                yield (f"{data}{rng.choice(HISTORICOS_DESPESA)} - {rng.choice(BENEFICIARIOS)} "
+                       f"{prefixo}{sinal}{formatar_valor(valor)}")
+            else:
+                yield f"{data}{rng.choice(HISTORICOS_RECEITA)} - {rng.choice(BENEFICIARIOS)} {formatar_valor(valor * 3)}"
+
+
+def gerar_pdf(caminho, quantidade, semente=42, linhas_por_pagina=45):
+    from fpdf import FPDF
+
+    font_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'fonts')
+    pdf = FPDF()
+    pdf.add_font('DejaVu', '', os.path.join(font_dir, 'DejaVuSans.ttf'))
+    for indice, linha in enumerate(gerar_linhas(quantidade, semente)):
+        if indice % linhas_por_pagina == 0:
+            pdf.add_page()
+            pdf.set_font('DejaVu', '', 9)
+        pdf.cell(0, 5.5, linha, new_x='LMARGIN', new_y='NEXT')
+    pdf.output(caminho)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--linhas', type=int, default=1000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--pdf', help="Grava um PDF neste caminho em vez de imprimir as linhas.")
+    args = parser.parse_args()
+    if args.pdf:
+        gerar_pdf(args.pdf, args.linhas, args.semente)
+    else:
+        for linha in gerar_linhas(args.linhas, args.semente):
+            print(linha)
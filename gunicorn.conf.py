@@ -0,0 +1,38 @@
+"""Configuração do gunicorn, lida automaticamente por `gunicorn app:app` na raiz do projeto.
+
+As migrações rodam uma única vez no processo mestre, antes de existirem workers: vários workers criando
+as mesmas tabelas ao mesmo tempo falhariam tanto no SQLite quanto no PostgreSQL. O app é carregado no
+mestre (preload) e os workers o herdam pelo fork, compartilhando as páginas de memória dos módulos.
+"""
+import os
+import time
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+# Importações de PDF grandes e relatórios de muitos meses passam do padrão de 30s
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+# O on_starting já importa o app no mestre para as migrações; os workers o herdam pelo fork de qualquer forma
+preload_app = True
+
+
+def on_starting(server):
+    from app import app
+    from static.database.migracoes import aplicar_migracoes
+    from static.database.models import db
+    with app.app_context():
+        criados = aplicar_migracoes()
+        # Os workers nascem por fork deste processo e não podem herdar conexões abertas
+        db.engine.dispose()
+    server.log.info("Migrações aplicadas; índices criados: %s", ', '.join(criados) if criados else 'nenhum')
+
+
+def post_fork(server, worker):
+    from app import app
+    from static.database.models import db
+    from static.metricas import coletor
+    # Herdados do mestre: as métricas precisam do início deste worker, e o pool não pode reaproveitar
+    # conexões abertas antes do fork
+    coletor.inicio = time.time()
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,33 @@
+"""Cache em disco das transações extraídas de extratos em PDF, pela hash do conteúdo e a versão do extrator.
+
+Um extrato reenviado (depois de uma importação com erro ou pela metade) não passa de novo pelo pdfplumber:
+o job reaproveita a lista já extraída e refaz só as etapas do usuário (duplicadas, saldo, inserção). A
+lista não depende do usuário, então um mesmo extrato serve a qualquer conta. As entradas saem por LRU
+limitado pelo tamanho total, como os relatórios, e pela validade: uma extração gravada há mais de
+`validade` segundos não é servida, para que dados de extratos não fiquem indefinidamente no disco.
+"""
+import json
+import time
+
+from static.cache_relatorios import CacheArquivos, etag_da_chave
+
+
+class CacheExtracoes(CacheArquivos):
+    def __init__(self, pasta, tamanho_maximo, validade):
+        super().__init__(pasta, tamanho_maximo, validade)
+
+    def obter_extracao(self, hash_arquivo, versao_extrator):
+        """(total de páginas, transações) de uma extração anterior do mesmo conteúdo, ou None."""
+        chave = etag_da_chave(hash_arquivo, versao_extrator)
+        dados = self.obter(chave)
+        if dados is None:
+            return None
+        entrada = json.loads(dados)
+        if time.time() - entrada['gravado_em'] > self.validade:
+            self.remover(chave)
+            return None
+        return entrada['paginas'], entrada['transacoes']
+
+    def guardar_extracao(self, hash_arquivo, versao_extrator, paginas, transacoes):
+        entrada = {'gravado_em': time.time(), 'paginas': paginas, 'transacoes': transacoes}
+        self.guardar(etag_da_chave(hash_arquivo, versao_extrator), json.dumps(entrada).encode())
@@ -0,0 +1,73 @@
+"""Cache em disco dos relatórios já renderizados, com remoção LRU limitada pelo tamanho total.
+
+A chave inclui a versão dos dados do usuário (SaldoUsuario.versao_dados), então uma escrita em
+`transacoes` torna as entradas antigas inalcançáveis; elas saem pela política LRU, sem invalidação
+explícita. A data de modificação de cada ficheiro marca o último acesso; com `validade`, uma entrada sem
+acesso há mais que isso (em segundos) também sai na próxima limpeza.
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+
+def etag_da_chave(*partes):
+    return hashlib.sha256('|'.join(str(p) for p in partes).encode()).hexdigest()
+
+
+class CacheArquivos:
+    def __init__(self, pasta, tamanho_maximo, validade=None):
+        self.pasta = pasta
+        self.tamanho_maximo = tamanho_maximo
+        self.validade = validade
+
+    def _caminho(self, chave):
+        return os.path.join(self.pasta, chave + '.bin')
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                dados = arquivo.read()
+            os.utime(caminho)
+            return dados
+        except FileNotFoundError:
+            return None
+
+    def remover(self, chave):
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+
+    def guardar(self, chave, dados):
+        if len(dados) > self.tamanho_maximo:
+            return
+        os.makedirs(self.pasta, exist_ok=True)
+        # Escrita atômica: outro worker nunca lê um ficheiro pela metade
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, suffix='.tmp')
+        with os.fdopen(descritor, 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, self._caminho(chave))
+        self.remover_excedentes()
+
+    def remover_excedentes(self):
+        entradas = []
+        with os.scandir(self.pasta) as iterador:
+            for entrada in iterador:
+                if entrada.name.endswith('.bin'):
+                    try:
+                        estado = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    entradas.append((estado.st_mtime, estado.st_size, entrada.path))
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        limite_acesso = time.time() - self.validade if self.validade else 0
+        for acesso, tamanho, caminho in sorted(entradas):
+            if total <= self.tamanho_maximo and acesso >= limite_acesso:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
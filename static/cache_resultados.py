@@ -0,0 +1,124 @@
+"""Cache de resultados pequenos (resumos do dashboard) em dois níveis: memória do processo e um SQLite local.
+
+O primeiro nível é um LRU por processo; o segundo é um ficheiro SQLite que todos os workers do gunicorn da
+mesma máquina abrem, de modo que o resumo calculado por um worker serve os outros. Cada entrada guarda a
+versão com que foi calculada (SaldoUsuario.versao_dados e o mês, ver marcar_alteracao); quem lê passa a
+versão atual, e uma entrada de outra versão conta como falha. Não há invalidação explícita: a escrita sobe
+a versão e a próxima leitura recalcula e sobrescreve a entrada do usuário. As chaves do SQLite levam também
+um resumo da URL do banco (`escopo`): apps com bancos diferentes na mesma máquina não trocam resumos.
+
+Os valores vão como JSON (com Decimal preservado), nunca pickle: o ficheiro fica numa pasta temporária
+que outros processos da máquina podem escrever. Qualquer erro do SQLite vira uma falha de cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from static.metricas import coletor
+
+logger = logging.getLogger(__name__)
+
+LOCAL = 'local'
+COMPARTILHADO = 'compartilhado'
+FALHA = 'falha'
+# A cada quantas gravações de um processo as entradas além da capacidade são removidas do SQLite
+INTERVALO_LIMPEZA = 64
+
+
+def _codificar(valor):
+    if isinstance(valor, Decimal):
+        return {'$d': str(valor)}
+    raise TypeError(f"Valor sem suporte no cache: {type(valor).__name__}")
+
+
+def _decodificar(objeto):
+    return Decimal(objeto['$d']) if objeto.keys() == {'$d'} else objeto
+
+
+class CacheResultados:
+    def __init__(self, caminho, capacidade_local=256, capacidade_compartilhada=10000, escopo=''):
+        self.caminho = caminho
+        self.escopo = hashlib.sha256(escopo.encode()).hexdigest()[:16]
+        self.capacidade_local = capacidade_local
+        self.capacidade_compartilhada = capacidade_compartilhada
+        self.entradas = OrderedDict()  # (nome, usuário) -> (versão, valor)
+        self.trava = threading.Lock()
+        self.locais = threading.local()
+        self.gravacoes = 0
+
+    def _conexao(self):
+        # Uma conexão por thread e por processo: uma conexão herdada no fork não pode ser usada pelo filho
+        conexao = getattr(self.locais, 'conexao', None)
+        if conexao is not None and self.locais.pid == os.getpid():
+            return conexao
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=0.05, isolation_level=None)
+        conexao.execute('PRAGMA journal_mode=WAL')
+        conexao.execute('PRAGMA synchronous=OFF')
+        conexao.execute('CREATE TABLE IF NOT EXISTS resultados (chave TEXT PRIMARY KEY, versao TEXT NOT NULL, '
+                        'valor TEXT NOT NULL, gravado_em REAL NOT NULL)')
+        conexao.execute('CREATE INDEX IF NOT EXISTS ix_resultados_gravado_em ON resultados (gravado_em)')
+        self.locais.conexao, self.locais.pid = conexao, os.getpid()
+        return conexao
+
+    def _chave(self, nome, id_usuario):
+        return f'{self.escopo}:{nome}:{id_usuario}'
+
+    def _obter_local(self, chave, versao):
+        with self.trava:
+            guardada = self.entradas.get(chave)
+            if guardada is None or guardada[0] != versao:
+                return None
+            self.entradas.move_to_end(chave)
+            return guardada[1]
+
+    def _guardar_local(self, chave, versao, valor):
+        with self.trava:
+            self.entradas[chave] = (versao, valor)
+            self.entradas.move_to_end(chave)
+            while len(self.entradas) > self.capacidade_local:
+                self.entradas.popitem(last=False)
+
+    def obter(self, nome, id_usuario, versao):
+        """Valor guardado para o usuário nesta versão, ou None; conta o nível que respondeu."""
+        chave, versao = (nome, id_usuario), str(versao)
+        valor = self._obter_local(chave, versao)
+        if valor is not None:
+            coletor.registrar_cache(nome, LOCAL)
+            return valor
+        try:
+            linha = self._conexao().execute('SELECT valor FROM resultados WHERE chave = ? AND versao = ?',
+                                            (self._chave(nome, id_usuario), versao)).fetchone()
+        except sqlite3.Error as erro:
+            logger.warning("Cache compartilhado indisponível (%s): %s", self.caminho, erro)
+            linha = None
+        if linha is None:
+            coletor.registrar_cache(nome, FALHA)
+            return None
+        valor = json.loads(linha[0], object_hook=_decodificar)
+        self._guardar_local(chave, versao, valor)
+        coletor.registrar_cache(nome, COMPARTILHADO)
+        return valor
+
+    def guardar(self, nome, id_usuario, versao, valor):
+        versao = str(versao)
+        self._guardar_local((nome, id_usuario), versao, valor)
+        try:
+            conexao = self._conexao()
+            conexao.execute('INSERT OR REPLACE INTO resultados (chave, versao, valor, gravado_em) VALUES (?, ?, ?, ?)',
+                            (self._chave(nome, id_usuario), versao, json.dumps(valor, default=_codificar),
+                             time.time()))
+            with self.trava:
+                self.gravacoes += 1
+                limpar = self.gravacoes % INTERVALO_LIMPEZA == 0
+            if limpar:
+                conexao.execute('DELETE FROM resultados WHERE chave IN (SELECT chave FROM resultados '
+                                'ORDER BY gravado_em DESC LIMIT -1 OFFSET ?)', (self.capacidade_compartilhada,))
+        except sqlite3.Error as erro:
+            logger.warning("Cache compartilhado indisponível (%s): %s", self.caminho, erro)
@@ -0,0 +1,115 @@
+"""Arquivamento do histórico frio: transações antigas saem de `transacoes` para `transacoes_arquivadas`.
+
+O saldo e os resumos mensais (SaldoUsuario, ResumoMensal) não mudam ao arquivar: continuam a contar as
+linhas arquivadas, então calcular_saldo, o dashboard, a previsão e os relatórios de meses inteiros
+respondem igual sem ler o arquivo. SaldoUsuario.arquivado_ate guarda até onde o usuário foi arquivado;
+uma leitura cujo período começa antes disso (exportação, busca, relatório de intervalo quebrado, a
+listagem depois da última linha recente) lê também o arquivo. Linhas ainda a classificar ficam em
+`transacoes`, e as arquivadas são só leitura: as telas as mostram sem editar nem apagar.
+"""
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm.exc import StaleDataError
+
+from static.database.models import db, SaldoUsuario, Transacao, TransacaoArquivada
+from static.database.saldos import obter_saldo
+from static.database.sugestao_categorias import CATEGORIA_PENDENTE
+
+TABELA_RECENTE = Transacao.__table__
+TABELA_ARQUIVO = TransacaoArquivada.__table__
+COLUNAS_ARQUIVADAS = ('id_transacao', 'descricao', 'valor', 'tipo', 'beneficiario', 'data', 'id_usuario',
+                      'categoria', 'id_lote', 'impressao_digital')
+# Colunas das leituras que juntam as duas tabelas (historico_do_periodo)
+COLUNAS_LEITURA = ('id_transacao', 'data', 'tipo', 'valor', 'categoria', 'descricao', 'beneficiario')
+
+
+def limite_de_arquivamento(hoje, meses):
+    """1º dia do mês que começa `meses` meses antes do mês de `hoje`: só meses inteiros vão para o arquivo."""
+    indice = hoje.year * 12 + hoje.month - 1 - meses
+    return datetime(indice // 12, indice % 12 + 1, 1)
+
+
+# Valor padrão de `limite_arquivo` em pagina_do_historico: quem não o leu antes deixa que ele seja lido lá
+ARQUIVO_NAO_LIDO = object()
+
+
+def data_arquivamento(usuario_id):
+    """SaldoUsuario.arquivado_ate do usuário, ou None se nada dele foi arquivado."""
+    return db.session.query(SaldoUsuario.arquivado_ate).filter_by(id_usuario=usuario_id).scalar()
+
+
+def tabelas_do_periodo(usuario_id, inicio=None):
+    """Tabelas com transações do usuário a partir de `inicio` (None: desde o começo do histórico)."""
+    limite = data_arquivamento(usuario_id)
+    if limite is None or (inicio is not None and inicio >= limite):
+        return [TABELA_RECENTE]
+    return [TABELA_RECENTE, TABELA_ARQUIVO]
+
+
+def historico_do_periodo(usuario_id, inicio=None, fim=None):
+    """Transações do usuário em [inicio, fim) como subconsulta com COLUNAS_LEITURA.
+
+    Com o período todo em `transacoes`, é só a tabela filtrada; senão, a união com o arquivo, cada parte
+    filtrada pelo seu índice (id_usuario, data). Serve a agregações e leituras ordenadas sem limite.
+    """
+    partes = []
+    for tabela in tabelas_do_periodo(usuario_id, inicio):
+        consulta = select(*(tabela.c[nome] for nome in COLUNAS_LEITURA)).where(tabela.c.id_usuario == usuario_id)
+        if inicio is not None:
+            consulta = consulta.where(tabela.c.data >= inicio)
+        if fim is not None:
+            consulta = consulta.where(tabela.c.data < fim)
+        partes.append(consulta)
+    return (partes[0] if len(partes) == 1 else union_all(*partes)).subquery('historico')
+
+
+def pagina_do_historico(usuario_id, limite, consultar, inicio=None, limite_arquivo=ARQUIVO_NAO_LIDO):
+    """Página keyset (da mais nova para a mais antiga, por (data, id)) que pode continuar no arquivo.
+
+    `consultar(tabela)` devolve até `limite` linhas ordenadas de uma das tabelas. O arquivo só é lido
+    quando a página alcança o período arquivado: com a página cheia e a última linha posterior ao limite,
+    nenhuma arquivada (todas anteriores a ele) entraria nela. `limite_arquivo` é o arquivado_ate do usuário,
+    quando quem chama já o leu (o dashboard, com a versão dos dados).
+    """
+    linhas = consultar(TABELA_RECENTE)
+    if limite_arquivo is ARQUIVO_NAO_LIDO:
+        limite_arquivo = data_arquivamento(usuario_id)
+    if limite_arquivo is None or (inicio is not None and inicio >= limite_arquivo) or (
+            len(linhas) >= limite and linhas[-1].data >= limite_arquivo):
+        return linhas
+    return list(islice(heapq.merge(linhas, consultar(TABELA_ARQUIVO), key=lambda linha: (linha.data, linha.id),
+                                   reverse=True), limite))
+
+
+def arquivar_historico(limite, ids_usuarios=None):
+    """Move para o arquivo as transações anteriores a `limite`; devolve {usuário: linhas movidas}.
+
+    Cada usuário numa transação do banco, com o saldo travado como em zerar_saldo: toda escrita em
+    `transacoes` também atualiza o saldo, então uma escrita concorrente do mesmo usuário faz uma das duas
+    falhar, e o usuário fica para a próxima execução. Os gatilhos da busca (ver busca.py) tiram as linhas do
+    índice de `transacoes` e as põem no do arquivo.
+    """
+    if ids_usuarios is None:
+        ids_usuarios = [i for (i,) in db.session.query(Transacao.id_usuario).filter(
+            Transacao.data < limite).distinct()]
+    colunas = [TABELA_RECENTE.c[nome] for nome in COLUNAS_ARQUIVADAS]
+    movidas = {}
+    for id_usuario in ids_usuarios:
+        filtro = ((Transacao.id_usuario == id_usuario) & (Transacao.data < limite)
+                  & (func.coalesce(Transacao.categoria, '') != CATEGORIA_PENDENTE))
+        try:
+            saldo = obter_saldo(id_usuario, bloquear=True)
+            db.session.execute(insert(TransacaoArquivada).from_select(COLUNAS_ARQUIVADAS,
+                                                                      select(*colunas).where(filtro)))
+            quantidade = db.session.execute(
+                delete(Transacao).where(filtro).execution_options(synchronize_session=False)).rowcount
+            saldo.arquivado_ate = max(saldo.arquivado_ate or limite, limite)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            continue
+        movidas[id_usuario] = quantidade
+    return movidas
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as EsperaEsgotada
+from static.database.models import hash_senha, verificar_senha, custo_do_hash
+
+
+class SobrecargaSenhas(Exception):
+    """Há mais pedidos de hash na fila do que o limite configurado (o pedido é recusado sem esperar), ou o
+    hash não terminou dentro do timeout."""
+
+
+class ExecutorSenhas:
+    """Executa o bcrypt num pool pequeno e limitado.
+
+    O bcrypt libera o GIL, então `workers` limita quantos núcleos os hashes ocupam ao mesmo tempo; o
+    semáforo limita quantos pedidos podem esperar na fila. Uma rajada de logins acima disso recebe
+    SobrecargaSenhas na hora, em vez de prender todas as threads do servidor atrás do bcrypt. A vaga só
+    volta ao semáforo quando o hash termina (ou sai da fila): um pedido que desistiu por timeout continua
+    ocupando-a enquanto o bcrypt dele roda.
+    """
+
+    def __init__(self, workers=2, max_pendentes=16, rounds=12, timeout=10):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.vagas = threading.BoundedSemaphore(max_pendentes)
+        self.rounds = rounds
+        self.timeout = timeout
+
+    def _executar(self, funcao, *args):
+        if not self.vagas.acquire(blocking=False):
+            raise SobrecargaSenhas()
+        try:
+            futuro = self.pool.submit(funcao, *args)
+        except BaseException:
+            self.vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self.vagas.release())
+        try:
+            return futuro.result(timeout=self.timeout)
+        except EsperaEsgotada:
+            # Ainda na fila, sai dela; já rodando, termina e só então libera a vaga
+            futuro.cancel()
+            raise SobrecargaSenhas() from None
+
+    def gerar_hash(self, senha):
+        return self._executar(hash_senha, senha, self.rounds)
+
+    def verificar(self, senha, senha_hashed):
+        return self._executar(verificar_senha, senha, senha_hashed)
+
+    def precisa_rehash(self, senha_hashed):
+        return custo_do_hash(senha_hashed) != self.rounds
+
+
+class LimitadorTentativas:
+    """Janela deslizante em memória: no máximo `limite` eventos por chave a cada `janela` segundos.
+
+    Cada worker do gunicorn tem o seu; o limite efetivo por servidor é `limite` vezes o número de workers.
+    """
+
+    def __init__(self, limite, janela):
+        self.limite = limite
+        self.janela = janela
+        self.eventos = defaultdict(deque)
+        self.trava = threading.Lock()
+
+    def _expirar(self, chave, agora):
+        eventos = self.eventos[chave]
+        while eventos and eventos[0] <= agora - self.janela:
+            eventos.popleft()
+        if not eventos:
+            del self.eventos[chave]
+        return eventos
+
+    def bloqueado(self, chave):
+        with self.trava:
+            return len(self._expirar(chave, time.monotonic())) >= self.limite
+
+    def registrar(self, chave):
+        with self.trava:
+            agora = time.monotonic()
+            self._expirar(chave, agora)
+            self.eventos[chave].append(agora)
+
+    def limpar(self, chave):
+        with self.trava:
+            self.eventos.pop(chave, None)
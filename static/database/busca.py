@@ -0,0 +1,164 @@
+"""Busca textual em descrição, beneficiário e categoria das transações, sempre por um índice de texto.
+
+No SQLite, uma tabela FTS5 de conteúdo externo (`transacoes_busca`) indexa as colunas de `transacoes` e é
+mantida por gatilhos do próprio banco, o que cobre também as inserções e exclusões em massa feitas pelo
+Core. O id do usuário entra no índice como mais uma coluna: a consulta cruza as listas do usuário e dos
+termos dentro do FTS, em vez de buscar os termos em todos os usuários e filtrar depois. No PostgreSQL, a
+mesma consulta usa um índice GIN sobre o tsvector das três colunas. Os termos são sempre prefixos
+("farm" encontra "Farmácia") e todos precisam aparecer.
+
+O histórico arquivado (ver arquivamento.py) tem um índice igual e separado (`transacoes_arquivadas_busca`
+no SQLite, outro índice GIN no PostgreSQL), consultado só quando a página alcança o período arquivado.
+"""
+import re
+from sqlalchemy import column, select, table, text
+from static.database.arquivamento import TABELA_ARQUIVO, TABELA_RECENTE, pagina_do_historico
+from static.database.models import db
+from static.database.leituras import colunas_transacao, depois_do_cursor
+
+TABELA_FTS = 'transacoes_busca'
+TABELA_FTS_ARQUIVO = 'transacoes_arquivadas_busca'
+MAXIMO_TERMOS = 8
+# Até quantas correspondências do FTS a busca lê direto pela chave primária (ver buscar_transacoes)
+MAXIMO_IDS_DIRETOS = 200
+
+_regex_termos = re.compile(r'\w+')
+
+
+def ddl_sqlite(fts, tabela, chave):
+    # Gatilhos do FTS5 de conteúdo externo: a remoção precisa receber os valores antigos das colunas. Sem
+    # índices de prefixo (opção prefix=): o vocabulário dos extratos é pequeno, a busca por prefixo já percorre
+    # poucos termos, e cada inserção fica mais barata
+    return (
+        f"""CREATE VIRTUAL TABLE {fts} USING fts5(
+            descricao, beneficiario, categoria, id_usuario,
+            content='{tabela}', content_rowid='{chave}',
+            tokenize='unicode61 remove_diacritics 2')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabela} BEGIN
+            INSERT INTO {fts}(rowid, descricao, beneficiario, categoria, id_usuario)
+            VALUES (new.{chave}, new.descricao, new.beneficiario, new.categoria, new.id_usuario);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabela} BEGIN
+            INSERT INTO {fts}({fts}, rowid, descricao, beneficiario, categoria, id_usuario)
+            VALUES ('delete', old.{chave}, old.descricao, old.beneficiario, old.categoria, old.id_usuario);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au
+            AFTER UPDATE OF descricao, beneficiario, categoria, id_usuario ON {tabela} BEGIN
+            INSERT INTO {fts}({fts}, rowid, descricao, beneficiario, categoria, id_usuario)
+            VALUES ('delete', old.{chave}, old.descricao, old.beneficiario, old.categoria, old.id_usuario);
+            INSERT INTO {fts}(rowid, descricao, beneficiario, categoria, id_usuario)
+            VALUES (new.{chave}, new.descricao, new.beneficiario, new.categoria, new.id_usuario);
+        END""",
+    )
+
+
+# Por tabela: (tabela FTS5 no SQLite, coluna usada como rowid, índice GIN no PostgreSQL)
+INDICES_TEXTO = {
+    TABELA_RECENTE: (TABELA_FTS, 'id_transacao', 'ix_transacoes_busca'),
+    TABELA_ARQUIVO: (TABELA_FTS_ARQUIVO, 'id_arquivada', 'ix_transacoes_arquivadas_busca'),
+}
+
+
+# A consulta repete a expressão do índice exatamente, para o planejador do PostgreSQL usá-lo
+TEXTO_POSTGRES = ("to_tsvector('simple', coalesce(descricao, '') || ' ' || coalesce(beneficiario, '') || ' ' || "
+                  "coalesce(categoria, ''))")
+
+
+def criar_indices_busca():
+    """Cria os índices de texto (transações e arquivo) que ainda não existem; devolve os nomes dos criados agora."""
+    dialeto = db.engine.dialect.name
+    if dialeto not in ('sqlite', 'postgresql'):
+        raise RuntimeError(f"Busca textual sem suporte para o banco {dialeto!r}")
+    criados = []
+    with db.engine.begin() as conexao:
+        for tabela, (fts, chave, nome_gin) in INDICES_TEXTO.items():
+            if dialeto == 'sqlite':
+                existe = conexao.execute(text("SELECT 1 FROM sqlite_master WHERE name = :nome"),
+                                         {'nome': fts}).first()
+                if existe:
+                    continue
+                for comando in ddl_sqlite(fts, tabela.name, chave):
+                    conexao.execute(text(comando))
+                # Indexa as linhas que já estavam no banco antes dos gatilhos
+                conexao.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+                criados.append(fts)
+            else:
+                if conexao.execute(text("SELECT to_regclass(:nome)"), {'nome': nome_gin}).scalar() is not None:
+                    continue
+                conexao.execute(text(f"CREATE INDEX {nome_gin} ON {tabela.name} USING gin (({TEXTO_POSTGRES}))"))
+                criados.append(nome_gin)
+    return criados
+
+
+def termos_da_busca(texto):
+    # Só letras e dígitos: nada do que o usuário digita chega como operador ao FTS5 ou ao to_tsquery
+    return _regex_termos.findall((texto or '').lower().replace('_', ' '))[:MAXIMO_TERMOS]
+
+
+def _expressao_fts(usuario_id, termos):
+    return f'id_usuario : "{int(usuario_id)}" AND {{descricao beneficiario categoria}} : (' + \
+        ' AND '.join(f'"{termo}"*' for termo in termos) + ')'
+
+
+def buscar_transacoes(usuario_id, termos, limite, cursor=None, tipo=None, data_inicio=None, data_fim=None,
+                      valor_minimo=None, valor_maximo=None):
+    """Até `limite` transações do usuário com todos os termos, da mais nova para a mais antiga.
+
+    `cursor` é (data, id) da última linha da página anterior; `data_fim` é exclusiva. Sem termos, só os
+    filtros se aplicam (pelo índice de usuário e data).
+    """
+    def filtrar(consulta, tabela):
+        if tipo:
+            consulta = consulta.where(tabela.c.tipo == tipo)
+        if data_inicio:
+            consulta = consulta.where(tabela.c.data >= data_inicio)
+        if data_fim:
+            consulta = consulta.where(tabela.c.data < data_fim)
+        if valor_minimo is not None:
+            consulta = consulta.where(tabela.c.valor >= valor_minimo)
+        if valor_maximo is not None:
+            consulta = consulta.where(tabela.c.valor <= valor_maximo)
+        consulta = depois_do_cursor(consulta, tabela, cursor)
+        return consulta.order_by(tabela.c.data.desc(), tabela.c.id_transacao.desc())
+
+    def consultar(tabela):
+        return _buscar_na_tabela(tabela, usuario_id, termos, limite, filtrar)
+
+    return pagina_do_historico(usuario_id, limite, consultar, inicio=data_inicio)
+
+
+def _buscar_na_tabela(tabela, usuario_id, termos, limite, filtrar):
+    # A mesma busca em `transacoes` ou no arquivo, cada uma pelo seu índice de texto
+    nome_fts, chave, _ = INDICES_TEXTO[tabela]
+    filtro_usuario = tabela.c.id_usuario == usuario_id
+    if termos and db.engine.dialect.name == 'postgresql':
+        filtro_texto = text(f"{TEXTO_POSTGRES} @@ to_tsquery('simple', :termos)").bindparams(
+            termos=' & '.join(f'{termo}:*' for termo in termos))
+    elif termos:
+        fts = table(nome_fts, column('rowid'), column(nome_fts))
+        correspondentes = select(fts.c.rowid).where(fts.c[nome_fts].match(_expressao_fts(usuario_id, termos)))
+        ids = db.session.execute(correspondentes.limit(MAXIMO_IDS_DIRETOS + 1)).scalars().all()
+        if len(ids) <= MAXIMO_IDS_DIRETOS:
+            # Poucas correspondências: busca pela chave primária e ordena só essas. O "+ 0" impede o SQLite
+            # de preferir o índice do usuário, que o faria percorrer todo o histórico atrás delas
+            filtro_usuario = (tabela.c.id_usuario + 0) == usuario_id
+            filtro_texto = tabela.c[chave].in_(ids)
+        else:
+            # Muitas: o índice (id_usuario, data) entrega as linhas já na ordem da página e a leitura para no
+            # limite. Como subconsulta IN, o MATCH roda uma vez só (num JOIN, o SQLite poderia repeti-lo por linha)
+            filtro_texto = tabela.c[chave].in_(correspondentes)
+    else:
+        filtro_texto = None
+
+    consulta = select(*colunas_transacao(tabela)).where(filtro_usuario)
+    if filtro_texto is not None:
+        consulta = consulta.where(filtro_texto)
+    return db.session.execute(filtrar(consulta, tabela).limit(limite)).all()
+
+
+def otimizar_indice_busca():
+    """Compacta os índices FTS5 depois de muitas exclusões (o arquivamento); no PostgreSQL, o VACUUM cuida disso."""
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as conexao:
+            for nome_fts, _, _ in INDICES_TEXTO.values():
+                conexao.execute(text(f"INSERT INTO {nome_fts}({nome_fts}) VALUES ('optimize')"))
@@ -0,0 +1,18 @@
+from sqlalchemy import event
+
+
+def configurar_motor(engine, pragmas):
+    """Aplica os PRAGMAs do SQLite em cada conexão nova; outros bancos usam as opções de pool da configuração.
+
+    journal_mode=WAL fica gravado no ficheiro do banco, os demais valem só para a conexão, por isso todos
+    são reaplicados a cada conexão aberta pelo pool (inclusive nos processos de importação e nos workers).
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(conexao_dbapi, _registro):
+        cursor = conexao_dbapi.cursor()
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome}={valor}')
+        cursor.close()
@@ -1,9 +1,105 @@
 import os
+import tempfile
+from dotenv import load_dotenv
+
+# As classes abaixo leem o ambiente ao serem importadas, então o .env precisa estar carregado antes
+load_dotenv()
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
+
+def url_do_banco():
+    url = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'dados_financeiros.db'))
+    # Alguns provedores ainda entregam o esquema antigo "postgres://", que o SQLAlchemy 2 não aceita
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def opcoes_do_motor(url):
+    """Pool de conexões para servidores de banco; o SQLite é ajustado por PRAGMAs (ver conexao.py)."""
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        # Descarta conexões derrubadas pelo servidor ou por um proxy (PgBouncer, balanceadores) antes de usá-las
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
+
 class Config:
     SECRET_KEY = 'chave-simples-para-desenvolvimento'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'dados_financeiros.db')
-    DEBUG = True
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = url_do_banco()
+    SQLALCHEMY_ENGINE_OPTIONS = opcoes_do_motor(SQLALCHEMY_DATABASE_URI)
+    # WAL deixa leitores e um escritor trabalharem ao mesmo tempo; busy_timeout faz um segundo escritor
+    # esperar a vez em vez de falhar com "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 15000)),
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,
+    }
+    DEBUG = True
+    TRANSACOES_POR_PAGINA = 50
+    TRANSACOES_POR_PAGINA_CATEGORIZACAO = 100
+    MAX_CONTENT_LENGTH = 20 * 1024 * 1024
+    TAMANHO_LOTE_IMPORTACAO = 1000
+    PASTA_UPLOADS = os.path.join(tempfile.gettempdir(), 'payattention_uploads')
+    WORKERS_IMPORTACAO = 2
+    # Um job em processamento sem sinal de vida por este tempo (processo do pool morto, por exemplo) volta para
+    # a fila, até TENTATIVAS_JOB_IMPORTACAO reivindicações; a varredura roda no máximo uma vez por intervalo
+    TEMPO_MAXIMO_JOB_IMPORTACAO = 10 * 60
+    TENTATIVAS_JOB_IMPORTACAO = 2
+    INTERVALO_VARREDURA_JOBS = 60
+    # Cada processo do pool de importação abre o seu pool de extração: juntos, não passam do número de CPUs
+    WORKERS_EXTRACAO_PDF = max(1, (os.cpu_count() or 1) // WORKERS_IMPORTACAO)
+    PAGINAS_MINIMAS_EXTRACAO_PARALELA = 8
+    # Transações já extraídas de PDFs, pela hash do conteúdo: um extrato reenviado não é lido de novo
+    PASTA_CACHE_EXTRACOES = os.path.join(tempfile.gettempdir(), 'payattention_extracoes')
+    TAMANHO_CACHE_EXTRACOES = 50 * 1024 * 1024
+    VALIDADE_CACHE_EXTRACOES = 24 * 60 * 60
+    INDICES_CATEGORIAS_EM_CACHE = 256
+    # Meses completos usados nas médias de receitas e despesas da previsão de saldo
+    MESES_HISTORICO_PREVISAO = 6
+    PREVISOES_EM_CACHE = 256
+    # Meses completos que ficam em `transacoes`; os anteriores vão para o arquivo (flask --app app arquivar)
+    MESES_HISTORICO_ATIVO = 24
+    # Resumos do dashboard: LRU de cada processo e um SQLite visto por todos os workers da máquina
+    RESULTADOS_EM_CACHE_LOCAL = 256
+    RESULTADOS_EM_CACHE_COMPARTILHADO = 10000
+    ARQUIVO_CACHE_RESULTADOS = os.getenv('ARQUIVO_CACHE_RESULTADOS',
+                                         os.path.join(tempfile.gettempdir(), 'payattention_cache', 'resultados.db'))
+    PASTA_CACHE_RELATORIOS = os.path.join(tempfile.gettempdir(), 'payattention_relatorios')
+    TAMANHO_CACHE_RELATORIOS = 200 * 1024 * 1024
+    BCRYPT_ROUNDS = 12
+    WORKERS_HASH_SENHA = 2
+    MAX_HASHES_PENDENTES = 16
+    LOGIN_TENTATIVAS_POR_IP = 30
+    LOGIN_JANELA_IP_SEGUNDOS = 60
+    LOGIN_FALHAS_POR_EMAIL = 5
+    LOGIN_JANELA_EMAIL_SEGUNDOS = 300
+    SQL_LENTO_SEGUNDOS = float(os.getenv('SQL_LENTO_SEGUNDOS', 0.2))
+    # Sem token, /metrics fica aberto (para um Prometheus na rede interna); com ele, exige "Bearer <token>"
+    METRICAS_TOKEN = os.getenv('METRICAS_TOKEN')
+
+
+class ProducaoConfig(Config):
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    DEBUG = False
+    SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', '1') == '1'
+
+
+CONFIGURACOES = {'desenvolvimento': Config, 'producao': ProducaoConfig}
+
+
+def configuracao_do_ambiente():
+    """Perfil escolhido por PAYATTENTION_AMBIENTE (desenvolvimento ou producao)."""
+    nome = os.getenv('PAYATTENTION_AMBIENTE', 'desenvolvimento')
+    if nome not in CONFIGURACOES:
+        raise RuntimeError(f"PAYATTENTION_AMBIENTE inválido: {nome!r} (use {', '.join(CONFIGURACOES)})")
+    return CONFIGURACOES[nome]
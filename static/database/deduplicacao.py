@@ -0,0 +1,152 @@
+import hashlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from itertools import count
+from sqlalchemy import bindparam, event, select, union_all, update
+from sqlalchemy.orm import Session
+from static.database.arquivamento import data_arquivamento
+from static.database.models import db, Transacao, TransacaoArquivada
+from static.database.saldos import valor_anterior
+from static.database.sugestao_categorias import normalizar
+
+# O que a impressão digital identifica de uma transação
+CAMPOS_IMPRESSAO = ('id_usuario', 'data', 'valor', 'tipo', 'descricao')
+
+
+def impressao_digital(id_usuario, data, valor, tipo, descricao, ocorrencia=1):
+    """Identifica o conteúdo de uma linha de extrato, independente do ficheiro de onde veio.
+
+    `ocorrencia` distingue lançamentos idênticos no mesmo dia (dois cafés de R$ 5,00): a segunda cópia
+    de um mesmo extrato gera as mesmas ocorrências e é reconhecida, sem que uma apague a outra.
+    """
+    chave = '|'.join((str(id_usuario), data.date().isoformat(), str(Decimal(valor).quantize(Decimal('0.01'))),
+                      tipo, normalizar(descricao), str(ocorrencia)))
+    return hashlib.sha1(chave.encode()).hexdigest()
+
+
+class MarcadorImpressoes:
+    """Preenche `impressao_digital` nas linhas de uma importação, contando ocorrências em todo o ficheiro."""
+
+    def __init__(self):
+        self.ocorrencias = Counter()
+
+    def marcar(self, linhas):
+        for linha in linhas:
+            chave = (linha['id_usuario'], linha['data'].date(), Decimal(linha['valor']), linha['tipo'],
+                     normalizar(linha['descricao']))
+            self.ocorrencias[chave] += 1
+            linha['impressao_digital'] = impressao_digital(linha['id_usuario'], linha['data'], linha['valor'],
+                                                           linha['tipo'], linha['descricao'],
+                                                           self.ocorrencias[chave])
+        return linhas
+
+
+def separar_duplicadas(id_usuario, linhas, tamanho_consulta=1000):
+    """Retorna (novas, quantidade de linhas já importadas antes), com uma consulta IN por bloco de linhas.
+
+    Linhas anteriores ao histórico arquivado do usuário também são procuradas no arquivo: um extrato antigo
+    reenviado depois do arquivamento continua a ser reconhecido.
+    """
+    existentes = set()
+    limite_arquivo = data_arquivamento(id_usuario)
+    antigas = [linha for linha in linhas if limite_arquivo and linha['data'] < limite_arquivo]
+    for modelo, candidatas in ((Transacao, linhas), (TransacaoArquivada, antigas)):
+        for inicio in range(0, len(candidatas), tamanho_consulta):
+            existentes.update(db.session.execute(
+                select(modelo.impressao_digital).where(
+                    modelo.id_usuario == id_usuario,
+                    modelo.impressao_digital.in_(
+                        [linha['impressao_digital'] for linha in candidatas[inicio:inicio + tamanho_consulta]]))
+            ).scalars())
+    novas = [linha for linha in linhas if linha['impressao_digital'] not in existentes]
+    return novas, len(linhas) - len(novas)
+
+
+def impressoes_ocupadas(session, id_usuario, candidatas):
+    """As `candidatas` que já identificam uma transação do usuário, recente ou arquivada."""
+    consulta = union_all(*(select(modelo.impressao_digital).where(
+        modelo.id_usuario == id_usuario, modelo.impressao_digital.in_(candidatas))
+        for modelo in (Transacao, TransacaoArquivada)))
+    with session.no_autoflush:
+        return set(session.execute(consulta).scalars())
+
+
+def primeira_impressao_livre(session, transacao, reservadas, propria=None):
+    """Impressão da primeira ocorrência do conteúdo da transação que nenhuma outra do usuário usa.
+
+    Dois lançamentos manuais idênticos no mesmo dia ficam com as ocorrências 1 e 2, as mesmas que o
+    MarcadorImpressoes dá às duas linhas de uma exportação importada de volta. `reservadas` são as já dadas
+    neste flush; `propria`, a que a transação editada tinha (continua livre para ela).
+    """
+    valores = [getattr(transacao, campo) for campo in CAMPOS_IMPRESSAO]
+    for inicio in count(1, 8):
+        candidatas = [impressao_digital(*valores, ocorrencia) for ocorrencia in range(inicio, inicio + 8)]
+        ocupadas = (impressoes_ocupadas(session, transacao.id_usuario, candidatas) | reservadas) - {propria}
+        livre = next((impressao for impressao in candidatas if impressao not in ocupadas), None)
+        if livre:
+            reservadas.add(livre)
+            return livre
+
+
+@event.listens_for(Session, 'before_flush')
+def _marcar_lancamentos(session, flush_context, instances):
+    # Lançamentos pelo ORM (cadastro manual, parcela paga) chegam sem impressão; os importados já a trazem do
+    # MarcadorImpressoes. Um lançamento manual editado recebe a do conteúdo novo. Um importado mantém a da linha
+    # do extrato, para que o mesmo extrato enviado de novo continue a reconhecê-lo.
+    reservadas = set()
+    for transacao in session.new:
+        if isinstance(transacao, Transacao) and transacao.impressao_digital is None:
+            if transacao.data is None:
+                transacao.data = datetime.now()
+            transacao.impressao_digital = primeira_impressao_livre(session, transacao, reservadas)
+    for transacao in session.dirty:
+        if (isinstance(transacao, Transacao) and transacao.id_lote is None
+                and any(valor_anterior(transacao, campo) != getattr(transacao, campo) for campo in CAMPOS_IMPRESSAO)):
+            transacao.impressao_digital = primeira_impressao_livre(session, transacao, reservadas,
+                                                                   propria=transacao.impressao_digital)
+
+
+def preencher_impressoes_ausentes():
+    """Dá impressão digital às transações gravadas sem ela (lançamentos manuais e linhas de antes da coluna).
+
+    Por usuário, em ordem de (data, id), contando as ocorrências como o MarcadorImpressoes conta as linhas de
+    uma exportação importada de volta, e pulando as que outra linha do usuário já usa. Retorna quantas linhas
+    foram preenchidas.
+    """
+    tabelas = {Transacao.__table__: Transacao.__table__.c.id_transacao,
+               TransacaoArquivada.__table__: TransacaoArquivada.__table__.c.id_arquivada}
+    ids_usuarios = set()
+    for tabela in tabelas:
+        ids_usuarios.update(db.session.execute(
+            select(tabela.c.id_usuario).distinct().where(tabela.c.impressao_digital.is_(None))).scalars())
+    preenchidas = 0
+    for id_usuario in sorted(ids_usuarios):
+        ocupadas = set(db.session.execute(union_all(*(
+            select(tabela.c.impressao_digital).where(tabela.c.id_usuario == id_usuario,
+                                                     tabela.c.impressao_digital.isnot(None))
+            for tabela in tabelas))).scalars())
+        sem_impressao = sorted(
+            ((linha.data, linha.id_transacao, tabela, linha.chave, linha.valor, linha.tipo, linha.descricao)
+             for tabela, chave in tabelas.items() for linha in db.session.execute(
+                select(tabela.c.data, tabela.c.id_transacao, chave.label('chave'), tabela.c.valor, tabela.c.tipo,
+                       tabela.c.descricao)
+                .where(tabela.c.id_usuario == id_usuario, tabela.c.impressao_digital.is_(None)))),
+            key=lambda linha: linha[:2])
+        ultimas = Counter()
+        novas = defaultdict(list)
+        for data, _, tabela, chave, valor, tipo, descricao in sem_impressao:
+            conteudo = (data.date(), Decimal(valor), tipo, normalizar(descricao))
+            while True:
+                ultimas[conteudo] += 1
+                impressao = impressao_digital(id_usuario, data, valor, tipo, descricao, ultimas[conteudo])
+                if impressao not in ocupadas:
+                    break
+            ocupadas.add(impressao)
+            novas[tabela].append({'b_chave': chave, 'b_impressao': impressao})
+        for tabela, linhas in novas.items():
+            db.session.execute(update(tabela).where(tabelas[tabela] == bindparam('b_chave'))
+                               .values(impressao_digital=bindparam('b_impressao')), linhas)
+        db.session.commit()
+        preenchidas += len(sem_impressao)
+    return preenchidas
@@ -0,0 +1,58 @@
+"""Consultas de leitura das telas: só as colunas exibidas, devolvidas como Row (tuplas nomeadas do SQLAlchemy).
+
+Sem instâncias ORM, nada entra no identity map da sessão e nada é convertido linha a linha: os valores
+chegam aos templates como Decimal e datetime, e a formatação acontece só na renderização.
+"""
+from sqlalchemy import Boolean, literal, select, or_, and_
+from static.database.arquivamento import ARQUIVO_NAO_LIDO, TABELA_ARQUIVO, pagina_do_historico
+from static.database.models import db, Transacao
+
+
+def colunas_transacao(tabela):
+    # As mesmas colunas em `transacoes` e em `transacoes_arquivadas`; `arquivada` diz às telas que a linha é
+    # só leitura (sem editar nem apagar)
+    return (tabela.c.id_transacao.label('id'), tabela.c.data, tabela.c.tipo, tabela.c.valor, tabela.c.categoria,
+            tabela.c.descricao, tabela.c.beneficiario, literal(tabela is TABELA_ARQUIVO, Boolean).label('arquivada'))
+
+
+COLUNAS_TRANSACAO = colunas_transacao(Transacao.__table__)
+
+
+def depois_do_cursor(consulta, tabela, cursor):
+    # Ordem (data, id) decrescente: só as linhas que vêm depois da última da página anterior
+    if not cursor:
+        return consulta
+    data_cursor, id_cursor = cursor
+    return consulta.where(or_(
+        tabela.c.data < data_cursor,
+        and_(tabela.c.data == data_cursor, tabela.c.id_transacao < id_cursor)
+    ))
+
+
+def pagina_transacoes(usuario_id, limite, cursor=None, limite_arquivo=ARQUIVO_NAO_LIDO):
+    """Até `limite` transações mais recentes que o cursor (data, id), da mais nova para a mais antiga."""
+    def consultar(tabela):
+        consulta = select(*colunas_transacao(tabela)).where(tabela.c.id_usuario == usuario_id)
+        consulta = depois_do_cursor(consulta, tabela, cursor)
+        consulta = consulta.order_by(tabela.c.data.desc(), tabela.c.id_transacao.desc()).limit(limite)
+        return db.session.execute(consulta).all()
+    return pagina_do_historico(usuario_id, limite, consultar, limite_arquivo=limite_arquivo)
+
+
+def pendentes_do_lote(usuario_id, id_lote, categoria_pendente, apos, limite):
+    """Até `limite` transações do lote ainda sem categoria, com id maior que `apos`, em ordem de id."""
+    return db.session.execute(
+        select(*COLUNAS_TRANSACAO).where(
+            Transacao.id_lote == id_lote,
+            Transacao.id_usuario == usuario_id,
+            Transacao.categoria == categoria_pendente,
+            Transacao.id_transacao > apos
+        ).order_by(Transacao.id_transacao).limit(limite)
+    ).all()
+
+
+def transacao_para_json(linha):
+    # Mesmo formato de Transacao.to_dict(), usado pela API de paginação do dashboard
+    return {'id': linha.id, 'tipo': linha.tipo, 'valor': float(linha.valor), 'descricao': linha.descricao,
+            'beneficiario': linha.beneficiario, 'data': linha.data.isoformat(), 'categoria': linha.categoria,
+            'arquivada': linha.arquivada}
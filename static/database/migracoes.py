@@ -0,0 +1,46 @@
+from sqlalchemy import inspect, text
+from static.database.models import db
+from static.database.saldos import inicializar_saldos_ausentes
+from static.database.busca import criar_indices_busca
+from static.database.deduplicacao import preencher_impressoes_ausentes
+
+
+def criar_indices_ausentes():
+    # db.create_all() não cria índices novos em tabelas que já existem; aqui eles são criados um a um.
+    inspetor = inspect(db.engine)
+    criados = []
+    for tabela in db.metadata.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            continue
+        existentes = {indice['name'] for indice in inspetor.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name not in existentes:
+                indice.create(db.engine)
+                criados.append(indice.name)
+    return criados
+
+
+def adicionar_colunas_ausentes():
+    # Colunas novas (sempre anuláveis) em tabelas existentes; ALTER TABLE ADD COLUMN funciona no SQLite e no PostgreSQL
+    inspetor = inspect(db.engine)
+    criadas = []
+    with db.engine.begin() as conexao:
+        for tabela in db.metadata.sorted_tables:
+            if not inspetor.has_table(tabela.name):
+                continue
+            existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela.name)}
+            for coluna in tabela.columns:
+                if coluna.name not in existentes:
+                    tipo = coluna.type.compile(dialect=db.engine.dialect)
+                    conexao.execute(text(f'ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}'))
+                    criadas.append(f'{tabela.name}.{coluna.name}')
+    return criadas
+
+
+def aplicar_migracoes():
+    db.create_all()
+    adicionar_colunas_ausentes()
+    criados = criar_indices_ausentes() + criar_indices_busca()
+    inicializar_saldos_ausentes()
+    preencher_impressoes_ausentes()
+    return criados
@@ -1,16 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Numeric
+from sqlalchemy import Numeric, Index, UniqueConstraint
 from datetime import datetime
 import bcrypt
 
-def hash_senha(senha: str) -> str:
-    senha_hashed = bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=12))
+def hash_senha(senha: str, rounds: int = 12) -> str:
+    senha_hashed = bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt(rounds=rounds))
     return senha_hashed.decode()
 
 def verificar_senha(senha_str: str, senha_hashed: str) -> bool:
     senha_hashed_validation = bcrypt.checkpw(senha_str.encode('utf-8'), senha_hashed.encode())
     return senha_hashed_validation
 
+def custo_do_hash(senha_hashed: str) -> int:
+    # Formato "$2b$12$<salt+hash>": o terceiro campo é o custo usado
+    return int(senha_hashed.split('$')[2])
+
 db = SQLAlchemy()
 
 class Usuario(db.Model):
@@ -37,10 +41,21 @@ class Transacao(db.Model):
     valor = db.Column(Numeric(10, 2), nullable=False)
     tipo = db.Column(db.String(10), nullable=False)
     beneficiario = db.Column(db.String(100))
-    data = db.Column(db.DateTime, default=datetime.now(), nullable=False)
+    data = db.Column(db.DateTime, default=datetime.now, nullable=False)
     id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
     usuario = db.relationship('Usuario', backref='transacoes')
     categoria = db.Column(db.String(50), nullable=True, default='Outros')
+    id_lote = db.Column(db.Integer, db.ForeignKey('lotes_importacao.id_lote'), nullable=True, index=True)
+    # Identifica o conteúdo da linha para reconhecer reimportações (ver deduplicacao.py); os lançamentos manuais
+    # também a recebem, no flush
+    impressao_digital = db.Column(db.String(40), nullable=True)
+
+    # Índices compostos usados pela listagem paginada e pelos filtros de período do dashboard/relatórios
+    __table_args__ = (
+        Index('ix_transacoes_usuario_data', 'id_usuario', 'data'),
+        Index('ix_transacoes_usuario_tipo_data_categoria', 'id_usuario', 'tipo', 'data', 'categoria'),
+        Index('uq_transacoes_usuario_impressao', 'id_usuario', 'impressao_digital', unique=True),
+    )
 
     def to_dict(self):
         return {
@@ -56,6 +71,127 @@ class Transacao(db.Model):
     def __repr__(self):
         return f"<Transacao {self.tipo}: R$ {self.valor} ({self.data})>"
 
+class TransacaoArquivada(db.Model):
+    # Histórico frio, movido de `transacoes` por static/database/arquivamento.py. Saldo e resumos mensais já
+    # contam estas linhas; exportações, buscas e relatórios que alcançam o período arquivado as leem, e o
+    # índice de sugestão de categorias as inclui.
+    # Chave própria: no SQLite, o id de uma transação arquivada pode voltar a ser usado em `transacoes`
+    __tablename__ = 'transacoes_arquivadas'
+    id_arquivada = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_transacao = db.Column(db.Integer, nullable=False)
+    descricao = db.Column(db.String(255))
+    valor = db.Column(Numeric(10, 2), nullable=False)
+    tipo = db.Column(db.String(10), nullable=False)
+    beneficiario = db.Column(db.String(100))
+    data = db.Column(db.DateTime, nullable=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    categoria = db.Column(db.String(50), nullable=True)
+    id_lote = db.Column(db.Integer, nullable=True)
+    impressao_digital = db.Column(db.String(40), nullable=True)
+
+    __table_args__ = (
+        Index('ix_transacoes_arquivadas_usuario_data', 'id_usuario', 'data'),
+        Index('ix_transacoes_arquivadas_usuario_impressao', 'id_usuario', 'impressao_digital'),
+    )
+
+class SaldoUsuario(db.Model):
+    # Saldo materializado, mantido na mesma transação de cada escrita em `transacoes`
+    __tablename__ = 'saldos_usuarios'
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), primary_key=True)
+    total_receita = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total_despesa = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    # Versionamento otimista: duas escritas concorrentes sobre o mesmo saldo não passam as duas
+    versao = db.Column(db.Integer, nullable=False)
+    __mapper_args__ = {'version_id_col': versao}
+
+    # Sobe a cada escrita em `transacoes` do usuário (inclusive as que não mudam os totais, como trocar a
+    # descrição) e nas de metas e gastos programados (marcar_alteracao); identifica a versão dos dados nos
+    # relatórios e resumos do dashboard em cache e nos ETags
+    versao_dados = db.Column(db.Integer, nullable=True, default=0)
+
+    # Transações anteriores a esta data podem estar em `transacoes_arquivadas` (nenhuma arquivada é posterior)
+    arquivado_ate = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def saldo(self):
+        return self.total_receita - self.total_despesa
+
+    def __repr__(self):
+        return f"<Saldo {self.id_usuario}: R${self.saldo}>"
+
+class ResumoMensal(db.Model):
+    # Totais por (usuário, mês, tipo, categoria), usados pelos gráficos do dashboard
+    __tablename__ = 'resumos_mensais'
+    id_resumo = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(10), nullable=False)
+    categoria = db.Column(db.String(50), nullable=True)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('id_usuario', 'ano', 'mes', 'tipo', 'categoria', name='uq_resumos_mensais_chave'),
+    )
+
+    def __repr__(self):
+        return f"<Resumo {self.id_usuario} - {self.mes}/{self.ano} {self.tipo}/{self.categoria}: R${self.total}>"
+
+class LoteImportacao(db.Model):
+    # Um upload importado: liga o usuário ao ficheiro e às transações criadas a partir dele
+    __tablename__ = 'lotes_importacao'
+    id_lote = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False, index=True)
+    nome_arquivo = db.Column(db.String(255), nullable=False)
+    origem = db.Column(db.String(10), nullable=False)
+    criado_em = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    transacoes = db.relationship('Transacao', backref='lote', lazy='dynamic')
+
+    def __repr__(self):
+        return f"<Lote de importação {self.id_lote}: {self.nome_arquivo}>"
+
+class JobImportacao(db.Model):
+    # Fila local de importações de extrato: a requisição só grava o job e o worker do pool o processa
+    __tablename__ = 'jobs_importacao'
+    id_job = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuarios.id_usuario'), nullable=False)
+    nome_arquivo = db.Column(db.String(255), nullable=False)
+    caminho_arquivo = db.Column(db.String(500), nullable=False)
+    # SHA-256 do conteúdo enviado: chave do cache de extrações (ver static/cache_extracoes.py)
+    hash_arquivo = db.Column(db.String(64), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)
+    total_paginas = db.Column(db.Integer, nullable=True)
+    paginas_processadas = db.Column(db.Integer, nullable=False, default=0)
+    linhas_encontradas = db.Column(db.Integer, nullable=False, default=0)
+    linhas_recusadas = db.Column(db.Integer, nullable=False, default=0)
+    linhas_duplicadas = db.Column(db.Integer, nullable=True, default=0)
+    id_lote = db.Column(db.Integer, db.ForeignKey('lotes_importacao.id_lote'), nullable=True)
+    mensagem_erro = db.Column(db.String(500), nullable=True)
+    criado_em = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+    # Sinal de vida do processo que executa o job (reivindicação e cada página lida) e quantas vezes ele foi
+    # reivindicado: um job parado em "processando" por mais de TEMPO_MAXIMO_JOB_IMPORTACAO volta para a fila
+    atualizado_em = db.Column(db.DateTime, nullable=True)
+    tentativas = db.Column(db.Integer, nullable=True, default=0)
+
+    def to_dict(self):
+        return {
+            'id': self.id_job,
+            'nome_arquivo': self.nome_arquivo,
+            'status': self.status,
+            'total_paginas': self.total_paginas,
+            'paginas_processadas': self.paginas_processadas,
+            'linhas_encontradas': self.linhas_encontradas,
+            'linhas_recusadas': self.linhas_recusadas,
+            'linhas_duplicadas': self.linhas_duplicadas or 0,
+            'mensagem_erro': self.mensagem_erro,
+        }
+
+    def __repr__(self):
+        return f"<Job de importação {self.id_job} ({self.status})>"
+
 class Meta(db.Model):
     __tablename__ = 'metas'
     id_meta = db.Column(db.Integer, primary_key=True)
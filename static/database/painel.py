@@ -0,0 +1,65 @@
+from decimal import Decimal
+from sqlalchemy import func, select
+from static.database.models import db, SaldoUsuario, ResumoMensal, Meta, GastoProgramado
+from static.database.saldos import materializar_saldo
+
+
+def filtro_gastos_ativos(usuario_id):
+    return (GastoProgramado.id_usuario == usuario_id) & (
+        (GastoProgramado.recorrente == True) | (GastoProgramado.parcelas_pagas < GastoProgramado.total_parcelas))
+
+
+def gastos_ativos(usuario_id):
+    """Gastos programados ativos do usuário como dicionários (o que o dashboard mostra de cada um)."""
+    linhas = db.session.execute(select(
+        GastoProgramado.id_gasto, GastoProgramado.descricao, GastoProgramado.valor_parcela,
+        GastoProgramado.recorrente, GastoProgramado.total_parcelas, GastoProgramado.parcelas_pagas
+    ).where(filtro_gastos_ativos(usuario_id)).order_by(GastoProgramado.id_gasto))
+    return [dict(linha._mapping) for linha in linhas]
+
+
+def resumo_dashboard(usuario_id, hoje):
+    """Reúne os agregados numéricos do dashboard em duas consultas.
+
+    A primeira traz saldo, meta do mês e total dos gastos programados ativos (subconsultas escalares);
+    a segunda traz as despesas do mês por categoria, de onde também sai o total investido.
+    """
+    saldo_usuario = select(SaldoUsuario).where(SaldoUsuario.id_usuario == usuario_id).subquery()
+    escalares = db.session.execute(select(
+        select(saldo_usuario.c.versao).scalar_subquery().label('versao'),
+        select(saldo_usuario.c.total_receita).scalar_subquery().label('total_receita'),
+        select(saldo_usuario.c.total_despesa).scalar_subquery().label('total_despesa'),
+        select(Meta.valor).where(Meta.id_usuario == usuario_id, Meta.mes == hoje.month, Meta.ano == hoje.year)
+        .limit(1).scalar_subquery().label('meta'),
+        select(func.sum(GastoProgramado.valor_parcela)).where(filtro_gastos_ativos(usuario_id))
+        .scalar_subquery().label('total_gastos_programados'),
+    )).one()
+
+    if escalares.versao is None:
+        saldo_materializado = materializar_saldo(usuario_id)
+        entrada_total, saida_total = saldo_materializado.total_receita, saldo_materializado.total_despesa
+    else:
+        entrada_total, saida_total = escalares.total_receita, escalares.total_despesa
+
+    gastos_por_categoria = db.session.query(
+        ResumoMensal.categoria,
+        func.sum(ResumoMensal.total).label('total_gasto')
+    ).filter(
+        ResumoMensal.id_usuario == usuario_id,
+        ResumoMensal.tipo == 'despesa',
+        ResumoMensal.ano == hoje.year,
+        ResumoMensal.mes == hoje.month
+    ).group_by(ResumoMensal.categoria).order_by(func.sum(ResumoMensal.total).desc()).all()
+
+    total_investido = sum((total for categoria, total in gastos_por_categoria
+                           if categoria and categoria.lower() == 'investimento'), Decimal('0.00'))
+
+    return {
+        'saldo': entrada_total - saida_total,
+        'entrada_total': entrada_total,
+        'saida_total': saida_total,
+        'meta_investimento': escalares.meta if escalares.meta is not None else Decimal('0.00'),
+        'total_investido': total_investido,
+        'gastos_por_categoria': [(categoria, total) for categoria, total in gastos_por_categoria if categoria],
+        'total_gastos_programados_mes': escalares.total_gastos_programados or 0,
+    }
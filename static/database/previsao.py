@@ -0,0 +1,172 @@
+"""Previsão do saldo mês a mês: saldo atual, gastos programados e médias recentes de receitas e despesas.
+
+Os gastos programados viram uma matriz gastos x meses (a parcela enquanto restarem parcelas, ou todo mês
+para os recorrentes) e o histórico sai dos resumos mensais; a projeção inteira é feita com somas e
+acumulados do NumPy, sem laço por mês. Como só depende do horizonte máximo, cada usuário tem uma projeção
+em cache (a de MESES_MAXIMO meses, recortada para o horizonte pedido), válida enquanto a versão dos dados,
+os gastos programados e o mês corrente forem os mesmos.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import select
+
+from static.database.models import db, SaldoUsuario, ResumoMensal, GastoProgramado
+from static.database.painel import filtro_gastos_ativos
+from static.database.saldos import materializar_saldo
+
+MESES_MINIMO = 12
+MESES_MAXIMO = 60
+# Pagamentos feitos por "Marcar como Pago": já entram na projeção como gastos programados
+CATEGORIA_CONTAS_PROGRAMADAS = 'Contas Programadas'
+
+
+def _indice_mes(ano, mes):
+    return ano * 12 + mes - 1
+
+
+def _medias_historicas(usuario_id, mes_atual, meses_historico):
+    """Receita e despesas por categoria: média mensal dos últimos meses completos e o já lançado no mês atual.
+
+    A média conta a partir do primeiro mês com lançamentos dentro da janela, para não diluir o
+    histórico de quem começou a usar o sistema há pouco tempo.
+    """
+    indice = ResumoMensal.ano * 12 + ResumoMensal.mes - 1
+    linhas = db.session.execute(
+        select(indice.label('indice'), ResumoMensal.tipo, ResumoMensal.categoria, ResumoMensal.total)
+        .where(ResumoMensal.id_usuario == usuario_id, indice.between(mes_atual - meses_historico, mes_atual),
+               ResumoMensal.tipo.in_(('receita', 'despesa')))
+    ).all()
+    categorias = sorted({l.categoria or 'Outros' for l in linhas if l.tipo == 'despesa'
+                         and l.categoria != CATEGORIA_CONTAS_PROGRAMADAS})
+    if not linhas:
+        return 0, 0.0, 0.0, categorias, np.zeros(0), np.zeros(0)
+
+    indices = np.fromiter((l.indice for l in linhas), dtype=np.int64, count=len(linhas))
+    totais = np.fromiter((l.total for l in linhas), dtype=np.float64, count=len(linhas))
+    receita = np.fromiter((l.tipo == 'receita' for l in linhas), dtype=bool, count=len(linhas))
+    posicao = {categoria: i for i, categoria in enumerate(categorias)}
+    # -1 marca receitas e contas programadas, fora das colunas de categoria
+    colunas = np.fromiter((posicao.get(l.categoria or 'Outros', -1) if l.tipo == 'despesa'
+                           and l.categoria != CATEGORIA_CONTAS_PROGRAMADAS else -1 for l in linhas),
+                          dtype=np.int64, count=len(linhas))
+
+    passados = indices < mes_atual
+    meses_com_dados = int(mes_atual - indices[passados].min()) if passados.any() else 0
+    despesa = colunas >= 0
+    soma_categorias = np.bincount(colunas[despesa & passados], weights=totais[despesa & passados],
+                                  minlength=len(categorias))
+    lancado_categorias = np.bincount(colunas[despesa & ~passados], weights=totais[despesa & ~passados],
+                                     minlength=len(categorias))
+    divisor = max(meses_com_dados, 1)
+    return (meses_com_dados, totais[receita & passados].sum() / divisor, totais[receita & ~passados].sum(),
+            categorias, soma_categorias / divisor, lancado_categorias)
+
+
+def projetar(saldo, receita_media, receita_lancada, despesas_medias, despesas_lancadas, valores_gastos,
+             parcelas_restantes, meses):
+    """Fluxo e saldo projetados para `meses` meses, começando pelo mês atual.
+
+    No mês atual entra só o que falta para atingir a média (o que já foi lançado está no saldo);
+    `parcelas_restantes` usa -1 para gastos recorrentes.
+    """
+    horizonte = np.arange(meses)
+    ativos = (parcelas_restantes[:, None] < 0) | (horizonte[None, :] < parcelas_restantes[:, None])
+    programados = (valores_gastos[:, None] * ativos).sum(axis=0)
+
+    receitas = np.full(meses, receita_media)
+    despesas = np.full(meses, despesas_medias.sum())
+    if meses:
+        receitas[0] = max(receita_media - receita_lancada, 0.0)
+        despesas[0] = np.maximum(despesas_medias - despesas_lancadas, 0.0).sum()
+    saldos = saldo + np.cumsum(receitas - despesas - programados)
+    return receitas, despesas, programados, saldos
+
+
+def calcular_previsao(usuario_id, hoje, meses_historico, gastos, saldo):
+    mes_atual = _indice_mes(hoje.year, hoje.month)
+    meses_com_dados, receita_media, receita_lancada, categorias, despesas_medias, despesas_lancadas = \
+        _medias_historicas(usuario_id, mes_atual, meses_historico)
+
+    valores_gastos = np.array([float(g.valor_parcela) for g in gastos], dtype=np.float64)
+    parcelas_restantes = np.array([-1 if g.recorrente else g.total_parcelas - g.parcelas_pagas for g in gastos],
+                                  dtype=np.int64)
+    receitas, despesas, programados, saldos = projetar(
+        float(saldo), receita_media, receita_lancada, despesas_medias, despesas_lancadas, valores_gastos,
+        parcelas_restantes, MESES_MAXIMO)
+
+    meses = []
+    for deslocamento in range(MESES_MAXIMO):
+        ano, mes = divmod(mes_atual + deslocamento, 12)
+        meses.append({'ano': ano, 'mes': mes + 1, 'receitas': round(float(receitas[deslocamento]), 2),
+                      'despesas': round(float(despesas[deslocamento]), 2),
+                      'programados': round(float(programados[deslocamento]), 2),
+                      'saldo': round(float(saldos[deslocamento]), 2)})
+    fim_parcelamentos = []
+    for gasto, restantes in zip(gastos, parcelas_restantes.tolist()):
+        if restantes > 0:
+            ano, mes = divmod(mes_atual + restantes - 1, 12)
+            fim_parcelamentos.append({'descricao': gasto.descricao, 'ultima_parcela': {'ano': ano, 'mes': mes + 1}})
+    return {
+        'saldo_atual': round(float(saldo), 2),
+        'meses_historico': meses_com_dados,
+        'receita_media': round(float(receita_media), 2),
+        'despesas_medias': {c: round(float(v), 2) for c, v in zip(categorias, despesas_medias.tolist())},
+        'fim_parcelamentos': sorted(fim_parcelamentos, key=lambda f: (f['ultima_parcela']['ano'],
+                                                                     f['ultima_parcela']['mes'])),
+        'meses': meses,
+    }
+
+
+class CachePrevisoes:
+    """LRU em memória com a última projeção de cada usuário e a chave com que foi calculada."""
+
+    def __init__(self, capacidade=256):
+        self.capacidade = capacidade
+        self.previsoes = OrderedDict()
+        self.trava = threading.Lock()
+
+    def obter(self, id_usuario, chave):
+        with self.trava:
+            guardada = self.previsoes.get(id_usuario)
+            if guardada is None or guardada[0] != chave:
+                return None
+            self.previsoes.move_to_end(id_usuario)
+            return guardada[1]
+
+    def guardar(self, id_usuario, chave, previsao):
+        with self.trava:
+            self.previsoes[id_usuario] = (chave, previsao)
+            self.previsoes.move_to_end(id_usuario)
+            while len(self.previsoes) > self.capacidade:
+                self.previsoes.popitem(last=False)
+
+
+cache_previsoes = CachePrevisoes()
+
+
+def previsao_fluxo(usuario_id, hoje, meses, meses_historico):
+    """Projeção de `meses` meses (limitado a MESES_MINIMO..MESES_MAXIMO), servida do cache quando possível.
+
+    Saldo, versão dos dados e gastos ativos são lidos a cada chamada (duas consultas pequenas); os gastos
+    entram no cálculo e também na chave, que assim não depende só de a escrita ter subido a versão.
+    """
+    meses = min(max(meses, MESES_MINIMO), MESES_MAXIMO)
+    saldo_usuario = db.session.execute(
+        select(SaldoUsuario.total_receita, SaldoUsuario.total_despesa, SaldoUsuario.versao_dados)
+        .where(SaldoUsuario.id_usuario == usuario_id)
+    ).one_or_none() or materializar_saldo(usuario_id)
+    gastos = db.session.execute(
+        select(GastoProgramado.id_gasto, GastoProgramado.descricao, GastoProgramado.valor_parcela,
+               GastoProgramado.recorrente, GastoProgramado.total_parcelas, GastoProgramado.parcelas_pagas)
+        .where(filtro_gastos_ativos(usuario_id)).order_by(GastoProgramado.id_gasto)
+    ).all()
+
+    chave = (saldo_usuario.versao_dados or 0, _indice_mes(hoje.year, hoje.month), meses_historico, tuple(gastos))
+    previsao = cache_previsoes.obter(usuario_id, chave)
+    if previsao is None:
+        saldo = saldo_usuario.total_receita - saldo_usuario.total_despesa
+        previsao = calcular_previsao(usuario_id, hoje, meses_historico, gastos, saldo)
+        cache_previsoes.guardar(usuario_id, chave, previsao)
+    return {**previsao, 'meses': previsao['meses'][:meses]}
@@ -0,0 +1,79 @@
+from decimal import Decimal
+from sqlalchemy import func, select, case, true
+from static.database.arquivamento import historico_do_periodo
+from static.database.models import db, ResumoMensal, GastoProgramado
+
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+
+def _alinhado_a_meses(inicio, fim):
+    # Intervalos [1º dia do mês, 1º dia de outro mês) podem ser respondidos pelos resumos mensais
+    return all(d.day == 1 and (d.hour, d.minute, d.second, d.microsecond) == (0, 0, 0, 0) for d in (inicio, fim))
+
+
+def _filtro_meses(inicio, fim):
+    chave = ResumoMensal.ano * 12 + ResumoMensal.mes
+    return (chave >= inicio.year * 12 + inicio.month) & (chave < fim.year * 12 + fim.month)
+
+
+def despesas_do_periodo(usuario_id, inicio, fim):
+    """(data, descricao, categoria, valor) das despesas em [inicio, fim), só com as colunas do relatório."""
+    historico = historico_do_periodo(usuario_id, inicio, fim)
+    return db.session.execute(
+        select(historico.c.data, historico.c.descricao, historico.c.categoria, historico.c.valor)
+        .where(historico.c.tipo == 'despesa').order_by(historico.c.data.desc())
+    ).all()
+
+
+def totais_por_categoria(usuario_id, inicio, fim):
+    """(categoria, quantidade, total) das despesas em [inicio, fim), da maior para a menor."""
+    if _alinhado_a_meses(inicio, fim):
+        consulta = select(ResumoMensal.categoria, func.sum(ResumoMensal.quantidade), func.sum(ResumoMensal.total)) \
+            .where(ResumoMensal.id_usuario == usuario_id, ResumoMensal.tipo == 'despesa', _filtro_meses(inicio, fim)) \
+            .group_by(ResumoMensal.categoria).order_by(func.sum(ResumoMensal.total).desc())
+    else:
+        historico = historico_do_periodo(usuario_id, inicio, fim)
+        consulta = select(historico.c.categoria, func.count(), func.sum(historico.c.valor)) \
+            .where(historico.c.tipo == 'despesa') \
+            .group_by(historico.c.categoria).order_by(func.sum(historico.c.valor).desc())
+    return [(categoria, int(quantidade), total) for categoria, quantidade, total in db.session.execute(consulta)]
+
+
+def totais_por_mes(usuario_id, inicio, fim):
+    """(ano, mes, receitas, despesas) de cada mês com lançamentos em [inicio, fim), em ordem cronológica."""
+    if _alinhado_a_meses(inicio, fim):
+        ano, mes, tipo, valor = ResumoMensal.ano, ResumoMensal.mes, ResumoMensal.tipo, ResumoMensal.total
+        filtro = (ResumoMensal.id_usuario == usuario_id) & _filtro_meses(inicio, fim)
+    else:
+        historico = historico_do_periodo(usuario_id, inicio, fim)
+        ano, mes = func.extract('year', historico.c.data), func.extract('month', historico.c.data)
+        tipo, valor = historico.c.tipo, historico.c.valor
+        filtro = true()
+    consulta = select(
+        ano, mes,
+        func.sum(case((tipo == 'receita', valor), else_=0)),
+        func.sum(case((tipo == 'despesa', valor), else_=0))
+    ).where(filtro).group_by(ano, mes).order_by(ano, mes)
+    return [(int(a), int(m), Decimal(receitas or 0), Decimal(despesas or 0))
+            for a, m, receitas, despesas in db.session.execute(consulta)]
+
+
+def transacoes_para_exportar(usuario_id, inicio=None, fim=None):
+    """Gera (data, descricao, tipo, valor, categoria, beneficiario) em ordem cronológica, sem carregar tudo.
+
+    `yield_per` busca as linhas em lotes (cursor do lado do servidor no PostgreSQL), com memória constante.
+    Períodos que alcançam o histórico arquivado também leem `transacoes_arquivadas`.
+    """
+    historico = historico_do_periodo(usuario_id, inicio, fim)
+    consulta = select(historico.c.data, historico.c.descricao, historico.c.tipo, historico.c.valor,
+                      historico.c.categoria, historico.c.beneficiario) \
+        .order_by(historico.c.data, historico.c.id_transacao)
+    yield from db.session.execute(consulta.execution_options(yield_per=TAMANHO_LOTE_EXPORTACAO))
+
+
+def gastos_para_exportar(usuario_id):
+    """Gera (descricao, valor_parcela, recorrente, parcelas_pagas, total_parcelas, data_inicio)."""
+    consulta = select(GastoProgramado.descricao, GastoProgramado.valor_parcela, GastoProgramado.recorrente,
+                      GastoProgramado.parcelas_pagas, GastoProgramado.total_parcelas, GastoProgramado.data_inicio) \
+        .where(GastoProgramado.id_usuario == usuario_id).order_by(GastoProgramado.data_inicio)
+    yield from db.session.execute(consulta.execution_options(yield_per=TAMANHO_LOTE_EXPORTACAO))
@@ -0,0 +1,259 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import event, func, inspect, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import flag_modified
+from static.database.models import db, Transacao, TransacaoArquivada, SaldoUsuario, ResumoMensal
+
+
+def valor_anterior(transacao, atributo):
+    historico = inspect(transacao).attrs[atributo].history
+    return historico.deleted[0] if historico.deleted else getattr(transacao, atributo)
+
+
+def subir_versao_dados(saldo):
+    """Sobe a versão dos dados e anota na sessão a versão de partida e a final do usuário: depois do commit, o
+    índice de categorias em cache passa de uma à outra sem reler o histórico (ver sugestao_categorias)."""
+    versao_anterior = saldo.versao_dados or 0
+    saldo.versao_dados = versao_anterior + 1
+    versoes = object_session(saldo).info.setdefault('versoes_dados', {})
+    versoes.setdefault(saldo.id_usuario, [versao_anterior, None])[1] = saldo.versao_dados
+
+
+def _chave(id_usuario, data, tipo, categoria):
+    return id_usuario, data.year, data.month, tipo, categoria
+
+
+def _somar(deltas, id_usuario, data, tipo, categoria, valor, sinal):
+    deltas[_chave(id_usuario, data, tipo, categoria)][0] += sinal * Decimal(str(valor))
+    deltas[_chave(id_usuario, data, tipo, categoria)][1] += sinal
+
+
+def _totais_do_banco(session, id_usuario):
+    # O histórico inteiro: as transações recentes e as já arquivadas (ver arquivamento.py)
+    historico = union_all(*(
+        select(tabela.c.data, tabela.c.tipo, tabela.c.categoria, tabela.c.valor)
+        .where(tabela.c.id_usuario == id_usuario) for tabela in (Transacao.__table__, TransacaoArquivada.__table__)
+    )).subquery()
+    ano, mes = func.extract('year', historico.c.data), func.extract('month', historico.c.data)
+    return session.query(
+        ano, mes, historico.c.tipo, historico.c.categoria, func.sum(historico.c.valor), func.count()
+    ).group_by(ano, mes, historico.c.tipo, historico.c.categoria).all()
+
+
+def _inserir_se_ausente(session, tabela, valores):
+    # INSERT ... ON CONFLICT DO NOTHING (SQLite e PostgreSQL); retorna se a linha foi inserida
+    dialeto = postgresql if session.get_bind().dialect.name == 'postgresql' else sqlite
+    return session.execute(dialeto.insert(tabela).values(**valores).on_conflict_do_nothing()).rowcount == 1
+
+
+def _inicializar_usuario(session, id_usuario, **colunas):
+    """Materializa saldo e resumos de um usuário sem saldo a partir do histórico atual do banco.
+
+    Duas requisições podem fazer isso ao mesmo tempo (a primeira escrita e uma leitura, por exemplo): o saldo
+    entra com INSERT ... ON CONFLICT DO NOTHING e só quem o inseriu grava os resumos. Retorna se foi esta
+    transação que o criou; se não, o saldo da outra já está gravado e vale por inteiro. `colunas` são valores
+    iniciais de outras colunas do saldo.
+    """
+    with session.no_autoflush:
+        totais = _totais_do_banco(session, id_usuario)
+        valores = {'id_usuario': id_usuario, 'versao': 1, 'versao_dados': 0, **colunas,
+                   'total_receita': sum((total for _, _, tipo, _, total, _ in totais if tipo == 'receita'), Decimal(0)),
+                   'total_despesa': sum((total for _, _, tipo, _, total, _ in totais if tipo == 'despesa'), Decimal(0))}
+        if not _inserir_se_ausente(session, SaldoUsuario.__table__, valores):
+            return False
+        session.query(ResumoMensal).filter_by(id_usuario=id_usuario).delete(synchronize_session=False)
+        for ano, mes, tipo, categoria, total, quantidade in totais:
+            session.add(ResumoMensal(id_usuario=id_usuario, ano=int(ano), mes=int(mes), tipo=tipo,
+                                     categoria=categoria, total=total, quantidade=quantidade))
+    return True
+
+
+def obter_saldo(id_usuario, bloquear=False, session=None):
+    """Retorna o SaldoUsuario, criando-o se necessário. Com `bloquear`, trava a linha até o commit."""
+    session = session or db.session
+    query = session.query(SaldoUsuario).filter_by(id_usuario=id_usuario)
+    if bloquear:
+        query = query.with_for_update().populate_existing()
+    with session.no_autoflush:
+        saldo = query.first()
+        if saldo is None:
+            # Criado por esta transação ou por outra que chegou antes: nos dois casos é a linha gravada
+            _inicializar_usuario(session, id_usuario)
+            saldo = query.first()
+    if bloquear:
+        # Marca o saldo como alterado: o UPDATE do commit confere a `versao` lida aqui (útil no SQLite,
+        # que ignora FOR UPDATE) e falha com StaleDataError se outro worker escreveu no meio tempo
+        flag_modified(saldo, 'total_receita')
+    return saldo
+
+
+@event.listens_for(Session, 'before_flush')
+def _atualizar_saldos(session, flush_context, instances):
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for transacao in session.new:
+        if isinstance(transacao, Transacao):
+            if transacao.data is None:
+                transacao.data = datetime.now()
+            _somar(deltas, transacao.id_usuario, transacao.data, transacao.tipo, transacao.categoria,
+                   transacao.valor, 1)
+    for transacao in session.dirty:
+        if isinstance(transacao, Transacao) and session.is_modified(transacao):
+            _somar(deltas, *(valor_anterior(transacao, a) for a in ('id_usuario', 'data', 'tipo', 'categoria',
+                                                                      'valor')), -1)
+            _somar(deltas, transacao.id_usuario, transacao.data, transacao.tipo, transacao.categoria,
+                   transacao.valor, 1)
+    for transacao in session.deleted:
+        if isinstance(transacao, Transacao):
+            _somar(deltas, *(valor_anterior(transacao, a) for a in ('id_usuario', 'data', 'tipo', 'categoria',
+                                                                      'valor')), -1)
+    if deltas:
+        aplicar_deltas(session, deltas)
+
+
+def _buscar_resumo(session, id_usuario, ano, mes, tipo, categoria):
+    chave = (id_usuario, ano, mes, tipo, categoria)
+    for pendente in session.new:
+        if isinstance(pendente, ResumoMensal) and (pendente.id_usuario, pendente.ano, pendente.mes, pendente.tipo,
+                                                   pendente.categoria) == chave:
+            return pendente
+    with session.no_autoflush:
+        return session.query(ResumoMensal).filter_by(
+            id_usuario=id_usuario, ano=ano, mes=mes, tipo=tipo, categoria=categoria).first()
+
+
+def aplicar_deltas(session, deltas):
+    """Aplica variações {(usuário, ano, mês, tipo, categoria): [valor, quantidade]} ao saldo e aos resumos."""
+    saldos = {}
+    for (id_usuario, ano, mes, tipo, categoria), (valor, quantidade) in deltas.items():
+        if id_usuario not in saldos:
+            saldos[id_usuario] = obter_saldo(id_usuario, session=session)
+            subir_versao_dados(saldos[id_usuario])
+        if not valor and not quantidade:
+            continue
+        saldo = saldos[id_usuario]
+        if tipo == 'receita':
+            saldo.total_receita += valor
+        elif tipo == 'despesa':
+            saldo.total_despesa += valor
+        resumo = _buscar_resumo(session, id_usuario, ano, mes, tipo, categoria)
+        if resumo is None:
+            session.add(ResumoMensal(id_usuario=id_usuario, ano=ano, mes=mes, tipo=tipo, categoria=categoria,
+                                     total=valor, quantidade=quantidade))
+        elif resumo.quantidade + quantidade <= 0:
+            session.expunge(resumo) if resumo in session.new else session.delete(resumo)
+        else:
+            resumo.total += valor
+            resumo.quantidade += quantidade
+
+
+def registrar_alteracoes(session, removidas=(), inseridas=()):
+    """Equivalente ao before_flush para escritas em massa via Core (dicts com as colunas de Transacao).
+
+    Também anota as categorizações para o índice de sugestões em cache, como o before_flush de lá.
+    """
+    # Importado aqui: sugestao_categorias depende deste módulo
+    from static.database.sugestao_categorias import registrar_categorizacoes
+
+    registrar_categorizacoes(session, removidas, inseridas)
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for sinal, linhas in ((-1, removidas), (1, inseridas)):
+        for linha in linhas:
+            _somar(deltas, linha['id_usuario'], linha['data'], linha['tipo'], linha['categoria'], linha['valor'],
+                   sinal)
+    # A escrita via Core já está no banco: um usuário ainda sem saldo é materializado com ela incluída, e as
+    # variações dele não podem ser somadas de novo. Se outra transação criou o saldo antes, ele não inclui esta
+    # escrita e as variações entram normalmente
+    for id_usuario in {chave[0] for chave in deltas}:
+        with session.no_autoflush:
+            existe = session.query(SaldoUsuario.id_usuario).filter_by(id_usuario=id_usuario).first() is not None
+        if not existe and _inicializar_usuario(session, id_usuario, versao_dados=1):
+            # Antes do saldo, versao_dados() era 0
+            session.info.setdefault('versoes_dados', {})[id_usuario] = [0, 1]
+            deltas = {chave: delta for chave, delta in deltas.items() if chave[0] != id_usuario}
+    aplicar_deltas(session, deltas)
+
+
+def registrar_insercoes(session, linhas):
+    registrar_alteracoes(session, inseridas=linhas)
+
+
+def zerar_saldo(id_usuario):
+    """Usado junto com exclusões em massa, que não passam pelo before_flush."""
+    saldo = obter_saldo(id_usuario, bloquear=True)
+    saldo.total_receita = Decimal(0)
+    saldo.total_despesa = Decimal(0)
+    # Sem subir_versao_dados: as linhas apagadas não são conhecidas, e o índice de categorias é reconstruído
+    saldo.versao_dados = (saldo.versao_dados or 0) + 1
+    saldo.arquivado_ate = None
+    ResumoMensal.query.filter_by(id_usuario=id_usuario).delete(synchronize_session=False)
+
+
+def marcar_alteracao(id_usuario, session=None):
+    """Sobe a versão dos dados numa escrita fora de `transacoes` que muda o dashboard (metas, gastos programados)."""
+    subir_versao_dados(obter_saldo(id_usuario, session=session))
+
+
+def materializar_saldo(id_usuario):
+    """obter_saldo para as leituras (dashboard, previsão), que não fazem commit: o saldo que ainda não existia é
+    gravado já, em vez de ser recalculado do histórico e descartado a cada leitura até a primeira escrita."""
+    saldo = obter_saldo(id_usuario)
+    db.session.commit()
+    return saldo
+
+
+def versao_dados(id_usuario):
+    """Versão atual dos dados do usuário, numa consulta de uma coluna (sem carregar o saldo)."""
+    return db.session.query(SaldoUsuario.versao_dados).filter_by(id_usuario=id_usuario).scalar() or 0
+
+
+def versao_e_arquivamento(id_usuario):
+    """(versao_dados, arquivado_ate) do usuário numa consulta, para quem precisa dos dois (o dashboard)."""
+    linha = db.session.execute(select(SaldoUsuario.versao_dados, SaldoUsuario.arquivado_ate)
+                               .where(SaldoUsuario.id_usuario == id_usuario)).first()
+    return (linha.versao_dados or 0, linha.arquivado_ate) if linha else (0, None)
+
+
+def inicializar_saldos_ausentes():
+    ids_sem_saldo = db.session.query(Transacao.id_usuario).distinct().filter(
+        ~Transacao.id_usuario.in_(db.session.query(SaldoUsuario.id_usuario)))
+    for (id_usuario,) in ids_sem_saldo.all():
+        _inicializar_usuario(db.session, id_usuario)
+    db.session.commit()
+
+
+def reconstruir_saldos(apenas_verificar=False):
+    """Recalcula saldos e resumos de todos os usuários a partir de `transacoes`.
+
+    Retorna a lista de ids cujo valor materializado divergia do histórico.
+    """
+    divergentes = []
+    ids_usuarios = [i for (i,) in db.session.query(Transacao.id_usuario).distinct()]
+    ids_usuarios += [i for (i,) in db.session.query(SaldoUsuario.id_usuario) if i not in ids_usuarios]
+    ids_usuarios += [i for (i,) in db.session.query(TransacaoArquivada.id_usuario).distinct()
+                     if i not in ids_usuarios]
+    for id_usuario in ids_usuarios:
+        esperado = {(int(ano), int(mes), tipo, categoria): (total, quantidade)
+                    for ano, mes, tipo, categoria, total, quantidade in _totais_do_banco(db.session, id_usuario)}
+        atual = {(r.ano, r.mes, r.tipo, r.categoria): (r.total, r.quantidade)
+                 for r in ResumoMensal.query.filter_by(id_usuario=id_usuario)}
+        saldo = db.session.get(SaldoUsuario, id_usuario)
+        receita = sum((t for (_, _, tipo, _), (t, _) in esperado.items() if tipo == 'receita'), Decimal(0))
+        despesa = sum((t for (_, _, tipo, _), (t, _) in esperado.items() if tipo == 'despesa'), Decimal(0))
+        if (saldo is not None and atual == esperado and saldo.total_receita == receita
+                and saldo.total_despesa == despesa):
+            continue
+        divergentes.append(id_usuario)
+        if not apenas_verificar:
+            versao_anterior, arquivado_ate = 0, None
+            if saldo is not None:
+                versao_anterior, arquivado_ate = saldo.versao_dados or 0, saldo.arquivado_ate
+                db.session.delete(saldo)
+                db.session.flush()
+            # A versão continua a crescer: um valor já usado apontaria para relatórios em cache de outros dados
+            _inicializar_usuario(db.session, id_usuario, versao_dados=versao_anterior + 1, arquivado_ate=arquivado_ate)
+    if not apenas_verificar:
+        db.session.commit()
+    return divergentes
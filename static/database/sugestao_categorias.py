@@ -0,0 +1,185 @@
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from sqlalchemy import event, func, select, union_all
+from sqlalchemy.orm import Session
+from static.database.models import db, Transacao, TransacaoArquivada
+from static.database.saldos import valor_anterior, versao_dados
+
+CATEGORIA_PENDENTE = 'A Classificar'
+
+_regex_nao_letras = re.compile(r'[^a-z ]+')
+
+
+def normalizar(texto):
+    # Minúsculas, sem acentos, dígitos ou pontuação: "PIX Enviado - Padaria Pão 123" -> "pix enviado padaria pao"
+    sem_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(_regex_nao_letras.sub(' ', sem_acentos.lower()).split())
+
+
+def chaves(beneficiario, descricao):
+    # Em ordem de confiança: o beneficiário inteiro e, na falta dele, as três primeiras palavras da descrição
+    resultado = []
+    beneficiario_normalizado = normalizar(beneficiario)
+    if beneficiario_normalizado:
+        resultado.append('b:' + beneficiario_normalizado)
+    palavras = [p for p in normalizar(descricao).split() if len(p) > 2][:3]
+    if palavras:
+        resultado.append('d:' + ' '.join(palavras))
+    return resultado
+
+
+class IndiceCategorias:
+    """Frequência das categorias escolhidas pelo usuário para cada beneficiário/descrição normalizados."""
+
+    def __init__(self):
+        self.contagens = defaultdict(Counter)
+        # O índice em cache recebe as mudanças de um commit enquanto outra thread pode estar sugerindo
+        self.trava = threading.Lock()
+
+    def registrar(self, beneficiario, descricao, categoria, quantidade=1):
+        if not categoria or categoria == CATEGORIA_PENDENTE:
+            return
+        with self.trava:
+            for chave in chaves(beneficiario, descricao):
+                self.contagens[chave][categoria] += quantidade
+                if self.contagens[chave][categoria] <= 0:
+                    del self.contagens[chave][categoria]
+
+    def sugerir(self, beneficiario, descricao):
+        for chave in chaves(beneficiario, descricao):
+            with self.trava:
+                contagem = self.contagens.get(chave)
+                if contagem:
+                    return contagem.most_common(1)[0][0]
+        return None
+
+
+class CacheIndices:
+    """LRU em memória com o índice de cada usuário e a versão dos dados (SaldoUsuario.versao_dados) que ele
+    reflete.
+
+    O histórico inteiro só é lido quando o índice não está em cache ou ficou para trás. As escritas deste
+    processo levam o índice da versão em que começaram à versão que gravaram, com as categorizações que fizeram
+    (ver _avancar_indices); uma escrita de outro processo (outro worker do gunicorn, o pool de importação)
+    deixa o índice numa versão antiga, e o próximo obter() com a versão nova o reconstrói do banco.
+    """
+
+    def __init__(self, capacidade=256):
+        self.capacidade = capacidade
+        self.indices = OrderedDict()  # usuário -> (versão, índice)
+        self.trava = threading.Lock()
+
+    def obter(self, id_usuario, versao):
+        with self.trava:
+            guardado = self.indices.get(id_usuario)
+            if guardado is not None and guardado[0] == versao:
+                self.indices.move_to_end(id_usuario)
+                return guardado[1]
+        indice = self.construir(id_usuario)
+        with self.trava:
+            self.indices[id_usuario] = (versao, indice)
+            self.indices.move_to_end(id_usuario)
+            while len(self.indices) > self.capacidade:
+                self.indices.popitem(last=False)
+        return indice
+
+    def avancar(self, id_usuario, versao_anterior, versao_nova, mudancas):
+        """Aplica ao índice guardado na versao_anterior as `mudancas` ({(beneficiario, descricao, categoria):
+        quantidade}) gravadas até versao_nova; um índice de outra versão fica como está."""
+        with self.trava:
+            guardado = self.indices.get(id_usuario)
+            if guardado is None or guardado[0] != versao_anterior:
+                return
+            for (beneficiario, descricao, categoria), quantidade in mudancas.items():
+                guardado[1].registrar(beneficiario, descricao, categoria, quantidade)
+            self.indices[id_usuario] = (versao_nova, guardado[1])
+
+    def construir(self, id_usuario):
+        # Todo o histórico, também o arquivado: arquivar não muda as sugestões (nem a versão dos dados)
+        indice = IndiceCategorias()
+        partes = [select(modelo.beneficiario, modelo.descricao, modelo.categoria).where(
+            modelo.id_usuario == id_usuario,
+            modelo.categoria.isnot(None),
+            modelo.categoria != CATEGORIA_PENDENTE
+        ) for modelo in (Transacao, TransacaoArquivada)]
+        linhas = union_all(*partes).subquery('historico')
+        historico = db.session.execute(
+            select(linhas.c.beneficiario, linhas.c.descricao, linhas.c.categoria, func.count())
+            .group_by(linhas.c.beneficiario, linhas.c.descricao, linhas.c.categoria))
+        for beneficiario, descricao, categoria, quantidade in historico:
+            indice.registrar(beneficiario, descricao, categoria, quantidade)
+        return indice
+
+
+cache_indices = CacheIndices()
+
+
+def indice_do_usuario(id_usuario):
+    # Versão e histórico na mesma transação: o índice construído é o da versão lida
+    return cache_indices.obter(id_usuario, versao_dados(id_usuario))
+
+
+def categorizar_automaticamente(id_usuario, linhas):
+    """Preenche a categoria das linhas pendentes que o histórico do usuário reconhece. Retorna quantas foram.
+
+    Não altera o índice: as linhas só contam no histórico depois do commit (ver _avancar_indices).
+    """
+    indice = indice_do_usuario(id_usuario)
+    categorizadas = 0
+    for linha in linhas:
+        if linha.get('categoria', CATEGORIA_PENDENTE) != CATEGORIA_PENDENTE:
+            continue
+        sugestao = indice.sugerir(linha.get('beneficiario'), linha.get('descricao'))
+        if sugestao:
+            linha['categoria'] = sugestao
+            categorizadas += 1
+    return categorizadas
+
+
+def _somar_mudanca(session, id_usuario, beneficiario, descricao, categoria, sinal):
+    if categoria and categoria != CATEGORIA_PENDENTE:
+        mudancas = session.info.setdefault('mudancas_categorias', defaultdict(Counter))
+        mudancas[id_usuario][(beneficiario, descricao, categoria)] += sinal
+
+
+def registrar_categorizacoes(session, removidas=(), inseridas=()):
+    """Equivalente ao before_flush para escritas em massa via Core, chamado por saldos.registrar_alteracoes (a
+    importação e aplicar_categorias): as linhas precisam de beneficiário, descrição e categoria."""
+    for sinal, linhas in ((-1, removidas), (1, inseridas)):
+        for linha in linhas:
+            _somar_mudanca(session, linha['id_usuario'], linha['beneficiario'], linha['descricao'],
+                           linha['categoria'], sinal)
+
+
+@event.listens_for(Session, 'before_flush')
+def _registrar_categorizacoes_orm(session, flush_context, instances):
+    atributos = ('id_usuario', 'beneficiario', 'descricao', 'categoria')
+    for transacao in session.new:
+        if isinstance(transacao, Transacao):
+            _somar_mudanca(session, *(getattr(transacao, a) for a in atributos), 1)
+    for transacao in session.dirty:
+        if isinstance(transacao, Transacao) and session.is_modified(transacao):
+            _somar_mudanca(session, *(valor_anterior(transacao, a) for a in atributos), -1)
+            _somar_mudanca(session, *(getattr(transacao, a) for a in atributos), 1)
+    for transacao in session.deleted:
+        if isinstance(transacao, Transacao):
+            _somar_mudanca(session, *(valor_anterior(transacao, a) for a in atributos), -1)
+
+
+@event.listens_for(Session, 'after_commit')
+def _avancar_indices(session):
+    # As versões de partida e final de cada usuário são anotadas por saldos.subir_versao_dados
+    mudancas = session.info.pop('mudancas_categorias', {})
+    for id_usuario, (versao_anterior, versao_nova) in session.info.pop('versoes_dados', {}).items():
+        cache_indices.avancar(id_usuario, versao_anterior, versao_nova,
+                              {chave: n for chave, n in mudancas.get(id_usuario, {}).items() if n})
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _descartar_mudancas(session, transacao):
+    # Rollback (ou sessão fechada sem commit): nada do que foi anotado chegou ao banco
+    if transacao.parent is None:
+        session.info.pop('mudancas_categorias', None)
+        session.info.pop('versoes_dados', None)
@@ -0,0 +1,173 @@
+"""Exportação em CSV e XLSX gerada aos pedaços, para ser enviada por uma Response em streaming.
+
+O CSV de transações usa as colunas que o importador lê (Data, Descrição, Valor com sinal), então um
+ficheiro exportado pode ser importado de volta. Textos que uma planilha leria como fórmula (começando com
+=, +, -, @, tabulação ou retorno) saem com um apóstrofo na frente, nos dois formatos. O XLSX é montado diretamente com zipfile (SpreadsheetML
+mínimo, uma planilha por tabela), escrevendo cada entrada do zip à medida que as linhas chegam.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+LINHAS_POR_PEDACO = 500
+
+COLUNAS_TRANSACOES = ['Data', 'Descrição', 'Valor', 'Categoria', 'Beneficiário']
+COLUNAS_GASTOS = ['Descrição', 'Valor da Parcela', 'Recorrente', 'Parcelas Pagas', 'Total de Parcelas', 'Início']
+INICIOS_DE_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def linhas_transacoes(transacoes):
+    # Despesas saem negativas, como nos extratos que o importador aceita
+    for data, descricao, tipo, valor, categoria, beneficiario in transacoes:
+        yield data, descricao or '', valor if tipo == 'receita' else -valor, categoria or '', beneficiario or ''
+
+
+def linhas_gastos(gastos):
+    for descricao, valor_parcela, recorrente, parcelas_pagas, total_parcelas, data_inicio in gastos:
+        yield descricao, valor_parcela, 'Sim' if recorrente else 'Não', parcelas_pagas, total_parcelas or '', \
+            data_inicio
+
+
+def texto_seguro(texto):
+    # Descrição, beneficiário e categoria vêm do usuário ou do extrato: "=HYPERLINK(...)" não pode virar fórmula
+    return "'" + texto if texto.startswith(INICIOS_DE_FORMULA) else texto
+
+
+def _texto_csv(valor):
+    if isinstance(valor, datetime):
+        return valor.strftime('%d/%m/%Y')
+    if isinstance(valor, str):
+        return texto_seguro(valor)
+    return valor
+
+
+def gerar_csv(colunas, linhas):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(colunas)
+    for numero, linha in enumerate(linhas, start=1):
+        escritor.writerow([_texto_csv(valor) for valor in linha])
+        if numero % LINHAS_POR_PEDACO == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+# --- XLSX ---
+
+_caracteres_invalidos_xml = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+ESTILO_DATA, ESTILO_MOEDA = 1, 2
+
+_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+{planilhas}
+</Types>'''
+_PLANILHA_CONTENT_TYPE = '<Override PartName="/xl/worksheets/sheet{n}.xml" ' \
+                         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>{planilhas}</sheets>
+</workbook>'''
+_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+{planilhas}
+<Relationship Id="rIdEstilos" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+# Estilos: 0 = padrão, 1 = data (formato interno 14), 2 = moeda com duas casas (formato interno 4)
+_STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/><xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>'''
+
+
+class _SaidaEmPedacos(io.RawIOBase):
+    # Destino não-posicionável do zipfile: acumula os bytes escritos até o gerador retirá-los
+    def __init__(self):
+        super().__init__()
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+def _celula(valor):
+    if valor is None or valor == '':
+        return '<c/>'
+    if isinstance(valor, datetime):
+        serial = (valor - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="{ESTILO_DATA}"><v>{serial!r}</v></c>'
+    if isinstance(valor, bool):
+        valor = 'Sim' if valor else 'Não'
+    if isinstance(valor, int):
+        return f'<c><v>{valor}</v></c>'
+    if not isinstance(valor, str):
+        return f'<c s="{ESTILO_MOEDA}"><v>{valor}</v></c>'
+    texto = escape(texto_seguro(_caracteres_invalidos_xml.sub('', valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xml(valores):
+    return '<row>' + ''.join(_celula(v) for v in valores) + '</row>'
+
+
+def gerar_xlsx(planilhas):
+    """`planilhas`: lista de (nome, colunas, linhas). Gera os bytes do .xlsx conforme as linhas são lidas."""
+    saida = _SaidaEmPedacos()
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as arquivo:
+        numeros = range(1, len(planilhas) + 1)
+        arquivo.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            planilhas=''.join(_PLANILHA_CONTENT_TYPE.format(n=n) for n in numeros)))
+        arquivo.writestr('_rels/.rels', _RELS)
+        arquivo.writestr('xl/workbook.xml', _WORKBOOK.format(planilhas=''.join(
+            f'<sheet name="{escape(nome)}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, (nome, _, _) in zip(numeros, planilhas))))
+        arquivo.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(planilhas=''.join(
+            f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+            f'worksheet" Target="worksheets/sheet{n}.xml"/>' for n in numeros)))
+        arquivo.writestr('xl/styles.xml', _STYLES)
+        yield saida.retirar()
+        for n, (_, colunas, linhas) in zip(numeros, planilhas):
+            with arquivo.open(f'xl/worksheets/sheet{n}.xml', 'w', force_zip64=True) as planilha:
+                planilha.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                               b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                               b'<sheetData>')
+                planilha.write(_linha_xml(colunas).encode('utf-8'))
+                pedaco = []
+                for numero, linha in enumerate(linhas, start=1):
+                    pedaco.append(_linha_xml(linha))
+                    if numero % LINHAS_POR_PEDACO == 0:
+                        planilha.write(''.join(pedaco).encode('utf-8'))
+                        pedaco = []
+                        yield saida.retirar()
+                planilha.write(''.join(pedaco).encode('utf-8'))
+                planilha.write(b'</sheetData></worksheet>')
+            yield saida.retirar()
+    yield saida.retirar()
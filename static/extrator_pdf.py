@@ -0,0 +1,186 @@
+"""Leitura de extratos bancários em PDF: texto das páginas (pdfplumber) e classificação de cada linha.
+
+Só os processos do pool de importação carregam este módulo (e com ele o pdfplumber, o pdfminer e o
+Pillow); os workers web nunca o importam.
+
+Cada linha passa por poucas regex compiladas uma vez por processo (palavras-chave, valor, datas e
+descrição), na ordem do classificador original e com a mesma saída; uma linha sem vírgula não tem valor e é
+descartada antes de qualquer busca, e as datas já convertidas ficam em cache (data_iso).
+"""
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+
+import pdfplumber
+
+from static.metricas import registrar_etapa
+
+
+def extrair_texto_paginas(caminho_pdf, inicio, fim):
+    # Executado nos processos do pool: cada um abre o PDF e extrai um bloco contíguo de páginas
+    textos = []
+    with pdfplumber.open(caminho_pdf) as pdf:
+        for pagina in pdf.pages[inicio:fim]:
+            textos.append(pagina.extract_text() or '')
+            pagina.close()
+    return textos
+
+
+def compilar_palavras_chave(palavras):
+    # Uma alternância compilada equivale a `any(p in texto for p in palavras)`, numa única busca em C
+    return re.compile('|'.join(map(re.escape, palavras)))
+
+
+@lru_cache(maxsize=4096)
+def data_iso(dia, mes, ano):
+    """'AAAA-MM-DD' da data, ou None se não existir; um extrato repete poucas datas, daí o cache."""
+    try:
+        return datetime(int(ano), int(mes), int(dia)).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+class ExtratorPDF:
+    # Sobe a cada mudança na leitura ou na classificação: as extrações em cache de outra versão são ignoradas
+    VERSAO = 1
+
+    padroes_data = [r'\b(\d{2})[/\-.](\d{2})[/\-.](\d{4})\b', r'\b(\d{2})[/\-.](\d{2})[/\-.](\d{2})\b',
+                    r'\b(\d{4})[/\-.](\d{2})[/\-.](\d{2})\b']
+    padroes_valor = [r'R?\$?\s*(-?\d{1,3}(?:\.\d{3})*,\d{2})', r'(-?\d{1,3}(?:\.\d{3})*,\d{2})',
+                     r'(-?\d+,\d{2})']
+    palavras_despesa = ['débito', 'debito', 'pagamento', 'compra', 'saque', 'tarifa', 'taxa', 'anuidade',
+                        'iof', 'juros', 'transferência enviada', 'pix enviado', 'ted enviada']
+    palavras_receita = ['crédito', 'credito', 'depósito', 'deposito', 'salário', 'salario', 'recebimento',
+                        'transferência recebida', 'pix recebido', 'ted recebida', 'rendimento']
+    palavras_ignorar = ['saldo', 'saldo anterior', 'saldo atual', 'total', 'lançamentos futuros', 'página',
+                        'extrato', 'período', 'agência', 'conta', 'titular', 'cpf', 'cnpj']
+
+    # Compilados uma vez por processo. Os três padrões de valor capturam sempre o mesmo número (o prefixo
+    # opcional do 1º não muda o grupo e o 3º só casaria onde o 2º já casa), então basta o 2º.
+    regex_datas = [re.compile(padrao) for padrao in padroes_data]
+    regex_valor = re.compile(padroes_valor[1])
+    regex_valor_descricao = re.compile(r'R?\$?\s*-?\d+[\.,]\d+')
+    # Em ordem de prioridade: uma linha com palavra a ignorar é descartada antes de se olhar o tipo
+    regex_palavras = [('ignorar', compilar_palavras_chave(palavras_ignorar)),
+                      ('despesa', compilar_palavras_chave(palavras_despesa)),
+                      ('receita', compilar_palavras_chave(palavras_receita))]
+
+    def __init__(self, workers=1, paginas_minimas_paralelo=8):
+        self.workers = workers
+        self.paginas_minimas_paralelo = paginas_minimas_paralelo
+
+    def iterar_textos_paginas(self, arquivo_pdf):
+        # Produz o texto de cada página, em ordem, liberando o cache de layout de cada página após o uso
+        with pdfplumber.open(arquivo_pdf) as pdf:
+            total_paginas = len(pdf.pages)
+            paralelo = (self.workers > 1 and total_paginas >= self.paginas_minimas_paralelo
+                        and isinstance(arquivo_pdf, (str, os.PathLike)))
+            if not paralelo:
+                for pagina in pdf.pages:
+                    yield total_paginas, pagina.extract_text()
+                    pagina.close()
+                return
+        tamanho_bloco = max(1, -(-total_paginas // (self.workers * 4)))
+        inicios = range(0, total_paginas, tamanho_bloco)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            blocos = pool.map(extrair_texto_paginas, [arquivo_pdf] * len(inicios), inicios,
+                              [i + tamanho_bloco for i in inicios])
+            for textos in blocos:
+                for texto in textos:
+                    yield total_paginas, texto
+
+    def iterar_linhas_pdf(self, arquivo_pdf, progresso=None):
+        for numero, (total_paginas, texto) in enumerate(self.iterar_textos_paginas(arquivo_pdf), start=1):
+            if texto: yield from texto.split('\n')
+            if progresso: progresso(numero, total_paginas)
+
+    def extrair_texto_pdf(self, arquivo_pdf, progresso=None):
+        return list(self.iterar_linhas_pdf(arquivo_pdf, progresso))
+
+    def limpar_valor(self, valor_str):
+        valor_str = valor_str.replace('R$', '').replace(' ', '').strip();
+        negativo = valor_str.startswith('-');
+        valor_str = valor_str.lstrip('-');
+        valor_str = valor_str.replace('.', '').replace(',', '.')
+        try:
+            valor = float(valor_str);
+            return -valor if negativo else valor
+        except:
+            return 0.0
+
+    def extrair_data(self, texto):
+        # A 1ª ocorrência de cada padrão, na ordem dos padrões, até uma data válida
+        for regex in self.regex_datas:
+            match = regex.search(texto)
+            if match:
+                primeiro, mes, ultimo = match.groups()
+                if len(primeiro) == 2:
+                    data = data_iso(primeiro, mes, '20' + ultimo if len(ultimo) == 2 else ultimo)
+                else:
+                    data = data_iso(ultimo, mes, primeiro)
+                if data: return data
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def extrair_valor(self, texto):
+        match = self.regex_valor.search(texto)
+        return self.limpar_valor(match.group(1)) if match else 0.0
+
+    def classe_palavras(self, texto_lower):
+        # Devolve a classe de maior prioridade com alguma palavra-chave na linha (ou None)
+        for classe, regex in self.regex_palavras:
+            if regex.search(texto_lower): return classe
+        return None
+
+    def identificar_tipo(self, texto, valor, classe=False):
+        if valor < 0: return 'despesa'
+        if classe is False: classe = self.classe_palavras(texto.lower())
+        if classe in ('despesa', 'receita'): return classe
+        return 'receita' if valor > 0 else 'despesa'
+
+    def deve_ignorar(self, texto, classe=False):
+        if len(texto.strip()) < 10: return True
+        if classe is False: classe = self.classe_palavras(texto.lower())
+        return classe == 'ignorar'
+
+    def extrair_descricao(self, texto, valor_str):
+        descricao = texto
+        for regex in self.regex_datas: descricao = regex.sub('', descricao)
+        descricao = descricao.replace(valor_str, '');
+        descricao = self.regex_valor_descricao.sub('', descricao);
+        descricao = ' '.join(descricao.split())
+        return descricao.strip() or "Transação"
+
+    def classificar_linha(self, linha):
+        if len(linha.strip()) < 10: return None
+        # Sem vírgula não há valor (regex_valor exige ",dd"): a maior parte das linhas descartadas sai aqui,
+        # antes de qualquer busca
+        if ',' not in linha: return None
+        classe = self.classe_palavras(linha.lower())
+        if classe == 'ignorar': return None
+        valor = self.extrair_valor(linha)
+        if valor == 0.0: return None
+        descricao = self.extrair_descricao(linha, str(valor))
+        beneficiario = descricao.split('-')[0].strip()[:100]
+        if not beneficiario: beneficiario = "Não informado"
+        return {'data': self.extrair_data(linha), 'descricao': descricao[:255], 'valor': abs(valor),
+                'tipo': self.identificar_tipo(linha, valor, classe), 'beneficiario': beneficiario}
+
+    def extrair_transacoes(self, arquivo_pdf, progresso=None):
+        # Leitura das páginas e classificação das linhas são intercaladas: o tempo de cada uma é somado à parte
+        transacoes = []
+        tempo_leitura = tempo_classificacao = 0.0
+        inicio = time.perf_counter()
+        for linha in self.iterar_linhas_pdf(arquivo_pdf, progresso):
+            lida = time.perf_counter()
+            tempo_leitura += lida - inicio
+            transacao = self.classificar_linha(linha)
+            if transacao: transacoes.append(transacao)
+            inicio = time.perf_counter()
+            tempo_classificacao += inicio - lida
+        tempo_leitura += time.perf_counter() - inicio
+        registrar_etapa('pdf_leitura_paginas', tempo_leitura)
+        registrar_etapa('pdf_classificacao_linhas', tempo_classificacao)
+        return transacoes
@@ -0,0 +1,206 @@
+"""Instrumentação de requisições, consultas SQL e etapas demoradas, exposta em Server-Timing e em /metrics.
+
+As métricas ficam na memória de cada processo: com vários workers do gunicorn, cada coleta do Prometheus
+responde com os números do worker que a atendeu (o contador `payattention_processo_inicio_segundos`
+identifica qual). Os jobs de importação rodam em processos à parte e devolvem as etapas medidas junto
+com o resultado, para o processo web somá-las aqui.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LIMITES_HISTOGRAMA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histograma:
+    def __init__(self):
+        self.contagens = [0] * (len(LIMITES_HISTOGRAMA) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(LIMITES_HISTOGRAMA, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def acumulados(self):
+        acumulado = 0
+        for limite, contagem in zip(LIMITES_HISTOGRAMA + ('+Inf',), self.contagens):
+            acumulado += contagem
+            yield limite, acumulado
+
+
+def _rotulo(valor):
+    return str(valor).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class ColetorMetricas:
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.inicio = time.time()
+        self.requisicoes = defaultdict(int)  # (endpoint, método, status) -> quantidade
+        self.latencias = defaultdict(Histograma)  # endpoint -> histograma
+        self.consultas = defaultdict(int)
+        self.tempo_sql = defaultdict(float)
+        self.consultas_lentas = defaultdict(int)
+        self.etapas = defaultdict(Histograma)
+        self.caches = defaultdict(int)  # (cache, resultado) -> quantidade; resultado: local, compartilhado ou falha
+        # Só nos processos de importação: etapas e leituras de cache guardadas para serem devolvidas ao processo web
+        self.encaminhar_etapas = False
+        self.etapas_a_encaminhar = []
+        self.caches_a_encaminhar = []
+
+    def registrar_requisicao(self, endpoint, metodo, status, duracao, consultas, tempo_sql, lentas):
+        with self.trava:
+            self.requisicoes[endpoint, metodo, status] += 1
+            self.latencias[endpoint].observar(duracao)
+            self.consultas[endpoint] += consultas
+            self.tempo_sql[endpoint] += tempo_sql
+            self.consultas_lentas[endpoint] += lentas
+
+    def registrar_etapa(self, nome, duracao):
+        with self.trava:
+            self.etapas[nome].observar(duracao)
+            if self.encaminhar_etapas:
+                self.etapas_a_encaminhar.append((nome, duracao))
+
+    def registrar_cache(self, nome, resultado):
+        with self.trava:
+            self.caches[nome, resultado] += 1
+            if self.encaminhar_etapas:
+                self.caches_a_encaminhar.append((nome, resultado))
+
+    def retirar_etapas(self):
+        with self.trava:
+            etapas, self.etapas_a_encaminhar = self.etapas_a_encaminhar, []
+            return etapas
+
+    def retirar_caches(self):
+        with self.trava:
+            caches, self.caches_a_encaminhar = self.caches_a_encaminhar, []
+            return caches
+
+    def texto_prometheus(self):
+        linhas = []
+
+        def cabecalho(nome, tipo, ajuda):
+            linhas.append(f'# HELP {nome} {ajuda}')
+            linhas.append(f'# TYPE {nome} {tipo}')
+
+        def histogramas(nome, rotulo, dados, ajuda):
+            cabecalho(nome, 'histogram', ajuda)
+            for chave, histograma in sorted(dados.items()):
+                base = f'{rotulo}="{_rotulo(chave)}"'
+                for limite, acumulado in histograma.acumulados():
+                    linhas.append(f'{nome}_bucket{{{base},le="{limite}"}} {acumulado}')
+                linhas.append(f'{nome}_sum{{{base}}} {histograma.soma}')
+                linhas.append(f'{nome}_count{{{base}}} {histograma.total}')
+
+        def contadores(nome, dados, ajuda):
+            cabecalho(nome, 'counter', ajuda)
+            for endpoint, valor in sorted(dados.items()):
+                linhas.append(f'{nome}{{endpoint="{_rotulo(endpoint)}"}} {valor}')
+
+        with self.trava:
+            cabecalho('payattention_processo_inicio_segundos', 'gauge', 'Início do processo (epoch)')
+            linhas.append(f'payattention_processo_inicio_segundos {self.inicio}')
+            cabecalho('payattention_requisicoes_total', 'counter', 'Requisições atendidas')
+            for (endpoint, metodo, status), valor in sorted(self.requisicoes.items()):
+                linhas.append(f'payattention_requisicoes_total{{endpoint="{_rotulo(endpoint)}",'
+                              f'metodo="{metodo}",status="{status}"}} {valor}')
+            histogramas('payattention_requisicao_segundos', 'endpoint', self.latencias,
+                        'Latência das requisições até o envio dos cabeçalhos')
+            contadores('payattention_consultas_sql_total', self.consultas, 'Consultas SQL executadas')
+            contadores('payattention_sql_segundos_total', self.tempo_sql, 'Tempo gasto em consultas SQL')
+            contadores('payattention_consultas_lentas_total', self.consultas_lentas,
+                       'Consultas SQL acima de SQL_LENTO_SEGUNDOS')
+            histogramas('payattention_etapa_segundos', 'etapa', self.etapas,
+                        'Duração das etapas de importação e de geração de relatórios')
+            cabecalho('payattention_cache_total', 'counter',
+                      'Leituras de cache por nível que respondeu (local, compartilhado) ou falha')
+            for (nome, resultado), valor in sorted(self.caches.items()):
+                linhas.append(f'payattention_cache_total{{cache="{_rotulo(nome)}",resultado="{resultado}"}} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+
+coletor = ColetorMetricas()
+
+
+def registrar_etapa(nome, duracao):
+    coletor.registrar_etapa(nome, duracao)
+    if has_request_context() and 'metricas' in g:
+        g.metricas['etapas'].append((nome, duracao))
+
+
+@contextmanager
+def etapa(nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(nome, time.perf_counter() - inicio)
+
+
+def instrumentar_motor(engine, limite_lento):
+    """Conta consultas e tempo de SQL da requisição atual; consultas acima de `limite_lento` vão para o log."""
+
+    # O início fica no contexto de execução da própria consulta: uma que levanta exceção não passa por
+    # after_cursor_execute, e o que ela deixou não é visto por nenhuma outra
+    @event.listens_for(engine, 'before_cursor_execute')
+    def antes(_conexao, _cursor, _sql, _parametros, contexto, _executemany):
+        if contexto is not None:
+            contexto.inicio_consulta = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def depois(_conexao, _cursor, sql, _parametros, contexto, executemany):
+        inicio = getattr(contexto, 'inicio_consulta', None)
+        if inicio is None:
+            return
+        duracao = time.perf_counter() - inicio
+        lenta = duracao >= limite_lento
+        if lenta:
+            logger.warning("Consulta lenta (%.3fs%s): %s", duracao, ', executemany' if executemany else '',
+                           ' '.join(sql.split())[:500])
+        if has_request_context() and 'metricas' in g:
+            metricas = g.metricas
+            metricas['consultas'] += 1
+            metricas['tempo_sql'] += duracao
+            metricas['lentas'] += lenta
+
+
+def instrumentar_app(app):
+    @app.before_request
+    def iniciar_metricas():
+        g.metricas = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_sql': 0.0, 'lentas': 0, 'etapas': []}
+
+    @app.after_request
+    def publicar_metricas(resposta):
+        metricas = g.get('metricas')
+        if metricas is None:
+            return resposta
+        # A requisição é registrada no teardown; aqui só o status, a duração e o cabeçalho
+        duracao = time.perf_counter() - metricas['inicio']
+        metricas['status'], metricas['duracao'] = resposta.status_code, duracao
+        tempos = [f'app;dur={duracao * 1000:.1f}',
+                  f'sql;desc="{metricas["consultas"]} consultas";dur={metricas["tempo_sql"] * 1000:.1f}']
+        tempos += [f'{nome};dur={segundos * 1000:.1f}' for nome, segundos in metricas['etapas']]
+        resposta.headers['Server-Timing'] = ', '.join(tempos)
+        return resposta
+
+    @app.teardown_request
+    def registrar_metricas(erro):
+        # Roda sempre, inclusive quando uma exceção impede o after_request (sem resposta, conta como 500)
+        metricas = g.pop('metricas', None)
+        if metricas is None:
+            return
+        duracao = metricas.get('duracao', time.perf_counter() - metricas['inicio'])
+        coletor.registrar_requisicao(request.endpoint or 'desconhecido', request.method, metricas.get('status', 500),
+                                     duracao, metricas['consultas'], metricas['tempo_sql'], metricas['lentas'])
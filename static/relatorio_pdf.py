@@ -0,0 +1,172 @@
+"""Geração dos relatórios em PDF.
+
+As fontes DejaVu são lidas e analisadas uma única vez por processo; cada documento recebe uma cópia leve
+das métricas (o fpdf2 faz o subset da fonte no próprio objeto ao gerar o PDF, por isso o TTFont em si não
+é compartilhado). Larguras de texto e truncamentos são memorizados, e o truncamento usa busca binária
+sobre as larguras acumuladas dos prefixos em vez de cortar um caractere por vez. O texto das células passa
+antes por texto_imprimivel: quebras de linha, tabulações e caracteres sem glifo na DejaVu não chegam ao
+text() do fpdf2, que falha com eles.
+"""
+import copy
+import io
+import os
+import re
+from bisect import bisect_right
+from decimal import Decimal
+from functools import lru_cache
+from itertools import accumulate
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+PASTA_FONTES = os.path.join(os.path.dirname(__file__), 'fonts')
+FONTES = {'': 'DejaVuSans.ttf', 'B': 'DejaVuSans-Bold.ttf', 'I': 'DejaVuSans-Oblique.ttf'}
+RETICENCIAS = '...'
+SUBSTITUTO = '?'
+PADDING = 4
+ALTURA_LINHA = 10
+
+_regex_espacos = re.compile(r'[\s\x00-\x1f\x7f-\x9f]+')
+
+
+@lru_cache(maxsize=None)
+def _fontes_processadas():
+    # {estilo: (TTFFont já analisada, bytes do .ttf)}
+    molde = FPDF()
+    for estilo, arquivo in FONTES.items():
+        molde.add_font('DejaVu', estilo, os.path.join(PASTA_FONTES, arquivo))
+    return {estilo: (molde.fonts['dejavu' + estilo], open(molde.fonts['dejavu' + estilo].ttffile, 'rb').read())
+            for estilo in FONTES}
+
+
+@lru_cache(maxsize=65536)
+def texto_imprimivel(texto, estilo=''):
+    """`texto` numa linha só (espaços e caracteres de controle viram um espaço), com SUBSTITUTO no lugar
+    dos caracteres que a DejaVu do estilo não tem."""
+    glifos = _fontes_processadas()[estilo][0].cmap
+    texto = _regex_espacos.sub(' ', texto)
+    if glifos.keys() >= set(map(ord, texto)):
+        return texto
+    return ''.join(c if ord(c) in glifos else SUBSTITUTO for c in texto)
+
+
+@lru_cache(maxsize=65536)
+def largura_texto(texto, estilo='', tamanho=10):
+    """Largura em mm de texto_imprimivel(texto), igual a FPDF.get_string_width com a DejaVu no estilo/tamanho."""
+    larguras = _fontes_processadas()[estilo][0].cw
+    return sum(larguras[ord(c)] for c in texto_imprimivel(texto, estilo)) * tamanho / 1000 * 25.4 / 72
+
+
+@lru_cache(maxsize=65536)
+def truncar(texto, largura_maxima, estilo='', tamanho=10):
+    """Maior prefixo de texto_imprimivel(texto) que, seguido de reticências, cabe em `largura_maxima` (mm)."""
+    texto = texto_imprimivel(texto, estilo)
+    if largura_texto(texto, estilo, tamanho) <= largura_maxima:
+        return texto
+    prefixos = list(accumulate(largura_texto(c, estilo, tamanho) for c in texto))
+    limite = largura_maxima - largura_texto(RETICENCIAS, estilo, tamanho)
+    return texto[:bisect_right(prefixos, limite + 1e-9)] + RETICENCIAS
+
+
+class PDFRelatorio(FPDF):
+    def __init__(self, titulo, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.titulo = titulo
+        for estilo, (fonte, conteudo) in _fontes_processadas().items():
+            copia = copy.deepcopy(fonte)
+            copia.ttfont = ttLib.TTFont(io.BytesIO(conteudo), recalcTimestamp=False, fontNumber=0, lazy=True)
+            self.fonts[fonte.fontkey] = copia
+
+    def header(self):
+        self.set_font('DejaVu', 'B', 15)
+        self.cell(0, 10, self.titulo, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+        self.ln(10)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('DejaVu', 'I', 8)
+        self.cell(0, 10, f'Pagina {self.page_no()}/{{nb}}', new_x=XPos.RIGHT, new_y=YPos.TOP, align='C')
+
+    def tabela(self, colunas, linhas, rodape=None):
+        """Desenha `linhas` (tuplas de str) sob `colunas` [(título, largura, alinhamento, truncar)]."""
+        self.set_font('DejaVu', 'B', 10)
+        for i, (titulo, largura, _, _) in enumerate(colunas):
+            ultima = i == len(colunas) - 1
+            self.cell(largura, ALTURA_LINHA, titulo, border=1, align='C',
+                      new_x=XPos.LMARGIN if ultima else XPos.RIGHT, new_y=YPos.NEXT if ultima else YPos.TOP)
+        self.set_font('DejaVu', '', 10)
+        for linha in linhas:
+            self.linha_tabela(colunas, linha)
+        if rodape:
+            self.set_font('DejaVu', 'B', 10)
+            rotulo, valor = rodape
+            largura_valor = colunas[-1][1]
+            self.cell(sum(c[1] for c in colunas) - largura_valor, ALTURA_LINHA, rotulo, border=1, align='R',
+                      new_x=XPos.RIGHT, new_y=YPos.TOP)
+            self.cell(largura_valor, ALTURA_LINHA, valor, border=1, align='R', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    def linha_tabela(self, colunas, linha):
+        # Mesmo resultado visual de cell(border=1), mas com rect() + text() e larguras já memorizadas:
+        # cell() refaz medição, quebra e estilização do texto a cada chamada e domina o tempo em relatórios longos
+        if self.get_y() + ALTURA_LINHA > self.page_break_trigger:
+            self.add_page()
+        x, y = self.l_margin, self.get_y()
+        base = y + ALTURA_LINHA / 2 + 0.3 * self.font_size
+        for (_, largura, alinhamento, cortar), texto in zip(colunas, linha):
+            texto = texto_imprimivel(texto, self.font_style)
+            if cortar:
+                texto = truncar(texto, largura - PADDING, self.font_style, self.font_size_pt)
+            self.rect(x, y, largura, ALTURA_LINHA)
+            if alinhamento == 'R':
+                self.text(x + largura - self.c_margin - largura_texto(texto, self.font_style, self.font_size_pt), base, texto)
+            elif alinhamento == 'C':
+                self.text(x + (largura - largura_texto(texto, self.font_style, self.font_size_pt)) / 2, base, texto)
+            else:
+                self.text(x + self.c_margin, base, texto)
+            x += largura
+        self.set_y(y + ALTURA_LINHA)
+
+
+def _documento(titulo, periodo_texto):
+    pdf = PDFRelatorio(titulo)
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    pdf.set_font('DejaVu', '', 12)
+    pdf.cell(0, 10, periodo_texto, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+    return pdf
+
+
+def relatorio_despesas(periodo_texto, despesas, formatar_moeda):
+    """`despesas`: lista de (data, descricao, categoria, valor)."""
+    pdf = _documento('Relatorio de Despesas', periodo_texto)
+    pdf.tabela([('Data', 25, '', False), ('Descricao', 85, '', True), ('Categoria', 40, '', True),
+                ('Valor (R$)', 30, 'R', False)],
+               ((data.strftime('%d/%m/%Y'), descricao or '', categoria or '', formatar_moeda(valor))
+                for data, descricao, categoria, valor in despesas),
+               rodape=('Total de Despesas', formatar_moeda(sum((d[3] for d in despesas), Decimal(0)))))
+    return bytes(pdf.output())
+
+
+def relatorio_categorias(periodo_texto, totais, formatar_moeda):
+    """`totais`: lista de (categoria, quantidade, total) das despesas do período."""
+    pdf = _documento('Despesas por Categoria', periodo_texto)
+    total_geral = sum((total for _, _, total in totais), Decimal(0))
+    pdf.tabela([('Categoria', 80, '', True), ('Lançamentos', 30, 'R', False), ('% do total', 30, 'R', False),
+                ('Valor (R$)', 40, 'R', False)],
+               ((categoria or 'Sem categoria', str(quantidade),
+                 f'{total / total_geral * 100:.1f}%'.replace('.', ',') if total_geral else '-', formatar_moeda(total))
+                for categoria, quantidade, total in totais),
+               rodape=('Total de Despesas', formatar_moeda(total_geral)))
+    return bytes(pdf.output())
+
+
+def relatorio_mensal(periodo_texto, meses, formatar_moeda):
+    """`meses`: lista de (ano, mes, receitas, despesas)."""
+    pdf = _documento('Resumo Mensal', periodo_texto)
+    saldo = sum((receitas - despesas for _, _, receitas, despesas in meses), Decimal(0))
+    pdf.tabela([('Mês', 30, 'C', False), ('Receitas (R$)', 50, 'R', False), ('Despesas (R$)', 50, 'R', False),
+                ('Saldo (R$)', 50, 'R', False)],
+               ((f'{mes:02d}/{ano}', formatar_moeda(receitas), formatar_moeda(despesas),
+                 formatar_moeda(receitas - despesas)) for ano, mes, receitas, despesas in meses),
+               rodape=('Saldo do Período', formatar_moeda(saldo)))
+    return bytes(pdf.output())
@@ -0,0 +1,36 @@
+"""Peças usadas por mais de um blueprint: o decorador de login, o filtro de moeda e o saldo materializado."""
+from decimal import Decimal
+from functools import wraps
+
+from flask import flash, redirect, session, url_for
+
+from static.database.saldos import obter_saldo
+
+CORES_CATEGORIA = {'Alimentação': '#FF6384', 'Transporte': '#36A2EB', 'Moradia': '#FFCE56', 'Lazer': '#4BC0C0',
+                   'Saúde': '#9966FF', 'Investimento': '#FF9F40', 'Outros': '#C9CBCF', 'A Classificar': '#E7E9ED'}
+
+
+def format_currency_brl(value):
+    if value is None:
+        return "0,00"
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    formatted_value = f"{value:,.2f}"
+    return formatted_value.replace(',', 'X').replace('.', ',').replace('X', '.')
+
+
+def login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'id_usuario' not in session:
+            flash("Você precisa estar logado para acessar esta página.", "error")
+            return redirect(url_for('usuarios.fazer_login'))
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def calcular_saldo(usuario_id, bloquear=False):
+    # Lê o saldo materializado (O(1)); `bloquear` trava a linha para verificações de saldo seguidas de escrita
+    saldo_usuario = obter_saldo(usuario_id, bloquear=bloquear)
+    return saldo_usuario.saldo, saldo_usuario.total_receita, saldo_usuario.total_despesa
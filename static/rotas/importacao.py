@@ -0,0 +1,532 @@
+"""Importação de extratos: CSV na própria requisição, PDF em jobs num pool de processos, e a categorização.
+
+O extrator de PDF (static.extrator_pdf) é importado dentro do job, no processo do pool. O PDF enviado é
+gravado em disco já com a hash do conteúdo; um reenvio do mesmo extrato reaproveita a extração anterior.
+"""
+import csv
+import hashlib
+import io
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, session, url_for
+from sqlalchemy import and_, case, func, insert, select, update
+
+from static.database.deduplicacao import MarcadorImpressoes, separar_duplicadas
+from static.database.leituras import pendentes_do_lote
+from static.database.models import db, JobImportacao, LoteImportacao, Transacao
+from static.database.saldos import registrar_alteracoes, registrar_insercoes
+from static.database.sugestao_categorias import categorizar_automaticamente, CATEGORIA_PENDENTE
+from static.cache_resultados import COMPARTILHADO, FALHA
+from static.metricas import coletor, etapa, registrar_etapa
+from static.rotas.comum import calcular_saldo, login_required
+
+bp = Blueprint('importacao', __name__)
+# Definido por criar_app (static/cache_extracoes.py)
+cache_extracoes = None
+TAMANHO_BLOCO_UPLOAD = 1024 * 1024
+
+
+def extrair_beneficiario(descricao_completa):
+    try:
+        partes = descricao_completa.split(' - ')
+        if len(partes) > 1:
+            beneficiario = partes[1].split(' - ')[0].strip()
+            if 'Agência:' in beneficiario or 'Conta:' in beneficiario: return partes[0]
+            return beneficiario
+        return descricao_completa.split(',')[0]
+    except:
+        return descricao_completa
+
+
+def texto_linha_atual(row):
+    return ', '.join(str(v) for v in row.values() if v)[:60]
+
+
+def ler_linhas_csv(arquivo, usuario_id):
+    # Lê o upload aos poucos (sem carregar o ficheiro inteiro) e produz uma linha por vez: (trecho, dados, erro)
+    texto = io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(texto):
+        try:
+            valor_num = Decimal((row.get('Valor') or '0').strip())
+        except InvalidOperation:
+            yield texto_linha_atual(row), None, 'valor inválido'
+            continue
+        data_str = (row.get('Data') or '').strip()
+        try:
+            data_transacao = datetime.strptime(data_str, '%d/%m/%Y') if data_str else datetime.now()
+        except ValueError:
+            yield texto_linha_atual(row), None, 'data inválida'
+            continue
+        descricao = row.get('Descrição') or 'Não informado'
+        yield texto_linha_atual(row), {
+            'descricao': descricao[:255], 'valor': abs(valor_num), 'tipo': 'receita' if valor_num > 0 else 'despesa',
+            'beneficiario': extrair_beneficiario(row.get('Descrição') or '')[:100],
+            'id_usuario': usuario_id, 'data': data_transacao, 'categoria': CATEGORIA_PENDENTE
+        }, None
+
+
+def inserir_transacoes_em_massa(linhas):
+    # INSERT em massa (executemany) com commit por bloco, sem instanciar um objeto ORM por linha
+    with etapa('importacao_insercao'):
+        db.session.execute(insert(Transacao), linhas)
+        registrar_insercoes(db.session, linhas)
+        db.session.commit()
+    return len(linhas)
+
+
+def novo_lote_importacao(usuario_id, nome_arquivo, origem):
+    # Só entra na sessão com a primeira transação nova: um upload só de duplicadas ou de erros não deixa lote
+    return LoteImportacao(id_usuario=usuario_id, nome_arquivo=nome_arquivo[:255], origem=origem)
+
+
+def id_do_lote(lote):
+    if lote.id_lote is None:
+        db.session.add(lote)
+        db.session.flush()
+    return lote.id_lote
+
+
+def importar_bloco(usuario_id, linhas, marcador, lote):
+    # Linhas já importadas (extrato reenviado ou com período sobreposto) saem antes de qualquer outro trabalho
+    with etapa('importacao_deduplicacao'):
+        novas, duplicadas = separar_duplicadas(usuario_id, marcador.marcar(linhas))
+    if not novas:
+        return Counter(duplicadas=duplicadas)
+    # O índice em cache já inclui os blocos anteriores: o commit de cada um o leva à versão nova
+    with etapa('importacao_categorizacao'):
+        automaticas = categorizar_automaticamente(usuario_id, novas)
+    # O lote é gravado no mesmo commit do primeiro bloco inserido
+    id_lote = id_do_lote(lote)
+    for linha in novas:
+        linha['id_lote'] = id_lote
+    importadas = inserir_transacoes_em_massa(novas)
+    return Counter(importadas=importadas, automaticas=automaticas, duplicadas=duplicadas)
+
+
+def processar_csv(arquivo, usuario_id):
+    tamanho_bloco = current_app.config['TAMANHO_LOTE_IMPORTACAO']
+    lote = novo_lote_importacao(usuario_id, arquivo.filename, 'csv')
+    totais, erros, pendentes = Counter(), [], []
+    total_erros = 0
+    marcador = MarcadorImpressoes()
+    try:
+        for numero, (trecho, dados, erro) in enumerate(ler_linhas_csv(arquivo, usuario_id), start=2):
+            if erro:
+                total_erros += 1
+                if len(erros) < 5:
+                    erros.append(f"linha {numero} ({trecho}): {erro}")
+                continue
+            pendentes.append(dados)
+            if len(pendentes) >= tamanho_bloco:
+                totais.update(importar_bloco(usuario_id, pendentes, marcador, lote))
+                pendentes = []
+        if pendentes:
+            totais.update(importar_bloco(usuario_id, pendentes, marcador, lote))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ocorreu um erro ao processar o ficheiro CSV: {e}', 'danger')
+        if not totais['importadas']:
+            return redirect(url_for("importacao.importar_extrato"))
+    if total_erros:
+        flash(f'{total_erros} linhas ignoradas por erro: ' + '; '.join(erros) + (' ...' if total_erros > 5 else ''),
+              'warning')
+    if totais['duplicadas']:
+        flash(f"{totais['duplicadas']} transações ignoradas por já terem sido importadas anteriormente.", 'info')
+    if not totais['importadas']:
+        if not totais['duplicadas']:
+            flash('Nenhuma transação encontrada no ficheiro CSV.', 'warning')
+        return redirect(url_for('importacao.importar_extrato'))
+    return encaminhar_categorizacao(lote.id_lote, totais['importadas'], totais['automaticas'])
+
+
+def encaminhar_categorizacao(id_lote, importadas, automaticas):
+    if automaticas:
+        flash(f'{automaticas} de {importadas} transações categorizadas automaticamente pelo seu histórico.', 'info')
+    if automaticas == importadas:
+        flash(f'{importadas} transações importadas!', 'success')
+        return redirect(url_for('painel.listar_transacoes'))
+    session['lote_a_categorizar'] = id_lote
+    flash(f'{importadas} transações importadas! Por favor, categorize as {importadas - automaticas} restantes '
+          'abaixo.', 'info')
+    return redirect(url_for('importacao.categorizar_transacoes_importadas'))
+
+
+def importar_transacoes_extraidas(transacoes_extraidas, usuario_id, lote):
+    """Descarta as já importadas, aplica a verificação de saldo e grava as aceitas, com o lote se houver alguma.
+
+    Retorna (importadas, recusadas, duplicadas).
+    """
+    linhas = []
+    for t in transacoes_extraidas:
+        try:
+            data_transacao = datetime.strptime(t['data'], '%Y-%m-%d')
+        except:
+            data_transacao = datetime.now()
+        linhas.append({'descricao': t['descricao'], 'valor': Decimal(str(t['valor'])), 'tipo': t['tipo'],
+                       'beneficiario': t['beneficiario'], 'id_usuario': usuario_id, 'data': data_transacao})
+    with etapa('importacao_deduplicacao'):
+        linhas, duplicadas = separar_duplicadas(usuario_id, MarcadorImpressoes().marcar(linhas))
+    saldo_atual, _, _ = calcular_saldo(usuario_id, bloquear=True)
+    with etapa('importacao_categorizacao'):
+        categorizar_automaticamente(usuario_id, linhas)
+    novas_transacoes = []
+    recusadas = 0
+    for linha in linhas:
+        if linha['tipo'] == 'despesa':
+            if linha['valor'] > saldo_atual:
+                recusadas += 1
+                continue
+            saldo_atual -= linha['valor']
+        else:
+            saldo_atual += linha['valor']
+        novas_transacoes.append(Transacao(**{'categoria': CATEGORIA_PENDENTE, **linha}))
+    with etapa('importacao_insercao'):
+        if novas_transacoes:
+            id_lote = id_do_lote(lote)
+            for transacao in novas_transacoes:
+                transacao.id_lote = id_lote
+        db.session.add_all(novas_transacoes)
+        db.session.commit()
+    return len(novas_transacoes), recusadas, duplicadas
+
+
+# --- IMPORTAÇÃO DE PDF EM SEGUNDO PLANO ---
+pool_importacao = None
+ultima_varredura = None
+# No processo do job: o app criado por inicializar_worker_importacao
+app_do_job = None
+
+
+class JobRetomado(Exception):
+    """A varredura tirou o job deste processo (sem sinal de vida por tempo demais): outro o reivindicou ou o deu
+    como erro, então este não grava mais nada nele."""
+
+
+def inicializar_worker_importacao():
+    global app_do_job
+    # Um app próprio, com motor e caches do processo: funciona com fork, spawn ou forkserver, e não toca nas
+    # conexões que um fork copiou do processo web
+    from app import criar_app
+    app_do_job = criar_app()
+    coletor.encaminhar_etapas = True
+
+
+def somar_metricas_do_job(futuro):
+    # Etapas e leituras de cache do processo do job voltam como resultado e entram nas métricas do processo web
+    if not futuro.cancelled() and futuro.exception() is None:
+        etapas, caches = futuro.result()
+        for nome, duracao in etapas:
+            coletor.registrar_etapa(nome, duracao)
+        for nome, resultado in caches:
+            coletor.registrar_cache(nome, resultado)
+
+
+def obter_pool_importacao():
+    global pool_importacao
+    if pool_importacao is None:
+        pool_importacao = ProcessPoolExecutor(max_workers=current_app.config['WORKERS_IMPORTACAO'],
+                                              initializer=inicializar_worker_importacao)
+    return pool_importacao
+
+
+def agendar_job_importacao(id_job):
+    global pool_importacao
+    try:
+        futuro = obter_pool_importacao().submit(executar_job_importacao, id_job)
+    except BrokenProcessPool:
+        # Um processo do pool morreu (falta de memória, por exemplo) e o pool não aceita mais jobs; os que
+        # ele executava ficam em "processando" até a varredura devolvê-los à fila
+        pool_importacao = None
+        futuro = obter_pool_importacao().submit(executar_job_importacao, id_job)
+    futuro.add_done_callback(somar_metricas_do_job)
+
+
+def recuperar_jobs_travados():
+    """Devolve à fila os jobs em processamento sem sinal de vida há mais de TEMPO_MAXIMO_JOB_IMPORTACAO; os que
+    já usaram todas as tentativas terminam como erro."""
+    limite = datetime.now() - timedelta(seconds=current_app.config['TEMPO_MAXIMO_JOB_IMPORTACAO'])
+    travado = and_(JobImportacao.status == 'processando',
+                   func.coalesce(JobImportacao.atualizado_em, JobImportacao.criado_em) < limite)
+    esgotados = []
+    for job in JobImportacao.query.filter(travado).all():
+        if (job.tentativas or 0) >= current_app.config['TENTATIVAS_JOB_IMPORTACAO']:
+            novos = {'status': 'erro', 'concluido_em': datetime.now(),
+                     'mensagem_erro': 'A importação excedeu o tempo máximo de processamento.'}
+        else:
+            novos = {'status': 'pendente'}
+        # Com a condição de novo: o job pode ter dado sinal de vida (ou terminado) depois da consulta
+        if JobImportacao.query.filter(JobImportacao.id_job == job.id_job, travado).update(
+                novos, synchronize_session=False) and novos['status'] == 'erro':
+            esgotados.append(job.caminho_arquivo)
+    db.session.commit()
+    for caminho in esgotados:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def varrer_jobs_importacao():
+    """Recupera os jobs travados e envia ao pool os pendentes (inclusive os de outro processo web que parou).
+
+    Roda na primeira importação de cada processo e depois no máximo uma vez a cada INTERVALO_VARREDURA_JOBS,
+    nas requisições de importação e de acompanhamento. Um job enviado duas vezes só é executado uma: a
+    reivindicação em executar_job_importacao é atômica. Retorna se a varredura rodou.
+    """
+    global ultima_varredura
+    agora = time.monotonic()
+    if ultima_varredura is not None and agora - ultima_varredura < current_app.config['INTERVALO_VARREDURA_JOBS']:
+        return False
+    ultima_varredura = agora
+    recuperar_jobs_travados()
+    for (id_job,) in db.session.query(JobImportacao.id_job).filter_by(status='pendente').all():
+        agendar_job_importacao(id_job)
+    return True
+
+
+def extrair_transacoes_do_job(job, progresso):
+    # Carregado só aqui: o pdfplumber e as suas dependências ficam fora dos workers web
+    from static.extrator_pdf import ExtratorPDF
+
+    extracao = job.hash_arquivo and cache_extracoes.obter_extracao(job.hash_arquivo, ExtratorPDF.VERSAO)
+    coletor.registrar_cache('extracoes_pdf', COMPARTILHADO if extracao else FALHA)
+    if extracao:
+        paginas, transacoes = extracao
+        progresso(paginas, paginas)
+        return transacoes
+    paginas = []
+
+    def contar_paginas(paginas_processadas, total_paginas):
+        paginas[:] = [total_paginas]
+        progresso(paginas_processadas, total_paginas)
+
+    extrator = ExtratorPDF(workers=current_app.config['WORKERS_EXTRACAO_PDF'],
+                           paginas_minimas_paralelo=current_app.config['PAGINAS_MINIMAS_EXTRACAO_PARALELA'])
+    transacoes = extrator.extrair_transacoes(job.caminho_arquivo, contar_paginas)
+    if job.hash_arquivo:
+        cache_extracoes.guardar_extracao(job.hash_arquivo, ExtratorPDF.VERSAO, paginas[0] if paginas else 0,
+                                         transacoes)
+    return transacoes
+
+
+def renovar_job(id_job, tentativa):
+    # Sinal de vida, na transação em curso; só vale enquanto a reivindicação deste processo (a tentativa) for a
+    # última. Sem autoflush: a condição olha o status gravado, não o desfecho ainda pendente na sessão
+    with db.session.no_autoflush:
+        renovado = JobImportacao.query.filter_by(id_job=id_job, status='processando', tentativas=tentativa).update(
+            {'atualizado_em': datetime.now()}, synchronize_session=False)
+    if not renovado:
+        raise JobRetomado()
+
+
+def executar_job_importacao(id_job):
+    with app_do_job.app_context():
+        # Reivindica o job atomicamente: com vários workers do gunicorn, só um processo o executa
+        reivindicado = JobImportacao.query.filter_by(id_job=id_job, status='pendente').update(
+            {'status': 'processando', 'atualizado_em': datetime.now(),
+             'tentativas': func.coalesce(JobImportacao.tentativas, 0) + 1}, synchronize_session=False)
+        db.session.commit()
+        if not reivindicado:
+            return [], []
+        job = db.session.get(JobImportacao, id_job)
+        # Guardada agora: depois de cada commit, job.tentativas seria relido do banco
+        tentativa = job.tentativas
+
+        def atualizar_progresso(paginas_processadas, total_paginas):
+            renovar_job(id_job, tentativa)
+            job.paginas_processadas, job.total_paginas = paginas_processadas, total_paginas
+            db.session.commit()
+
+        inicio = time.perf_counter()
+        try:
+            try:
+                transacoes_extraidas = extrair_transacoes_do_job(job, atualizar_progresso)
+                lote = novo_lote_importacao(job.id_usuario, job.nome_arquivo, 'pdf')
+                # Na mesma transação das transações gravadas: se a varredura já devolveu o job à fila, nada é
+                # gravado
+                renovar_job(id_job, tentativa)
+                importadas, recusadas, duplicadas = importar_transacoes_extraidas(transacoes_extraidas,
+                                                                                  job.id_usuario, lote)
+                job.id_lote = lote.id_lote if importadas else None
+                job.linhas_encontradas = len(transacoes_extraidas)
+                job.linhas_recusadas = recusadas
+                job.linhas_duplicadas = duplicadas
+                job.status = 'concluido'
+            except JobRetomado:
+                raise
+            except Exception as e:
+                db.session.rollback()
+                job.status = 'erro'
+                job.mensagem_erro = str(e)[:500]
+            # O desfecho também só é gravado se o job ainda for desta tentativa
+            renovar_job(id_job, tentativa)
+        except JobRetomado:
+            # O arquivo e o job agora são de outra tentativa
+            db.session.rollback()
+            return coletor.retirar_etapas(), coletor.retirar_caches()
+        job.concluido_em = datetime.now()
+        db.session.commit()
+        if os.path.exists(job.caminho_arquivo):
+            os.remove(job.caminho_arquivo)
+        registrar_etapa('importacao_pdf_total', time.perf_counter() - inicio)
+    return coletor.retirar_etapas(), coletor.retirar_caches()
+
+
+def gravar_upload(arquivo, pasta, sufixo):
+    # Copia o upload para a pasta em blocos, calculando a SHA-256 na mesma passagem; devolve (caminho, hash)
+    os.makedirs(pasta, exist_ok=True)
+    resumo = hashlib.sha256()
+    descritor, caminho = tempfile.mkstemp(dir=pasta, suffix=sufixo)
+    with os.fdopen(descritor, 'wb') as destino:
+        for bloco in iter(lambda: arquivo.stream.read(TAMANHO_BLOCO_UPLOAD), b''):
+            resumo.update(bloco)
+            destino.write(bloco)
+    return caminho, resumo.hexdigest()
+
+
+def processar_pdf(arquivo, usuario_id):
+    caminho, hash_arquivo = gravar_upload(arquivo, current_app.config['PASTA_UPLOADS'], '.pdf')
+    job = JobImportacao(id_usuario=usuario_id, nome_arquivo=arquivo.filename[:255], caminho_arquivo=caminho,
+                        hash_arquivo=hash_arquivo)
+    db.session.add(job)
+    db.session.commit()
+    # A varredura, quando roda, já envia o job novo com os demais pendentes
+    if not varrer_jobs_importacao():
+        agendar_job_importacao(job.id_job)
+    return redirect(url_for('importacao.acompanhar_importacao', id=job.id_job))
+
+
+@bp.app_errorhandler(413)
+def arquivo_muito_grande(erro):
+    limite_mb = current_app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    flash(f'O ficheiro excede o tamanho máximo permitido de {limite_mb} MB.', 'danger')
+    return redirect(url_for('importacao.importar_extrato'))
+
+
+@bp.route('/importar-extrato', methods=['GET', 'POST'])
+@login_required
+def importar_extrato():
+    if request.method == 'POST':
+        if 'arquivo_extrato' not in request.files or not request.files['arquivo_extrato'].filename:
+            flash('Nenhum ficheiro selecionado!', 'danger')
+            return redirect(request.url)
+        arquivo = request.files['arquivo_extrato']
+        filename = arquivo.filename.lower()
+        usuario_id = session['id_usuario']
+        if filename.endswith('.csv'):
+            return processar_csv(arquivo, usuario_id)
+        elif filename.endswith('.pdf'):
+            return processar_pdf(arquivo, usuario_id)
+        else:
+            flash('Formato não suportado. Use CSV ou PDF.', 'warning')
+            return redirect(request.url)
+    return render_template('importar_extrato.html')
+
+
+@bp.route('/importar-extrato/job/<int:id>')
+@login_required
+def acompanhar_importacao(id):
+    job = JobImportacao.query.filter_by(id_job=id, id_usuario=session['id_usuario']).first()
+    if not job:
+        flash('Importação não encontrada.', 'error')
+        return redirect(url_for('importacao.importar_extrato'))
+    return render_template('importacao_progresso.html', job=job.to_dict())
+
+
+@bp.route('/api/importacao/<int:id>')
+@login_required
+def api_status_importacao(id):
+    job = JobImportacao.query.filter_by(id_job=id, id_usuario=session['id_usuario']).first()
+    if not job:
+        return jsonify({'erro': 'Importação não encontrada.'}), 404
+    if job.status in ('pendente', 'processando'):
+        varrer_jobs_importacao()
+    return jsonify(job.to_dict())
+
+
+@bp.route('/importar-extrato/job/<int:id>/concluir')
+@login_required
+def concluir_importacao(id):
+    job = JobImportacao.query.filter_by(id_job=id, id_usuario=session['id_usuario']).first()
+    if not job or job.status != 'concluido':
+        return redirect(url_for('importacao.acompanhar_importacao', id=id))
+    if not job.linhas_encontradas:
+        flash('Nenhuma transação encontrada no PDF.', 'warning')
+        return redirect(url_for('importacao.importar_extrato'))
+    duplicadas = job.linhas_duplicadas or 0
+    importadas = job.linhas_encontradas - job.linhas_recusadas - duplicadas
+    if job.linhas_recusadas > 0:
+        flash(f'{job.linhas_recusadas} despesas ignoradas por saldo insuficiente.', 'warning')
+    if duplicadas:
+        flash(f'{duplicadas} transações ignoradas por já terem sido importadas anteriormente.', 'info')
+    if not importadas:
+        return redirect(url_for('painel.listar_transacoes'))
+    automaticas = Transacao.query.filter(Transacao.id_lote == job.id_lote,
+                                         Transacao.categoria != CATEGORIA_PENDENTE).count()
+    return encaminhar_categorizacao(job.id_lote, importadas, automaticas)
+
+
+@bp.route('/categorizar-importadas', methods=['GET', 'POST'])
+@login_required
+def categorizar_transacoes_importadas():
+    usuario_id = session['id_usuario']
+    id_lote = session.get('lote_a_categorizar')
+    if not id_lote:
+        return redirect(url_for('painel.listar_transacoes'))
+    # Só as linhas que o índice de categorias não reconheceu chegam à tela; percorridas por id (keyset),
+    # já que as categorizadas saem do filtro e um OFFSET pularia linhas
+    query_pendentes = Transacao.query.filter(Transacao.id_lote == id_lote, Transacao.id_usuario == usuario_id,
+                                             Transacao.categoria == CATEGORIA_PENDENTE)
+    if request.method == 'POST':
+        escolhas = {}
+        for campo, categoria in request.form.items():
+            if campo.startswith('categoria_') and categoria and campo[len('categoria_'):].isdigit():
+                escolhas[int(campo[len('categoria_'):])] = categoria
+        if escolhas:
+            aplicar_categorias(usuario_id, id_lote, escolhas)
+        # Lotes grandes são categorizados página a página; só a última página encerra o lote, mesmo que a
+        # página enviada não traga escolha nenhuma
+        ultimo = max(escolhas, default=request.form.get('ultimo', 0, type=int))
+        if query_pendentes.filter(Transacao.id_transacao > ultimo).first() is not None:
+            return redirect(url_for('importacao.categorizar_transacoes_importadas', apos=ultimo))
+        session.pop('lote_a_categorizar', None)
+        flash("Transações categorizadas com sucesso!", "success")
+        return redirect(url_for('painel.listar_transacoes'))
+    apos = request.args.get('apos', 0, type=int)
+    por_pagina = current_app.config['TRANSACOES_POR_PAGINA_CATEGORIZACAO']
+    pagina = pendentes_do_lote(usuario_id, id_lote, CATEGORIA_PENDENTE, apos, por_pagina + 1)
+    if not pagina and not apos:
+        session.pop('lote_a_categorizar', None)
+        return redirect(url_for('painel.listar_transacoes'))
+    transacoes = pagina[:por_pagina]
+    return render_template('categorizar_importadas.html', transacoes=transacoes,
+                           ultimo=transacoes[-1].id if transacoes else apos, tem_proxima=len(pagina) > por_pagina,
+                           restantes=query_pendentes.filter(Transacao.id_transacao > apos).count())
+
+
+def aplicar_categorias(usuario_id, id_lote, escolhas):
+    # Um SELECT para os valores antigos (necessários aos resumos mensais e ao índice de categorias) e um único
+    # UPDATE com CASE por id
+    antigas = [dict(linha._mapping) for linha in db.session.execute(
+        select(Transacao.id_transacao, Transacao.id_usuario, Transacao.data, Transacao.tipo, Transacao.valor,
+               Transacao.categoria, Transacao.beneficiario, Transacao.descricao)
+        .where(Transacao.id_transacao.in_(escolhas), Transacao.id_usuario == usuario_id,
+               Transacao.id_lote == id_lote))]
+    alteradas = [linha for linha in antigas if linha['categoria'] != escolhas[linha['id_transacao']]]
+    if not alteradas:
+        return
+    ids = [linha['id_transacao'] for linha in alteradas]
+    db.session.execute(
+        update(Transacao)
+        .where(Transacao.id_transacao.in_(ids), Transacao.id_usuario == usuario_id)
+        .values(categoria=case({i: escolhas[i] for i in ids}, value=Transacao.id_transacao))
+        .execution_options(synchronize_session=False)
+    )
+    registrar_alteracoes(db.session, removidas=alteradas,
+                         inseridas=[{**linha, 'categoria': escolhas[linha['id_transacao']]} for linha in alteradas])
+    db.session.commit()
@@ -0,0 +1,98 @@
+"""Meta mensal de investimento e gastos programados (recorrentes ou parcelados)."""
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+from static.database.models import db, GastoProgramado, Meta, Transacao
+from static.database.saldos import marcar_alteracao
+from static.rotas.comum import calcular_saldo, login_required
+
+bp = Blueprint('metas', __name__)
+
+
+@bp.route("/meta", methods=["GET", "POST"])
+@login_required
+def gerenciar_meta():
+    usuario_id = session['id_usuario'];
+    hoje = datetime.utcnow()
+    meta_atual = Meta.query.filter_by(id_usuario=usuario_id, mes=hoje.month, ano=hoje.year).first()
+    if request.method == "POST":
+        try:
+            novo_valor_meta = Decimal(request.form['meta'])
+        except (ValueError, KeyError):
+            flash("Valor de meta inválido.", "error");
+            return redirect(url_for('metas.gerenciar_meta'))
+        if meta_atual:
+            meta_atual.valor = novo_valor_meta;
+            flash("Meta atualizada!", "success")
+        else:
+            nova_meta = Meta(valor=novo_valor_meta, mes=hoje.month, ano=hoje.year, id_usuario=usuario_id);
+            db.session.add(nova_meta);
+            flash("Meta definida!", "success")
+        marcar_alteracao(usuario_id)
+        db.session.commit();
+        return redirect(url_for('painel.listar_transacoes'))
+    valor_meta_existente = meta_atual.valor if meta_atual else Decimal('0.00')
+    return render_template("definir_meta.html", meta_atual=valor_meta_existente)
+
+
+@bp.route("/gastos-programados/novo", methods=["GET", "POST"])
+@login_required
+def adicionar_gasto_programado():
+    if request.method == "POST":
+        descricao = request.form.get("descricao")
+        valor_parcela = Decimal(request.form.get("valor_parcela"))
+        tipo_gasto = request.form.get("tipo_gasto")
+        novo_gasto = GastoProgramado(descricao=descricao, valor_parcela=valor_parcela,
+                                     recorrente=(tipo_gasto == 'recorrente'), id_usuario=session['id_usuario'])
+        if tipo_gasto == 'parcelado':
+            novo_gasto.total_parcelas = int(request.form.get("total_parcelas"))
+        db.session.add(novo_gasto)
+        marcar_alteracao(session['id_usuario'])
+        db.session.commit()
+        flash("Gasto programado adicionado com sucesso!", "success")
+        return redirect(url_for('painel.listar_transacoes'))
+    return render_template("adicionar_gasto_programado.html")
+
+
+@bp.route("/gastos-programados/pagar/<int:id>", methods=["POST"])
+@login_required
+def pagar_parcela_gasto(id):
+    gasto = GastoProgramado.query.filter_by(id_gasto=id, id_usuario=session['id_usuario']).first()
+    if not gasto:
+        flash("Gasto programado não encontrado.", "error");
+        return redirect(url_for('painel.listar_transacoes'))
+    saldo_atual, _, _ = calcular_saldo(session['id_usuario'], bloquear=True)
+    if gasto.valor_parcela > saldo_atual:
+        flash(f"Saldo insuficiente para pagar '{gasto.descricao}'.", "error");
+        return redirect(url_for('painel.listar_transacoes'))
+    nova_transacao = Transacao(
+        descricao=f"Pagamento: {gasto.descricao}" + (
+            f" ({gasto.parcelas_pagas + 1}/{gasto.total_parcelas})" if not gasto.recorrente else ""),
+        valor=gasto.valor_parcela, tipo='despesa', beneficiario=gasto.descricao, categoria='Contas Programadas',
+        id_usuario=session['id_usuario']
+    )
+    db.session.add(nova_transacao)
+    gasto.parcelas_pagas += 1
+    if not gasto.recorrente and gasto.parcelas_pagas >= gasto.total_parcelas:
+        db.session.delete(gasto)
+        flash(f"Última parcela de '{gasto.descricao}' paga. Gasto finalizado!", "info")
+    else:
+        flash(f"Parcela de '{gasto.descricao}' paga com sucesso!", "success")
+    db.session.commit()
+    return redirect(url_for('painel.listar_transacoes'))
+
+
+@bp.route("/gastos-programados/apagar/<int:id>", methods=["POST"])
+@login_required
+def apagar_gasto_programado(id):
+    gasto = GastoProgramado.query.filter_by(id_gasto=id, id_usuario=session['id_usuario']).first()
+    if gasto:
+        db.session.delete(gasto)
+        marcar_alteracao(session['id_usuario'])
+        db.session.commit()
+        flash("Gasto programado excluído com sucesso.", "success")
+    else:
+        flash("Gasto não encontrado.", "error")
+    return redirect(url_for('painel.listar_transacoes'))
@@ -0,0 +1,183 @@
+"""Dashboard, busca e as APIs de leitura que ele consome (resumo, previsão e páginas de transações)."""
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, current_app, flash, jsonify, render_template, request, session, url_for
+
+from static.database.arquivamento import ARQUIVO_NAO_LIDO
+from static.database.busca import buscar_transacoes, termos_da_busca
+from static.database.leituras import pagina_transacoes, transacao_para_json
+from static.database.painel import resumo_dashboard, gastos_ativos
+from static.database.previsao import previsao_fluxo, MESES_MINIMO
+from static.database.saldos import versao_dados, versao_e_arquivamento
+from static.rotas.comum import CORES_CATEGORIA, format_currency_brl, login_required
+
+bp = Blueprint('painel', __name__)
+# Criado por criar_app (ARQUIVO_CACHE_RESULTADOS e RESULTADOS_EM_CACHE_*)
+cache_resultados = None
+
+
+def painel_do_usuario(usuario_id, hoje, versao_do_usuario=None):
+    """Resumo do dashboard e gastos programados ativos, do cache enquanto os dados e o mês forem os mesmos.
+
+    Com o cache válido, custa só a consulta da versão (ou nenhuma, se `versao_do_usuario` vier de quem chama);
+    sem ele, mais três: os agregados, as despesas do mês por categoria e os gastos programados.
+    """
+    if versao_do_usuario is None:
+        versao_do_usuario = versao_dados(usuario_id)
+    versao = f'{versao_do_usuario}:{hoje.year}-{hoje.month}'
+    painel = cache_resultados.obter('painel', usuario_id, versao)
+    if painel is None:
+        painel = {'resumo': resumo_dashboard(usuario_id, hoje), 'gastos_programados': gastos_ativos(usuario_id)}
+        cache_resultados.guardar('painel', usuario_id, versao, painel)
+    return painel
+
+
+def codificar_cursor(transacao):
+    return f"{transacao.data.isoformat()}_{transacao.id}"
+
+
+def decodificar_cursor(cursor):
+    data_str, id_str = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(data_str), int(id_str)
+
+
+def ler_filtros_busca(argumentos):
+    """Filtros da busca vindos da query string; ValueError (ou InvalidOperation) se algum for inválido."""
+    tipo = argumentos.get('tipo') or None
+    if tipo not in (None, 'receita', 'despesa'):
+        raise ValueError(tipo)
+    filtros = {'tipo': tipo, 'data_inicio': None, 'data_fim': None, 'valor_minimo': None, 'valor_maximo': None}
+    if argumentos.get('de'):
+        filtros['data_inicio'] = datetime.strptime(argumentos['de'], '%Y-%m-%d')
+    if argumentos.get('ate'):
+        # "Até" inclui o dia inteiro
+        filtros['data_fim'] = datetime.strptime(argumentos['ate'], '%Y-%m-%d') + timedelta(days=1)
+    for campo, chave in (('valor_min', 'valor_minimo'), ('valor_max', 'valor_maximo')):
+        if argumentos.get(campo):
+            valor = Decimal(argumentos[campo].replace(',', '.'))
+            if not valor.is_finite():
+                raise ValueError(campo)
+            filtros[chave] = valor
+    return filtros
+
+
+def buscar_pagina_da_busca(usuario_id, argumentos, limite=None):
+    """Página da busca (e cursor da próxima) para os parâmetros q, tipo, de, ate, valor_min, valor_max e cursor."""
+    limite = limite or current_app.config['TRANSACOES_POR_PAGINA']
+    filtros = ler_filtros_busca(argumentos)
+    cursor = argumentos.get('cursor')
+    transacoes = buscar_transacoes(usuario_id, termos_da_busca(argumentos.get('q')), limite + 1,
+                                   decodificar_cursor(cursor) if cursor else None, **filtros)
+    proximo_cursor = codificar_cursor(transacoes[limite - 1]) if len(transacoes) > limite else None
+    return transacoes[:limite], proximo_cursor
+
+
+def buscar_pagina_transacoes(usuario_id, cursor=None, limite=None, limite_arquivo=ARQUIVO_NAO_LIDO):
+    # Paginação por keyset em (data, id_transacao): o custo de cada página não depende do tamanho do histórico.
+    limite = limite or current_app.config['TRANSACOES_POR_PAGINA']
+    transacoes = pagina_transacoes(usuario_id, limite + 1, decodificar_cursor(cursor) if cursor else None,
+                                   limite_arquivo)
+    proximo_cursor = codificar_cursor(transacoes[limite - 1]) if len(transacoes) > limite else None
+    return transacoes[:limite], proximo_cursor
+
+
+@bp.route("/")
+@bp.route("/dashboard")
+@login_required
+def listar_transacoes():
+    usuario_id = session['id_usuario']
+    # A versão (chave do painel em cache) e o arquivado_ate (para a primeira página) numa só leitura do saldo
+    versao, arquivado_ate = versao_e_arquivamento(usuario_id)
+    painel = painel_do_usuario(usuario_id, datetime.now(), versao)
+    resumo = painel['resumo']
+    saldo = resumo['saldo']
+    total_gastos_programados_mes = resumo['total_gastos_programados_mes']
+
+    categorias_labels = [categoria for categoria, _ in resumo['gastos_por_categoria']]
+    gastos_valores = [float(total) for _, total in resumo['gastos_por_categoria']]
+    transacoes, proximo_cursor = buscar_pagina_transacoes(usuario_id, limite_arquivo=arquivado_ate)
+    gastos_programados_ativos = painel['gastos_programados']
+
+    saldo_apos_gastos = saldo - total_gastos_programados_mes
+
+    if saldo > 0:
+        percentual_gastos = float(
+            (total_gastos_programados_mes / saldo) * 100) if total_gastos_programados_mes < saldo else 100
+        percentual_sobra = 100 - percentual_gastos if total_gastos_programados_mes < saldo else 0
+    else:
+        percentual_gastos = 100
+        percentual_sobra = 0
+
+    return render_template(
+        "dashboard.html", transacoes=transacoes, proximo_cursor=proximo_cursor, saldo=saldo,
+        entrada_total=float(resumo['entrada_total']), saida_total=float(resumo['saida_total']),
+        meta_investimento=float(resumo['meta_investimento']), total_investido=float(resumo['total_investido']),
+        categorias_labels=categorias_labels, gastos_valores=gastos_valores, cores_categoria=CORES_CATEGORIA,
+        gastos_programados=gastos_programados_ativos, total_gastos_programados_mes=total_gastos_programados_mes,
+        saldo_apos_gastos=saldo_apos_gastos, percentual_gastos=percentual_gastos, percentual_sobra=percentual_sobra
+    )
+
+
+@bp.route("/api/resumo")
+@login_required
+def api_resumo_dashboard():
+    resumo = painel_do_usuario(session['id_usuario'], datetime.now())['resumo']
+    return jsonify({
+        'saldo': float(resumo['saldo']),
+        'entrada_total': float(resumo['entrada_total']),
+        'saida_total': float(resumo['saida_total']),
+        'meta_investimento': float(resumo['meta_investimento']),
+        'total_investido': float(resumo['total_investido']),
+        'gastos_por_categoria': [{'categoria': c, 'total': float(t)} for c, t in resumo['gastos_por_categoria']],
+        'total_gastos_programados_mes': float(resumo['total_gastos_programados_mes']),
+    })
+
+
+@bp.route("/api/previsao")
+@login_required
+def api_previsao_fluxo():
+    meses = request.args.get('meses', MESES_MINIMO, type=int)
+    return jsonify(previsao_fluxo(session['id_usuario'], datetime.now(), meses,
+                                  current_app.config['MESES_HISTORICO_PREVISAO']))
+
+
+@bp.route("/buscar")
+@login_required
+def buscar_transacoes_usuario():
+    transacoes, proximo_cursor = [], None
+    pesquisou = any(request.args.get(campo) for campo in ('q', 'tipo', 'de', 'ate', 'valor_min', 'valor_max'))
+    if pesquisou:
+        try:
+            transacoes, proximo_cursor = buscar_pagina_da_busca(session['id_usuario'], request.args)
+        except (ValueError, InvalidOperation):
+            flash("Filtros de busca inválidos. Confira as datas e os valores.", "error")
+    proxima_pagina = None
+    if proximo_cursor:
+        proxima_pagina = url_for('painel.buscar_transacoes_usuario', **{**request.args.to_dict(), 'cursor': proximo_cursor})
+    return render_template("buscar.html", transacoes=transacoes, pesquisou=pesquisou, filtros=request.args,
+                           proxima_pagina=proxima_pagina, cores_categoria=CORES_CATEGORIA)
+
+
+@bp.route("/api/busca")
+@login_required
+def api_buscar_transacoes():
+    try:
+        transacoes, proximo_cursor = buscar_pagina_da_busca(session['id_usuario'], request.args)
+    except (ValueError, InvalidOperation):
+        return jsonify({'erro': 'Filtros de busca inválidos.'}), 400
+    transacoes_dict = [{**transacao_para_json(t), 'valor_formatado': format_currency_brl(t.valor)}
+                       for t in transacoes]
+    return jsonify({'transacoes': transacoes_dict, 'proximo_cursor': proximo_cursor})
+
+
+@bp.route("/api/transacoes")
+@login_required
+def api_listar_transacoes():
+    try:
+        transacoes, proximo_cursor = buscar_pagina_transacoes(session['id_usuario'], request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'erro': 'Cursor inválido.'}), 400
+    transacoes_dict = [{**transacao_para_json(t), 'valor_formatado': format_currency_brl(t.valor)}
+                       for t in transacoes]
+    return jsonify({'transacoes': transacoes_dict, 'proximo_cursor': proximo_cursor})
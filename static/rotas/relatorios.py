@@ -0,0 +1,130 @@
+"""Relatórios em PDF e exportação em CSV/XLSX.
+
+O gerador de PDF (static.relatorio_pdf, com o fpdf2 e o fontTools) só é importado quando um relatório
+precisa ser renderizado: respostas 304 e relatórios já em cache não o carregam.
+"""
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, current_app, flash, redirect, request, session, stream_with_context, url_for
+
+from static.database.relatorios import despesas_do_periodo, totais_por_categoria, totais_por_mes, \
+    transacoes_para_exportar, gastos_para_exportar
+from static.database.saldos import versao_dados
+from static.cache_relatorios import etag_da_chave
+from static.exportacao import gerar_csv, gerar_xlsx, linhas_transacoes, linhas_gastos, COLUNAS_TRANSACOES, \
+    COLUNAS_GASTOS
+from static.metricas import etapa
+from static.rotas.comum import format_currency_brl, login_required
+
+bp = Blueprint('relatorios', __name__)
+# Criado por criar_app (PASTA_CACHE_RELATORIOS e TAMANHO_CACHE_RELATORIOS)
+cache_relatorios = None
+
+
+def intervalo_mes(referencia):
+    # Intervalo semiaberto [início do mês, início do mês seguinte), que permite usar o índice em `data`
+    inicio = datetime(referencia.year, referencia.month, 1)
+    fim = datetime(referencia.year + 1, 1, 1) if referencia.month == 12 else datetime(referencia.year,
+                                                                                      referencia.month + 1, 1)
+    return inicio, fim
+
+
+@bp.route('/gerar-relatorio-pdf', methods=['GET', 'POST'])
+@login_required
+def gerar_relatorio_pdf():
+    usuario_id = session['id_usuario']
+    periodo = request.values.get('periodo', 'mes')
+    tipo_relatorio = request.values.get('tipo', 'transacoes')
+    hoje = date.today()
+    periodo_texto = "Período Inválido"
+
+    data_fim = datetime.combine(hoje + timedelta(days=1), datetime.min.time())
+    if periodo == 'mes':
+        data_inicio, data_fim = intervalo_mes(hoje)
+        periodo_texto = f"Mês de {hoje.strftime('%B de %Y')}"
+    elif periodo == '12meses':
+        _, data_fim = intervalo_mes(hoje)
+        data_inicio = datetime(hoje.year, 1, 1) if hoje.month == 12 else datetime(hoje.year - 1, hoje.month + 1, 1)
+        periodo_texto = f"Últimos 12 meses ({data_inicio.strftime('%m/%Y')} a {hoje.strftime('%m/%Y')})"
+    elif periodo == '15dias':
+        data_inicio = hoje - timedelta(days=15)
+        periodo_texto = f"Últimos 15 dias (de {data_inicio.strftime('%d/%m/%Y')} a {hoje.strftime('%d/%m/%Y')})"
+    elif periodo == '5dias':
+        data_inicio = hoje - timedelta(days=5)
+        periodo_texto = f"Últimos 5 dias (de {data_inicio.strftime('%d/%m/%Y')} a {hoje.strftime('%d/%m/%Y')})"
+    else:
+        flash("Período selecionado inválido.", "danger")
+        return redirect(url_for('painel.listar_transacoes'))
+    data_inicio = datetime.combine(data_inicio, datetime.min.time())
+
+    # Relatórios agregados saem dos resumos mensais (ou de um GROUP BY), sem carregar as transações
+    geradores = {
+        'transacoes': (despesas_do_periodo, 'relatorio_despesas', 'relatorio_despesas.pdf'),
+        'categorias': (totais_por_categoria, 'relatorio_categorias', 'relatorio_categorias.pdf'),
+        'meses': (totais_por_mes, 'relatorio_mensal', 'relatorio_mensal.pdf'),
+    }
+    if tipo_relatorio not in geradores:
+        flash("Tipo de relatório inválido.", "danger")
+        return redirect(url_for('painel.listar_transacoes'))
+    consultar, renderizar, nome_arquivo = geradores[tipo_relatorio]
+
+    # Mesmos dados (versão), mesmo relatório e mesmo intervalo: 304 para o navegador ou os bytes do cache,
+    # sem consultar as transações nem passar pelo fpdf2. A URL do banco entra na chave: a pasta do cache é
+    # comum a todos os apps da máquina, e outro banco pode ter o mesmo usuário na mesma versão
+    etag = etag_da_chave(current_app.config['SQLALCHEMY_DATABASE_URI'], usuario_id, tipo_relatorio, data_inicio,
+                         data_fim, periodo_texto, versao_dados(usuario_id))
+    if request.method == 'GET' and request.if_none_match.contains_weak(etag):
+        resposta = Response(status=304)
+    else:
+        conteudo = cache_relatorios.obter(etag)
+        if conteudo is None:
+            with etapa('relatorio_consulta'):
+                linhas = consultar(usuario_id, data_inicio, data_fim)
+            if not linhas:
+                flash(f"Nenhum lançamento encontrado para o período selecionado.", "warning")
+                return redirect(url_for('painel.listar_transacoes'))
+            with etapa('relatorio_renderizacao'):
+                from static import relatorio_pdf
+                conteudo = getattr(relatorio_pdf, renderizar)(periodo_texto, linhas, format_currency_brl)
+            cache_relatorios.guardar(etag, conteudo)
+        resposta = Response(conteudo, mimetype='application/pdf',
+                            headers={'Content-Disposition': f'attachment;filename={nome_arquivo}'})
+    resposta.set_etag(etag, weak=True)
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+@bp.route('/exportar')
+@login_required
+def exportar_dados():
+    usuario_id = session['id_usuario']
+    formato = request.args.get('formato', 'csv')
+    conteudo = request.args.get('conteudo', 'transacoes')
+    try:
+        inicio = datetime.strptime(request.args['inicio'], '%Y-%m-%d') if request.args.get('inicio') else None
+        fim = datetime.strptime(request.args['fim'], '%Y-%m-%d') + timedelta(days=1) \
+            if request.args.get('fim') else None
+    except ValueError:
+        flash("Datas inválidas para a exportação.", "danger")
+        return redirect(url_for('painel.listar_transacoes'))
+
+    # As linhas são lidas do banco em lotes (yield_per) e enviadas conforme são geradas: o download começa
+    # logo e a memória não cresce com o tamanho do histórico
+    if formato == 'xlsx':
+        corpo = gerar_xlsx([
+            ('Transações', COLUNAS_TRANSACOES, linhas_transacoes(transacoes_para_exportar(usuario_id, inicio, fim))),
+            ('Gastos Programados', COLUNAS_GASTOS, linhas_gastos(gastos_para_exportar(usuario_id))),
+        ])
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        nome_arquivo = 'payattention.xlsx'
+    elif formato == 'csv' and conteudo == 'transacoes':
+        corpo = gerar_csv(COLUNAS_TRANSACOES, linhas_transacoes(transacoes_para_exportar(usuario_id, inicio, fim)))
+        mimetype, nome_arquivo = 'text/csv', 'transacoes.csv'
+    elif formato == 'csv' and conteudo == 'gastos':
+        corpo = gerar_csv(COLUNAS_GASTOS, linhas_gastos(gastos_para_exportar(usuario_id)))
+        mimetype, nome_arquivo = 'text/csv', 'gastos_programados.csv'
+    else:
+        flash("Formato de exportação inválido.", "danger")
+        return redirect(url_for('painel.listar_transacoes'))
+    return Response(stream_with_context(corpo), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment;filename={nome_arquivo}'})
@@ -0,0 +1,83 @@
+"""Cadastro, edição e exclusão de transações."""
+from decimal import Decimal
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+from static.database.models import db, Transacao, TransacaoArquivada
+from static.database.saldos import zerar_saldo
+from static.rotas.comum import calcular_saldo, login_required
+
+bp = Blueprint('transacoes', __name__)
+
+
+def buscar_transacao(id_transacao, id_usuario):
+    return Transacao.query.filter_by(id_transacao=id_transacao, id_usuario=id_usuario).first()
+
+
+@bp.route("/cadastrar_transacao", methods=["GET", "POST"])
+@login_required
+def cadastrar_transacao():
+    if request.method == "GET": return render_template("cadastro_transacao.html")
+    usuario_id = session['id_usuario']
+    try:
+        descricao, valor, tipo = request.form["descricao"], Decimal(request.form["valor"]), request.form[
+            "type"].strip().lower()
+        beneficiario, categoria = request.form.get("beneficiario", "N/A"), request.form.get("categoria", "Outros")
+    except ValueError:
+        flash("Valor inválido.", "error");
+        return redirect(url_for("transacoes.cadastrar_transacao"))
+    saldo_atual, _, _ = calcular_saldo(usuario_id, bloquear=True)
+    if tipo == "despesa" and valor > saldo_atual: flash(f"Despesa de R$ {valor:.2f} excede o saldo.",
+                                                        "error"); return redirect(url_for("transacoes.cadastrar_transacao"))
+    nova_transacao = Transacao(descricao=descricao, valor=valor, tipo=tipo, beneficiario=beneficiario,
+                               id_usuario=usuario_id, categoria=categoria)
+    db.session.add(nova_transacao);
+    db.session.commit();
+    flash("Transação cadastrada!", "success");
+    return redirect(url_for("painel.listar_transacoes"))
+
+
+@bp.route("/editar/<int:id>", methods=["GET", "POST"])
+@login_required
+def editar_transacao(id):
+    transacao_db = buscar_transacao(id, session['id_usuario'])
+    if not transacao_db: flash("Transação não encontrada.", "error"); return redirect(url_for("painel.listar_transacoes"))
+    if request.method == "POST":
+        transacao_db.descricao = request.form["descricao"];
+        transacao_db.valor = Decimal(request.form["valor"]);
+        transacao_db.tipo = request.form["type"].strip().lower()
+        transacao_db.beneficiario = request.form.get("beneficiario", "N/A");
+        transacao_db.categoria = request.form.get("categoria", "Outros")
+        db.session.commit();
+        flash("Transação editada com sucesso!", "success");
+        return redirect(url_for("painel.listar_transacoes"))
+    return render_template("editar.html", transacao=transacao_db.to_dict())
+
+
+@bp.route("/apagar/<int:id>", methods=["POST"])
+@login_required
+def apagar_transacao(id):
+    transacao_db = buscar_transacao(id, session['id_usuario'])
+    if transacao_db:
+        db.session.delete(transacao_db);
+        db.session.commit();
+        flash("Transação excluída.", "success")
+    else:
+        flash("Transação não encontrada.", "error")
+    return redirect(url_for("painel.listar_transacoes"))
+
+
+@bp.route("/apagar_todas", methods=["POST"])
+@login_required
+def apagar_todas_transacoes():
+    usuario_id = session['id_usuario']
+    try:
+        Transacao.query.filter_by(id_usuario=usuario_id).delete()
+        TransacaoArquivada.query.filter_by(id_usuario=usuario_id).delete()
+        zerar_saldo(usuario_id)
+        db.session.commit()
+        flash("Todas as suas transações foram excluídas com sucesso!", "success")
+    except Exception as e:
+        db.session.rollback()
+        flash("Ocorreu um erro ao tentar excluir as transações.", "danger")
+    return redirect(url_for('painel.listar_transacoes'))
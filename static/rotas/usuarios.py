@@ -0,0 +1,104 @@
+"""Login, cadastro e perfil do usuário."""
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from sqlalchemy import select, update
+
+from static.database.autenticacao import SobrecargaSenhas
+from static.database.models import db, Usuario
+from static.rotas.comum import login_required
+
+bp = Blueprint('usuarios', __name__)
+# Criados por criar_app (BCRYPT_ROUNDS, WORKERS_HASH_SENHA e LOGIN_*)
+executor_senhas = None
+limite_login_ip = None
+limite_login_email = None
+
+
+@bp.app_errorhandler(SobrecargaSenhas)
+def tratar_sobrecarga_senhas(erro):
+    db.session.rollback()
+    flash("O servidor está ocupado no momento. Tente novamente em alguns segundos.", "error")
+    return redirect(request.path)
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def fazer_login():
+    if 'id_usuario' in session: return redirect(url_for("painel.listar_transacoes"))
+    if request.method == "POST":
+        email, senha_str = request.form.get("email"), request.form.get("senha")
+        # Rajadas são recusadas antes de qualquer consulta ou bcrypt
+        chave_email = (email or '').strip().lower()
+        if limite_login_ip.bloqueado(request.remote_addr) or limite_login_email.bloqueado(chave_email):
+            flash("Muitas tentativas de login. Aguarde alguns minutos e tente novamente.", "error")
+            return redirect(url_for("usuarios.fazer_login"))
+        limite_login_ip.registrar(request.remote_addr)
+        usuario = db.session.execute(select(Usuario.id_usuario, Usuario.nome, Usuario.senha)
+                                     .where(Usuario.email == email)).first()
+        # Devolve a conexão ao pool antes do bcrypt; senão uma rajada de logins esgota o pool do resto do app
+        db.session.rollback()
+        if usuario and executor_senhas.verificar(senha_str, usuario.senha):
+            limite_login_email.limpar(chave_email)
+            if executor_senhas.precisa_rehash(usuario.senha):
+                # O custo configurado mudou: regrava o hash agora que a senha em texto está disponível
+                novo_hash = executor_senhas.gerar_hash(senha_str)
+                db.session.execute(update(Usuario).where(Usuario.id_usuario == usuario.id_usuario)
+                                   .values(senha=novo_hash))
+                db.session.commit()
+            session['id_usuario'] = usuario.id_usuario;
+            session['nome_usuario'] = usuario.nome.split()[0]
+            flash(f"Bem-vindo(a), {session['nome_usuario']}!", "success");
+            return redirect(url_for("painel.listar_transacoes"))
+        else:
+            limite_login_email.registrar(chave_email)
+            flash("E-mail ou senha inválidos.", "error");
+            return redirect(url_for("usuarios.fazer_login"))
+    return render_template("login.html")
+
+
+@bp.route("/logout")
+def fazer_logout():
+    session.clear();
+    flash("Você saiu da sua conta com sucesso.", "success")
+    return redirect(url_for("usuarios.fazer_login"))
+
+
+@bp.route("/cadastrar_usuario", methods=["GET", "POST"])
+def cadastrar_usuario():
+    if 'id_usuario' in session: return redirect(url_for("painel.listar_transacoes"))
+    if request.method == "POST":
+        nome, email, senha_str = request.form.get("nome"), request.form.get("email"), request.form.get("senha")
+        if not nome or not email or len(senha_str) < 7: flash("Preencha todos os campos...", "error"); return redirect(
+            url_for("usuarios.cadastrar_usuario"))
+        if Usuario.query.filter_by(email=email).first(): flash("Este e-mail já está cadastrado.",
+                                                               "error"); return redirect(url_for("usuarios.cadastrar_usuario"))
+        db.session.rollback()
+        novo_usuario = Usuario(nome=nome, email=email, senha=executor_senhas.gerar_hash(senha_str))
+        db.session.add(novo_usuario);
+        db.session.commit()
+        session['id_usuario'] = novo_usuario.id_usuario;
+        session['nome_usuario'] = novo_usuario.nome.split()[0]
+        flash("Cadastro realizado com sucesso!", "success");
+        return redirect(url_for("painel.listar_transacoes"))
+    return render_template("cadastro_usuario.html")
+
+
+@bp.route("/perfil", methods=["GET", "POST"])
+@login_required
+def gerenciar_perfil():
+    usuario = Usuario.query.get(session['id_usuario'])
+    if request.method == "POST":
+        senha_hashed = usuario.senha
+        # Como no login: a conexão volta ao pool antes do bcrypt
+        db.session.rollback()
+        if not executor_senhas.verificar(request.form.get("senha_atual"), senha_hashed):
+            flash("Senha atual incorreta.", "error");
+            return redirect(url_for("usuarios.gerenciar_perfil"))
+        nova_senha = request.form.get("nova_senha")
+        novo_hash = executor_senhas.gerar_hash(nova_senha) if nova_senha else None
+        usuario.nome = request.form.get("nome");
+        usuario.email = request.form.get("email")
+        if novo_hash: usuario.senha = novo_hash
+        db.session.commit();
+        flash("Perfil atualizado!", "success")
+        session['nome_usuario'] = usuario.nome.split()[0]
+        return redirect(url_for("usuarios.gerenciar_perfil"))
+    return render_template("perfil.html", usuario=usuario)
@@ -0,0 +1,73 @@
+"""App de teste num SQLite temporário, com um usuário já logado no cliente."""
+import io
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import criar_app
+from static.database.config import Config
+from static.database.migracoes import aplicar_migracoes
+from static.database.models import db, Usuario
+from static.database.previsao import cache_previsoes
+from static.database.sugestao_categorias import cache_indices
+
+
+@pytest.fixture
+def app(tmp_path):
+    class ConfigTeste(Config):
+        TESTING = True
+        SECRET_KEY = 'teste'
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'dados.db')
+        ARQUIVO_CACHE_RESULTADOS = str(tmp_path / 'resultados.db')
+        PASTA_CACHE_RELATORIOS = str(tmp_path / 'relatorios')
+        PASTA_CACHE_EXTRACOES = str(tmp_path / 'extracoes')
+        PASTA_UPLOADS = str(tmp_path / 'uploads')
+
+    app = criar_app(ConfigTeste)
+    app.secret_key = ConfigTeste.SECRET_KEY
+    # Os caches de índices e previsões são do processo, não do app
+    cache_indices.indices.clear()
+    cache_previsoes.previsoes.clear()
+    with app.app_context():
+        aplicar_migracoes()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def id_usuario(app):
+    usuario = Usuario(nome='Ana Silva', email='ana@exemplo.com', senha='-')
+    db.session.add(usuario)
+    db.session.commit()
+    return usuario.id_usuario
+
+
+@pytest.fixture
+def cliente(app, id_usuario):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['id_usuario'] = id_usuario
+    return cliente
+
+
+@contextmanager
+def consultas_executadas():
+    """Lista com o SQL de cada statement executado no motor do app dentro do bloco."""
+    executadas = []
+
+    def registrar(conexao, cursor, statement, parametros, contexto, executemany):
+        executadas.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        yield executadas
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
+
+
+def enviar_csv(cliente, linhas, nome='extrato.csv'):
+    conteudo = ('Data,Descrição,Valor\n' + '\n'.join(linhas)).encode()
+    return cliente.post('/importar-extrato', data={'arquivo_extrato': (io.BytesIO(conteudo), nome)},
+                        content_type='multipart/form-data')
@@ -0,0 +1,62 @@
+import io
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from static.database.deduplicacao import preencher_impressoes_ausentes
+from static.database.models import db, Transacao
+from tests.conftest import enviar_csv
+
+
+def cadastrar(cliente, descricao, valor, tipo):
+    return cliente.post('/cadastrar_transacao', data={'descricao': descricao, 'valor': valor, 'type': tipo,
+                                                      'beneficiario': descricao, 'categoria': 'Outros'})
+
+
+def reimportar_exportacao(cliente):
+    exportado = cliente.get('/exportar?formato=csv').data
+    return cliente.post('/importar-extrato', data={'arquivo_extrato': (io.BytesIO(exportado), 'exportado.csv')},
+                        content_type='multipart/form-data')
+
+
+def test_exportacao_reimportada_inteira_como_duplicada(cliente, id_usuario):
+    cadastrar(cliente, 'Salario', '1000', 'receita')
+    cadastrar(cliente, 'Mercado', '100', 'despesa')
+    # Dois lançamentos idênticos no mesmo dia são duas linhas, e as duas são reconhecidas
+    cadastrar(cliente, 'Cafe', '5', 'despesa')
+    cadastrar(cliente, 'Cafe', '5', 'despesa')
+    enviar_csv(cliente, ['02/01/2024,Pix - Padaria - Ag: 1,-12.00', '03/01/2024,Pix - Posto - Ag: 1,-50.00'])
+    assert Transacao.query.count() == 6
+
+    resposta = reimportar_exportacao(cliente)
+    assert Transacao.query.count() == 6
+    with cliente.session_transaction() as sessao:
+        assert ('info', '6 transações ignoradas por já terem sido importadas anteriormente.') in sessao['_flashes']
+    assert resposta.location.endswith('/importar-extrato')
+
+
+def test_edicao_manual_atualiza_a_impressao(cliente, id_usuario):
+    cadastrar(cliente, 'Salario', '1000', 'receita')
+    cadastrar(cliente, 'Mercado', '100', 'despesa')
+    transacao = Transacao.query.filter_by(descricao='Mercado').one()
+    cliente.post(f'/editar/{transacao.id_transacao}', data={'descricao': 'Feira', 'valor': '80', 'type': 'despesa',
+                                                            'beneficiario': 'Feira', 'categoria': 'Alimentação'})
+    reimportar_exportacao(cliente)
+    assert sorted((t.descricao, t.valor) for t in Transacao.query) == [('Feira', 80), ('Salario', 1000)]
+
+
+def test_migracao_preenche_linhas_sem_impressao(cliente, id_usuario):
+    # Linhas gravadas antes da coluna existir (ou manuais de antes desta correção)
+    dia = datetime(2024, 3, 5, 14, 30)
+    db.session.execute(insert(Transacao), [
+        {'descricao': descricao, 'valor': valor, 'tipo': tipo, 'beneficiario': descricao, 'categoria': 'Outros',
+         'data': dia, 'id_usuario': id_usuario}
+        for descricao, valor, tipo in (('Salario', 1000, 'receita'), ('Cafe', 5, 'despesa'),
+                                       ('Cafe', 5, 'despesa'))])
+    db.session.commit()
+
+    assert preencher_impressoes_ausentes() == 3
+    assert preencher_impressoes_ausentes() == 0
+    assert len({t.impressao_digital for t in Transacao.query}) == 3
+    reimportar_exportacao(cliente)
+    assert Transacao.query.count() == 3
@@ -0,0 +1,39 @@
+import csv
+import io
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+
+from static.database.models import Transacao
+from static.exportacao import COLUNAS_TRANSACOES, gerar_csv, gerar_xlsx, linhas_transacoes
+from tests.test_deduplicacao import cadastrar, reimportar_exportacao
+
+TRANSACOES = [
+    (datetime(2024, 1, 2), '=HYPERLINK("http://exemplo.com")', 'despesa', Decimal('10.00'), '+Lazer', '@SOMA(1)'),
+    (datetime(2024, 1, 3), '-Saque', 'receita', Decimal('5.00'), 'Outros', 'Banco'),
+]
+
+
+def test_csv_nao_exporta_formulas():
+    conteudo = b''.join(gerar_csv(COLUNAS_TRANSACOES, linhas_transacoes(TRANSACOES))).decode('utf-8-sig')
+    linhas = list(csv.reader(io.StringIO(conteudo)))
+    assert linhas[1] == ['02/01/2024', '\'=HYPERLINK("http://exemplo.com")', '-10.00', "'+Lazer", "'@SOMA(1)"]
+    # Só os textos: o valor negativo continua um número
+    assert linhas[2] == ['03/01/2024', "'-Saque", '5.00', 'Outros', 'Banco']
+
+
+def test_xlsx_nao_exporta_formulas():
+    arquivo = zipfile.ZipFile(io.BytesIO(b''.join(gerar_xlsx([('Transações', COLUNAS_TRANSACOES,
+                                                               linhas_transacoes(TRANSACOES))]))))
+    planilha = arquivo.read('xl/worksheets/sheet1.xml').decode()
+    assert '<t xml:space="preserve">\'=HYPERLINK("http://exemplo.com")</t>' in planilha
+    assert "<t xml:space=\"preserve\">'+Lazer</t>" in planilha
+    assert "<t xml:space=\"preserve\">'-Saque</t>" in planilha
+    assert '<v>-10.00</v>' in planilha
+
+
+def test_exportacao_protegida_continua_reconhecida_ao_reimportar(cliente, id_usuario):
+    cadastrar(cliente, '-Deposito', '100', 'receita')
+    cadastrar(cliente, '=Mercado', '30', 'despesa')
+    reimportar_exportacao(cliente)
+    assert Transacao.query.count() == 2
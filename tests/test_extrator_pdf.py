@@ -0,0 +1,19 @@
+from benchmarks.bench_extrator import ExtratorLegado
+from benchmarks.gerar_extrato import gerar_linhas
+from static.extrator_pdf import ExtratorPDF
+
+
+def test_mesma_saida_que_o_classificador_original():
+    # O corpus tem linhas de continuação e lançamentos sem data, que caem na data de hoje
+    legado, extrator = ExtratorLegado(), ExtratorPDF()
+    linhas = list(gerar_linhas(5000))
+    assert [extrator.classificar_linha(linha) for linha in linhas] == \
+        [legado.classificar_linha(linha) for linha in linhas]
+
+
+def test_casos_de_borda():
+    legado, extrator = ExtratorLegado(), ExtratorPDF()
+    linhas = ['PIX RECEBIDO Maria 1500,00', '31/02/2024 05/03/24 Compra 12,00', 'Loja 12/03/2024-1,00 x',
+              'UBER 12,50', 'COMPRA İSTANBUL 10,00', 'Tarifa 1.234,56 R$ -1234.56', 'Depósito 12,5 sem valor']
+    for linha in linhas:
+        assert extrator.classificar_linha(linha) == legado.classificar_linha(linha), linha
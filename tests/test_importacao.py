@@ -0,0 +1,28 @@
+from static.database.models import db, LoteImportacao, Transacao
+from static.database.sugestao_categorias import CATEGORIA_PENDENTE
+from tests.conftest import enviar_csv
+
+LINHAS = ['02/01/2024,Pix - Padaria Pao - Ag: 1,12.00', '03/01/2024,Pix - Posto Shell - Ag: 1,50.00',
+          '04/01/2024,Pix - Cinema - Ag: 1,30.00']
+
+
+def test_reenvio_so_de_duplicadas_nao_cria_lote(cliente):
+    enviar_csv(cliente, LINHAS)
+    assert LoteImportacao.query.count() == 1
+    enviar_csv(cliente, LINHAS)
+    enviar_csv(cliente, ['data inválida,Pix - Padaria Pao - Ag: 1,12.00'])
+    assert LoteImportacao.query.count() == 1
+
+
+def test_pagina_sem_escolhas_nao_encerra_o_lote(app, cliente):
+    app.config['TRANSACOES_POR_PAGINA_CATEGORIZACAO'] = 2
+    enviar_csv(cliente, LINHAS)
+    primeira, segunda, terceira = [t.id_transacao for t in Transacao.query.order_by(Transacao.id_transacao)]
+
+    resposta = cliente.post('/categorizar-importadas', data={'ultimo': segunda})
+    assert resposta.location.endswith(f'/categorizar-importadas?apos={segunda}')
+    resposta = cliente.post('/categorizar-importadas', data={'ultimo': terceira, f'categoria_{terceira}': 'Lazer'})
+    assert resposta.location.endswith('/dashboard')
+    with cliente.session_transaction() as sessao:
+        assert 'lote_a_categorizar' not in sessao
+    assert db.session.get(Transacao, primeira).categoria == CATEGORIA_PENDENTE
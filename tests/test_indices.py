@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert
+
+from static.database.leituras import pagina_transacoes
+from static.database.models import db, Transacao
+from static.database.relatorios import despesas_do_periodo, totais_por_categoria
+from static.database.saldos import registrar_insercoes
+
+
+def planos(executar):
+    """Saída de EXPLAIN QUERY PLAN de cada SELECT que `executar` faz no banco."""
+    consultas = []
+
+    def registrar(conexao, cursor, statement, parametros, contexto, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            consultas.append((statement, parametros))
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        executar()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
+    conexao = db.session.connection().connection.driver_connection
+    return ['\n'.join(linha[-1] for linha in conexao.execute('EXPLAIN QUERY PLAN ' + statement, parametros))
+            for statement, parametros in consultas]
+
+
+def popular(id_usuario, quantidade=500):
+    inicio = datetime(2024, 1, 1)
+    linhas = [{'descricao': f'Compra {i}', 'valor': 10 + i % 90, 'tipo': 'despesa' if i % 4 else 'receita',
+               'beneficiario': f'Loja {i % 20}', 'categoria': ('Alimentação', 'Transporte', 'Lazer')[i % 3],
+               'data': inicio + timedelta(hours=7 * i), 'id_usuario': id_usuario} for i in range(quantidade)]
+    db.session.execute(insert(Transacao), linhas)
+    registrar_insercoes(db.session, linhas)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+
+
+def test_pagina_do_dashboard_usa_indice_usuario_data(app, id_usuario):
+    popular(id_usuario)
+    plano, = planos(lambda: pagina_transacoes(id_usuario, 51, (datetime(2024, 2, 1), 10**9), limite_arquivo=None))
+    assert 'ix_transacoes_usuario_data' in plano, plano
+    # A ordem (data, id) sai do próprio índice, sem ordenação à parte
+    assert 'TEMP B-TREE' not in plano, plano
+
+
+def test_relatorio_de_intervalo_usa_indice_usuario_tipo_data(app, id_usuario):
+    popular(id_usuario)
+    inicio, fim = datetime(2024, 1, 10), datetime(2024, 1, 20)
+    for consulta in (lambda: despesas_do_periodo(id_usuario, inicio, fim),
+                     lambda: totais_por_categoria(id_usuario, inicio, fim)):
+        plano = planos(consulta)[-1]
+        assert 'ix_transacoes_usuario_tipo_data_categoria' in plano, plano
@@ -0,0 +1,25 @@
+import copy
+
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from static.database.models import db
+
+
+def test_consulta_com_erro_nao_deixa_rastro_na_conexao(app):
+    with app.test_request_context():
+        g.metricas = {'consultas': 0, 'tempo_sql': 0.0, 'lentas': 0}
+        with db.engine.connect() as conexao:
+            info_antes = copy.deepcopy(dict(conexao.info))
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conexao.execute(text('SELECT * FROM tabela_que_nao_existe'))
+                conexao.rollback()
+            assert dict(conexao.info) == info_antes
+            conexao.execute(text('SELECT 1'))
+        # Fora de uma requisição de verdade: o teardown não registra nada
+        metricas = g.pop('metricas')
+    assert metricas['consultas'] == 1
+    assert 0 <= metricas['tempo_sql'] < 1
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from static.database.models import db, GastoProgramado, Meta, Transacao
+from tests.conftest import consultas_executadas
+
+
+def test_dashboard_limita_as_consultas(cliente, id_usuario):
+    hoje = datetime.now()
+    db.session.add_all([
+        Transacao(descricao='Salário', valor=3000, tipo='receita', beneficiario='Empresa', categoria='Outros',
+                  id_usuario=id_usuario, data=hoje),
+        Transacao(descricao='Mercado', valor=200, tipo='despesa', beneficiario='Mercado', categoria='Alimentação',
+                  id_usuario=id_usuario, data=hoje),
+        Meta(valor=500, mes=hoje.month, ano=hoje.year, id_usuario=id_usuario),
+        GastoProgramado(descricao='Aluguel', valor_parcela=1000, recorrente=True, id_usuario=id_usuario),
+    ])
+    db.session.commit()
+
+    # Sem cache: saldo (versão e arquivado_ate), agregados, despesas por categoria, gastos programados e a página
+    with consultas_executadas() as statements:
+        assert cliente.get('/dashboard').status_code == 200
+    assert len(statements) == 5, statements
+    # Com o painel em cache: só o saldo e a página
+    with consultas_executadas() as statements:
+        assert cliente.get('/dashboard').status_code == 200
+    assert len(statements) == 2, statements
@@ -0,0 +1,68 @@
+import re
+
+from static.database.models import db, Transacao
+from static.database.saldos import versao_dados
+from static.database.sugestao_categorias import cache_indices, CATEGORIA_PENDENTE
+from tests.conftest import consultas_executadas, enviar_csv
+
+
+def reconstrucoes(statements):
+    # A leitura do histórico inteiro em CacheIndices.construir
+    return [s for s in statements if 'GROUP BY' in s and 'historico' in s]
+
+
+def categorizar_pendentes(cliente, categoria_por_beneficiario):
+    pagina = cliente.get('/categorizar-importadas').data.decode()
+    ids = [int(i) for i in re.findall(r'name="categoria_(\d+)"', pagina)]
+    beneficiarios = {t.id_transacao: t.beneficiario for t in Transacao.query.filter(Transacao.id_transacao.in_(ids))}
+    return cliente.post('/categorizar-importadas', data={
+        f'categoria_{i}': categoria_por_beneficiario[beneficiarios[i]] for i in ids})
+
+
+def test_segunda_importacao_reaproveita_o_indice(cliente, id_usuario):
+    with consultas_executadas() as statements:
+        enviar_csv(cliente, ['02/01/2024,Pix - Padaria Pao - Ag: 1,-12.00',
+                             '03/01/2024,Pix - Posto Shell - Ag: 1,-50.00'])
+    assert len(reconstrucoes(statements)) == 1
+    categorizar_pendentes(cliente, {'Padaria Pao': 'Alimentação', 'Posto Shell': 'Transporte'})
+
+    with consultas_executadas() as statements:
+        enviar_csv(cliente, ['10/02/2024,Pix - Posto Shell - Ag: 1,-60.00',
+                             '11/02/2024,Pix - Padaria Pao - Ag: 1,-9.00',
+                             '12/02/2024,Pix - Cinema - Ag: 1,-30.00'])
+    assert reconstrucoes(statements) == []
+
+    categorias = dict(db.session.query(Transacao.beneficiario, Transacao.categoria)
+                      .filter(Transacao.data >= '2024-02-01'))
+    assert categorias == {'Posto Shell': 'Transporte', 'Padaria Pao': 'Alimentação', 'Cinema': CATEGORIA_PENDENTE}
+    # O índice avançado pelos commits é o mesmo que o histórico do banco daria
+    versao, indice = cache_indices.indices[id_usuario]
+    assert versao == versao_dados(id_usuario)
+    assert indice.contagens == cache_indices.construir(id_usuario).contagens
+
+
+def test_edicao_manual_entra_no_indice(cliente, id_usuario):
+    enviar_csv(cliente, ['02/01/2024,Pix - Padaria Pao - Ag: 1,-12.00'])
+    categorizar_pendentes(cliente, {'Padaria Pao': 'Alimentação'})
+    transacao = Transacao.query.filter_by(beneficiario='Padaria Pao').one()
+    cliente.post(f'/editar/{transacao.id_transacao}', data={
+        'descricao': transacao.descricao, 'valor': '12.00', 'type': 'despesa', 'beneficiario': 'Padaria Pao',
+        'categoria': 'Lazer'})
+
+    with consultas_executadas() as statements:
+        enviar_csv(cliente, ['05/01/2024,Pix - Padaria Pao - Ag: 1,-7.00'])
+    assert reconstrucoes(statements) == []
+    assert Transacao.query.filter(Transacao.valor == 7).one().categoria == 'Lazer'
+
+
+def test_escrita_desfeita_nao_muda_o_indice(app, id_usuario):
+    indice = cache_indices.obter(id_usuario, versao_dados(id_usuario))
+    db.session.add(Transacao(descricao='Padaria', valor=5, tipo='despesa', beneficiario='Padaria',
+                             categoria='Alimentação', id_usuario=id_usuario))
+    db.session.flush()
+    db.session.rollback()
+    db.session.add(Transacao(descricao='Cinema', valor=5, tipo='despesa', beneficiario='Cinema',
+                             categoria='Lazer', id_usuario=id_usuario))
+    db.session.commit()
+    assert indice.sugerir('Padaria', 'Padaria') is None
+    assert indice.sugerir('Cinema', 'Cinema') == 'Lazer'